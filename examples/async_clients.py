@@ -0,0 +1,47 @@
+from tminterface.asyncinterface import AsyncTMInterface
+from tminterface.client import Client
+import asyncio
+import sys
+
+
+# Drives several game instances from a single event loop.
+# Start the instances with different server names (TMInterface0, TMInterface1, ...)
+# and validate a replay in each of them.
+class MainClient(Client):
+    def __init__(self) -> None:
+        super(MainClient, self).__init__()
+        self.state = None
+
+    async def on_registered(self, iface: AsyncTMInterface) -> None:
+        print(f'Registered to {iface.server_name}')
+        await iface.log('Connected to the async client')
+
+    async def on_simulation_begin(self, iface: AsyncTMInterface):
+        await iface.remove_state_validation()
+
+    async def on_simulation_step(self, iface: AsyncTMInterface, _time: int):
+        if _time == 0:
+            self.state = await iface.get_simulation_state()
+
+        if _time % 1000 == 0:
+            print(f'{iface.server_name}: {_time}')
+
+    async def on_simulation_end(self, iface: AsyncTMInterface, result: int):
+        print(f'{iface.server_name}: simulation finished')
+
+
+async def main():
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    ifaces = [AsyncTMInterface(f'TMInterface{i}') for i in range(instances)]
+    for iface in ifaces:
+        iface.register(MainClient())
+
+    try:
+        await asyncio.gather(*[iface.wait_closed() for iface in ifaces])
+    finally:
+        for iface in ifaces:
+            await iface.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+from tminterface.interface import TMInterface
+from tminterface.client import Client
+from tminterface.server import ReferenceServer
+from multiprocessing import Process, Event
+import threading
+import time
+import sys
+
+SERVER_NAME = 'TMInterfaceIdle'
+
+
+# Measures the CPU used by connected clients while the game does not send any calls,
+# e.g. while sitting in a menu. The servers run in a separate process, so only
+# the client threads are measured.
+def serve(count: int, ready, stop):
+    servers = [ReferenceServer(f'{SERVER_NAME}{i}') for i in range(count)]
+    for server in servers:
+        server.start()
+
+    ready.set()
+    stop.wait()
+    for server in servers:
+        server.stop()
+
+
+class LegacyTMInterface(TMInterface):
+    # The client thread loop before idle polling backed off
+    def _main_thread(self):
+        while self.running:
+            if not self._ensure_connected():
+                time.sleep(0)
+                continue
+
+            if not self.registered:
+                self._register()
+
+            self._process_server_message()
+            time.sleep(0)
+
+
+def legacy_run_client(iface: TMInterface):
+    while iface.running:
+        time.sleep(0)
+
+
+def run_client(iface: TMInterface):
+    while not iface.wait_closed(0.5):
+        pass
+
+
+def measure(interface_class, wait, count: int, duration: float) -> float:
+    registered = [threading.Event() for _ in range(count)]
+
+    class IdleClient(Client):
+        def __init__(self, event):
+            super(IdleClient, self).__init__()
+            self.event = event
+
+        def on_registered(self, iface: TMInterface) -> None:
+            self.event.set()
+
+    ifaces = [interface_class(f'{SERVER_NAME}{i}') for i in range(count)]
+    for iface, event in zip(ifaces, registered):
+        iface.register(IdleClient(event))
+
+    for event in registered:
+        event.wait()
+
+    # The thread run_client blocks in, one per client
+    waiters = [threading.Thread(target=wait, args=(iface,)) for iface in ifaces]
+    for waiter in waiters:
+        waiter.start()
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    elapsed = time.perf_counter() - start
+
+    for iface in ifaces:
+        iface.close()
+
+    for waiter in waiters:
+        waiter.join()
+
+    # Let the servers process the deregistration before the next measurement
+    time.sleep(0.5)
+    return cpu / elapsed * 100 / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    ready = Event()
+    stop = Event()
+    server = Process(target=serve, args=(count, ready, stop))
+    server.start()
+    ready.wait()
+
+    try:
+        print(f'Idle CPU usage per client, {count} clients:')
+        print(f'legacy (sleep(0) loops)      {measure(LegacyTMInterface, legacy_run_client, count, duration):5.1f}%')
+        print(f'backoff + event shutdown     {measure(TMInterface, run_client, count, duration):5.1f}%')
+    finally:
+        stop.set()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
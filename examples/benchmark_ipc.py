@@ -0,0 +1,564 @@
+from tminterface.interface import TMInterface, Message, MessageType, BufferClearMode, MAXINT32
+from tminterface.client import Client
+from tminterface.server import ReferenceServer
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData, HmsDynaStruct, SimulationWheel
+from tminterface.waitstrategy import SpinWaitStrategy, YieldWaitStrategy, BackoffWaitStrategy
+from tminterface.metrics import Metrics, format_snapshot
+from tminterface.fingerprint import StateFingerprinter
+from tminterface.projection import StateProjection
+from tminterface.statebatch import SimStateBatch
+from tminterface.eventbuffer import ArrayEventBufferData, EventBufferData, EVENT_DTYPE
+from tminterface.constants import ANALOG_STEER_NAME, DEFAULT_SERVER_SIZE
+from multiprocessing import Process, Event
+import threading
+import hashlib
+import numpy as np
+import mmap
+import time
+import sys
+
+SERVER_NAME = 'TMInterfaceBenchmark'
+LARGE_BUFFER_SIZE = 1024 * 1024
+
+
+# Benchmarks of the client side of the messaging protocol.
+# The reference server runs in a separate process, so that
+# it does not share the GIL with the client that is being measured.
+def serve(server_name: str, buffer_size: int, ready, stop):
+    server = ReferenceServer(server_name, buffer_size)
+    server.timeout = -1
+
+    # A map with 20 checkpoints and 3 laps
+    server.state.cp_data = CheckpointData([False] * 20, [CheckpointTime(time=-1) for _ in range(60)])
+    server.start()
+    ready.set()
+    stop.wait()
+    server.stop()
+
+
+class BenchmarkClient(Client):
+    def __init__(self, benchmark) -> None:
+        super(BenchmarkClient, self).__init__()
+        self.benchmark = benchmark
+        self.result = None
+        self.done = threading.Event()
+
+    def on_registered(self, iface: TMInterface) -> None:
+        # Start from an empty event buffer, inputs added by previous benchmarks
+        # would eventually make the event buffer too long to be sent
+        iface.set_event_buffer(ReferenceServer.initial_event_buffer())
+        self.result = self.benchmark(iface)
+        iface.close()
+        self.done.set()
+
+
+def run(benchmark, buffer_size: int = DEFAULT_SERVER_SIZE, **kwargs):
+    iface = TMInterface(f'{SERVER_NAME}{buffer_size}', buffer_size, **kwargs)
+    client = BenchmarkClient(benchmark)
+    iface.register(client)
+    client.done.wait()
+
+    # close() does not wait for the server to read the deregistration,
+    # the registration of the next client would overwrite it
+    while iface.header[0] == MessageType.C_DEREGISTER | 0xFF00:
+        time.sleep(0)
+
+    return client.result
+
+
+def measure(func, count: int) -> dict:
+    samples = []
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for _ in range(count):
+        call_start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - call_start)
+
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    samples.sort()
+    return {
+        'mean': sum(samples) / count / 1000,
+        'p50': samples[count // 2] / 1000,
+        'p99': samples[int(count * 0.99)] / 1000,
+        'calls': count / elapsed,
+        'cpu': cpu / elapsed * 100
+    }
+
+
+def print_result(name: str, result: dict):
+    print(f'{name:<28} mean {result["mean"]:8.1f}us  p50 {result["p50"]:8.1f}us  '
+          f'p99 {result["p99"]:8.1f}us  {result["calls"]:9.0f} calls/s  client CPU {result["cpu"]:5.1f}%')
+
+
+def benchmark_wait_strategies(count: int):
+    print('Round trip latency of get_context_mode per wait strategy:')
+    strategies = [
+        ('SpinWaitStrategy', SpinWaitStrategy()),
+        ('YieldWaitStrategy(0)', YieldWaitStrategy(0)),
+        ('YieldWaitStrategy(100)', YieldWaitStrategy(100)),
+        ('BackoffWaitStrategy', BackoffWaitStrategy()),
+    ]
+
+    # Without the context mode cache, so that every call is a round trip to the server
+    for name, strategy in strategies:
+        result = run(lambda iface: measure(iface.get_context_mode, count), wait_strategy=strategy, cache_context_mode=False)
+        print_result(name, result)
+
+
+def legacy_get_simulation_state(iface: TMInterface) -> SimStateData:
+    # The decoding done by get_simulation_state before the state was copied in one piece
+    iface._send_message(Message(MessageType.C_SIM_GET_STATE))
+    iface._wait_for_server_response(False)
+
+    iface.mfile.seek(8)
+    state = SimStateData(iface.mfile.read(SimStateData.min_size))
+    state.cp_data.read_from_file(iface.mfile)
+    iface._clear_buffer()
+    return state
+
+
+def benchmark_get_simulation_state(count: int):
+    print('get_simulation_state decoding modes:')
+
+    def benchmark(iface: TMInterface):
+        size = len(iface.get_simulation_state().data)
+        cp_size = size - SimStateData.min_size
+        state = SimStateData()
+
+        # Reading from the file copies the data once, constructing the struct
+        # and appending the checkpoint arrays copies it again
+        modes = [
+            ('legacy', lambda: legacy_get_simulation_state(iface), 2 * SimStateData.min_size + 2 * cp_size),
+            ('copy', iface.get_simulation_state, size),
+            ('into existing state', lambda: iface.get_simulation_state(state), size),
+            ('view', lambda: iface.get_simulation_state(view=True), 0),
+        ]
+        return [(name, measure(func, count), copied) for name, func, copied in modes]
+
+    for name, result, copied in run(benchmark):
+        print_result(name, result)
+        print(f'{"":<28} {copied} bytes copied per call')
+
+
+def read_telemetry(state: SimStateData) -> tuple:
+    # The fields most per tick hooks read
+    return state.position, state.velocity, [wheel.real_time_state.has_ground_contact for wheel in state.simulation_wheels]
+
+
+def legacy_read_telemetry(state: SimStateData) -> tuple:
+    # The same fields read without reusing the nested structs, the way every access worked before
+    dyna = SimStateData.dyna_field._getvalue(state)
+    current_state = HmsDynaStruct.current_state_field._getvalue(dyna)
+    wheels = SimStateData.simulation_wheels_field._getvalue(state)
+    contacts = [SimulationWheel.real_time_state_field._getvalue(wheel).has_ground_contact for wheel in wheels]
+    return list(current_state.position), list(current_state.linear_speed), contacts
+
+
+def benchmark_state_decoding(count: int):
+    print('get_simulation_state decoding and field access, without waiting for the server:')
+
+    # Leave the state in the buffer after reading it, so it can be read again
+    iface = TMInterface(SERVER_NAME, clear_mode=BufferClearMode.HEADER)
+    iface.mfile = mmap.mmap(-1, iface.buffer_size)
+    iface.buffer = memoryview(iface.mfile)
+    iface.header = iface.buffer[:4].cast('i')
+
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.position = [500, 50, 500]
+    state.cp_data = CheckpointData([False] * 20, [CheckpointTime(time=-1) for _ in range(60)])
+    iface.buffer[8:8 + len(state.data)] = state.data
+    size = SimStateData.size_in(iface.buffer, 8)
+
+    def legacy_decode() -> SimStateData:
+        decoded = SimStateData(bytearray(iface.buffer[8:8 + size]))
+        SimStateData.cp_data_field._getvalue(decoded).resize_arrays()
+        return decoded
+
+    def decode() -> SimStateData:
+        return iface._read_simulation_state(None, False)
+
+    modes = [
+        ('decode', lambda: legacy_decode(), lambda: decode()),
+        ('decode + position', lambda: legacy_decode().dyna.current_state.position, lambda: decode().position),
+        ('decode + telemetry', lambda: legacy_read_telemetry(legacy_decode()), lambda: read_telemetry(decode())),
+    ]
+
+    decoded = decode()
+    modes.append(('telemetry of a decoded state', lambda: legacy_read_telemetry(decoded), lambda: read_telemetry(decoded)))
+
+    for name, legacy, lazy in modes:
+        legacy_rate = throughput(legacy, count)
+        lazy_rate = throughput(lazy, count)
+        print(f'{name:<28} eager {legacy_rate:10.0f} calls/s  lazy {lazy_rate:10.0f} calls/s  '
+              f'({lazy_rate / legacy_rate:.1f}x)')
+
+    # The same telemetry read straight from the buffer, without decoding the state
+    projection = StateProjection(['position', 'velocity', 'wheel_contacts'])
+    telemetry_rate = throughput(lambda: read_telemetry(decode()), count)
+    projected_rate = throughput(lambda: projection.unpack(iface.buffer, 8), count)
+    print(f'{"projected telemetry":<28} lazy  {telemetry_rate:10.0f} calls/s  projected {projected_rate:10.0f} calls/s  '
+          f'({projected_rate / telemetry_rate:.1f}x)')
+
+    iface.header.release()
+    iface.buffer.release()
+    iface.mfile.close()
+
+
+def benchmark_fingerprints(count: int):
+    print('Masked state fingerprints, hashes per second:')
+
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.cp_data = CheckpointData([False] * 20, [CheckpointTime(time=-1) for _ in range(60)])
+    state = SimStateData(bytearray(state.data))
+    state.position = [500, 50, 500]
+
+    fingerprinter = StateFingerprinter()
+    batch = SimStateBatch.from_states([state] * 1000)
+
+    full_rate = throughput(lambda: hashlib.blake2b(state.data, digest_size=8).digest(), count)
+    single_rate = throughput(lambda: fingerprinter.fingerprint(state), count)
+    batch_rate = throughput(lambda: fingerprinter.fingerprint_batch(batch), max(count // len(batch), 1)) * len(batch)
+    print(f'blake2b of the whole state {full_rate:10.0f} hashes/s')
+    print(f'fingerprint                {single_rate:10.0f} hashes/s ({single_rate / full_rate:.1f}x)')
+    print(f'fingerprint_batch          {batch_rate:10.0f} hashes/s ({batch_rate / full_rate:.1f}x)')
+
+
+def benchmark_state_copies(count: int):
+    print('Perturbed copies of a state, as made for each bruteforce attempt:')
+
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.cp_data = CheckpointData([False] * 20, [CheckpointTime(time=-1) for _ in range(60)])
+    state = SimStateData(bytearray(state.data))
+    state.invalidate_cp_data()
+    state.position = [500, 50, 500]
+
+    def legacy_perturb():
+        # Copy the bytes and decode the nested structs to set the fields
+        perturbed = SimStateData(bytearray(state.data))
+        perturbed.invalidate_cp_data()
+        current_state = HmsDynaStruct.current_state_field._getvalue(SimStateData.dyna_field._getvalue(perturbed))
+        current_state.position = [500, 50, 501]
+        current_state.linear_speed = [0, 0, 10]
+        return perturbed
+
+    def perturb():
+        perturbed = state.copy()
+        perturbed.position = [500, 50, 501]
+        perturbed.velocity = [0, 0, 10]
+        return perturbed
+
+    legacy_rate = throughput(legacy_perturb, count)
+    copy_rate = throughput(perturb, count)
+    print(f'{"copy + position + velocity":<28} decoded {legacy_rate:10.0f} copies/s  '
+          f'copy-on-write {copy_rate:10.0f} copies/s ({copy_rate / legacy_rate:.1f}x)')
+
+
+def benchmark_clear_modes(count: int):
+    print('set_input_state per buffer clear mode:')
+    for buffer_size in [DEFAULT_SERVER_SIZE, LARGE_BUFFER_SIZE]:
+        for mode in BufferClearMode:
+            result = run(
+                lambda iface: measure(lambda: iface.set_input_state(sim_clear_buffer=False, steer=65536), count),
+                buffer_size,
+                clear_mode=mode
+            )
+            print_result(f'{mode.name}, {buffer_size} bytes', result)
+
+
+def benchmark_context_mode_cache(count: int):
+    print('set_input_state with and without the context mode cache:')
+    for cache in [False, True]:
+        def benchmark(iface: TMInterface):
+            result = measure(lambda: iface.set_input_state(steer=65536), count)
+            return result, iface.round_trips_saved
+
+        result, saved = run(benchmark, cache_context_mode=cache)
+        print_result(f'cache_context_mode={cache}', result)
+        print(f'{"":<28} {saved} round trips saved')
+
+
+def benchmark_metrics(count: int):
+    print('set_input_state with and without metrics:')
+    metrics = Metrics()
+    for name, kwargs in [('metrics=None', {}), ('metrics=Metrics()', {'metrics': metrics})]:
+        result = run(lambda iface: measure(lambda: iface.set_input_state(sim_clear_buffer=False, steer=65536), count), **kwargs)
+        print_result(name, result)
+
+    print(format_snapshot(metrics.snapshot()))
+
+
+def throughput(func, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+
+    return count / (time.perf_counter() - start)
+
+
+def legacy_send_message(iface: TMInterface, msg: Message):
+    # The way _send_message wrote messages before they were packed into the buffer directly
+    data = msg.to_data()
+    iface.mfile.seek(0)
+    iface.mfile.write(data)
+    iface.mfile.seek(1)
+    iface.mfile.write(bytearray([0xFF]))
+
+
+def legacy_set_input_state(iface: TMInterface, **kwargs):
+    msg = Message(MessageType.C_SET_INPUT_STATES)
+    for name in ['left', 'right', 'accelerate', 'brake']:
+        if name in kwargs:
+            msg.write_int32(int(kwargs[name]))
+        else:
+            msg.write_int32(-1)
+
+    for name in ['steer', 'gas']:
+        if name in kwargs:
+            msg.write_int32(kwargs[name])
+        else:
+            msg.write_int32(MAXINT32)
+
+    legacy_send_message(iface, msg)
+
+
+def legacy_rewind_to_state(iface: TMInterface, state: SimStateData):
+    msg = Message(MessageType.C_SIM_REWIND_TO_STATE)
+    msg.write_buffer(state.data)
+    legacy_send_message(iface, msg)
+
+
+def legacy_processed_call(iface: TMInterface, msgtype: int):
+    msg = Message(MessageType.C_PROCESSED_CALL)
+    msg.write_int32(msgtype)
+    legacy_send_message(iface, msg)
+
+
+def set_input_state(iface: TMInterface, **kwargs):
+    # The encoding part of TMInterface.set_input_state
+    iface._send_template(
+        MessageType.C_SET_INPUT_STATES,
+        int(kwargs.get('left', -1)),
+        int(kwargs.get('right', -1)),
+        int(kwargs.get('accelerate', -1)),
+        int(kwargs.get('brake', -1)),
+        kwargs.get('steer', MAXINT32),
+        kwargs.get('gas', MAXINT32)
+    )
+
+
+def benchmark_message_encoding(count: int):
+    print('Message encoding throughput, without waiting for the server:')
+
+    # Encode into an anonymous mapping, so that no server has to consume the messages
+    iface = TMInterface(SERVER_NAME)
+    iface.mfile = mmap.mmap(-1, iface.buffer_size)
+    iface.buffer = memoryview(iface.mfile)
+    iface.header = iface.buffer[:4].cast('i')
+
+    state = SimStateData()
+    state.data = bytearray(SimStateData.min_size + 12 + 20 * 4 + 60 * 8)
+
+    calls = [
+        (
+            'set_input_state',
+            lambda: legacy_set_input_state(iface, accelerate=True, steer=-65536),
+            lambda: set_input_state(iface, accelerate=True, steer=-65536)
+        ),
+        (
+            'rewind_to_state',
+            lambda: legacy_rewind_to_state(iface, state),
+            lambda: iface._send_template(MessageType.C_SIM_REWIND_TO_STATE, data=state.data)
+        ),
+        (
+            'C_PROCESSED_CALL',
+            lambda: legacy_processed_call(iface, MessageType.S_ON_RUN_STEP),
+            lambda: iface._respond_to_call(MessageType.S_ON_RUN_STEP)
+        ),
+    ]
+
+    for name, legacy, template in calls:
+        legacy_rate = throughput(legacy, count)
+        template_rate = throughput(template, count)
+        print(f'{name:<28} Message {legacy_rate:10.0f} msgs/s  MessageTemplate {template_rate:10.0f} msgs/s  '
+              f'({template_rate / legacy_rate:.1f}x)')
+
+    iface.header.release()
+    iface.buffer.release()
+    iface.mfile.close()
+
+
+def legacy_set_event_buffer(iface: TMInterface, data: EventBufferData):
+    # The way set_event_buffer encoded the buffer before the events were serialized at once
+    msg = Message(MessageType.C_SIM_SET_EVENT_BUFFER)
+    for _ in range(10):
+        msg.write_int32(-1)
+
+    msg.write_int32(data.events_duration)
+    msg.write_uint32(len(data.events))
+    for event in data.events:
+        msg.write_buffer(event.data)
+
+    legacy_send_message(iface, msg)
+
+
+def benchmark_event_buffer_encoding(count: int):
+    print('set_event_buffer encoding throughput, without waiting for the server:')
+
+    iface = TMInterface(SERVER_NAME, LARGE_BUFFER_SIZE)
+    iface.mfile = mmap.mmap(-1, iface.buffer_size)
+    iface.buffer = memoryview(iface.mfile)
+    iface.header = iface.buffer[:4].cast('i')
+
+    for events in [1000, 10000, 100000]:
+        array = np.zeros(events, dtype=EVENT_DTYPE)
+        array['time'] = np.arange(100010 + events * 10, 100010, -10)
+        array['input_data'] = (6 << 24) | np.arange(events) % 65536
+
+        # A buffer with its events as Event objects, as built by the client, and one
+        # with the events still in the array it was received in
+        objects = EventBufferData.from_array(0, array.copy())
+        objects.events
+        received = EventBufferData.from_array(0, array)
+
+        n = max(count // events, 1)
+        legacy_rate = throughput(lambda: legacy_set_event_buffer(iface, objects), n)
+        objects_rate = throughput(lambda: iface._send_event_buffer(objects), n)
+        received_rate = throughput(lambda: iface._send_event_buffer(received), n)
+        print(f'{events:>6} events  Message {legacy_rate:8.0f} msgs/s  Event list {objects_rate:8.0f} msgs/s  '
+              f'({objects_rate / legacy_rate:.1f}x)  array {received_rate:8.0f} msgs/s ({received_rate / legacy_rate:.1f}x)')
+
+    iface.header.release()
+    iface.buffer.release()
+    iface.mfile.close()
+
+
+def benchmark_event_buffer_copies(count: int):
+    print('Event buffer copy, add, sort and encode throughput, as done for each bruteforce attempt:')
+
+    for events in [100, 1000, 10000]:
+        array = np.zeros(events, dtype=EVENT_DTYPE)
+        array['time'] = np.arange(100010 + events * 10, 100010, -10)
+        array['input_data'] = (4 << 24) | np.arange(events) % 65536
+        names = [f'Event{i}' for i in range(4)] + [ANALOG_STEER_NAME]
+
+        objects = EventBufferData.from_array(0, array.copy(), names)
+        objects.events
+        arrays = ArrayEventBufferData.from_array(0, array.copy(), names[:])
+
+        def attempt(base):
+            data = base.copy()
+            data.add(events * 5, ANALOG_STEER_NAME, 65536)
+            data.sort()
+            data.to_bytes()
+
+        n = max(count // events, 1)
+        objects_rate = throughput(lambda: attempt(objects), n)
+        arrays_rate = throughput(lambda: attempt(arrays), n)
+        print(f'{events:>6} events  EventBufferData {objects_rate:8.0f} attempts/s  '
+              f'ArrayEventBufferData {arrays_rate:8.0f} attempts/s ({arrays_rate / objects_rate:.1f}x)')
+
+
+def legacy_read_string(iface: TMInterface) -> str:
+    # The way strings were read before they were decoded with a single slice
+    size = iface._read_int32()
+    return ''.join([chr(iface._read_uint8()) for _ in range(size)])
+
+
+def legacy_read_custom_command(iface: TMInterface) -> tuple:
+    iface.mfile.seek(8)
+    _from = iface._read_int32()
+    to = iface._read_int32()
+    n_args = iface._read_int32()
+    command = legacy_read_string(iface)
+    args = [legacy_read_string(iface) for _ in range(n_args)]
+    return _from, to, command, args
+
+
+def write_custom_command(iface: TMInterface, command: str, args: list):
+    msg = Message(MessageType.S_ON_CUSTOM_COMMAND)
+    msg.write_int32(0)
+    msg.write_int32(-1)
+    msg.write_int32(len(args))
+    for string in [command] + args:
+        data = string.encode('latin-1')
+        msg.write_int32(len(data))
+        msg.write_buffer(data)
+
+    iface.buffer[:len(msg)] = msg.to_data()
+
+
+def benchmark_command_decoding(count: int):
+    print('Custom command decoding throughput, without waiting for the server:')
+
+    iface = TMInterface(SERVER_NAME)
+    iface.mfile = mmap.mmap(-1, iface.buffer_size)
+    iface.buffer = memoryview(iface.mfile)
+    iface.header = iface.buffer[:4].cast('i')
+
+    script = '\n'.join(f'{i * 10} steer {i * 1000 % 65536}' for i in range(200))
+    payloads = [
+        ('no arguments', 'finish', []),
+        ('file path', 'load_state', ['C:\\Users\\Player\\Documents\\TMInterface\\States\\A01-Race_best.bin']),
+        ('several arguments', 'set_range', ['0', '10000', 'steer', '-65536', '65536']),
+        (f'script ({len(script)} bytes)', 'load_inputs', [script]),
+    ]
+
+    for name, command, args in payloads:
+        write_custom_command(iface, command, args)
+        expected = (0, -1, command, args)
+        assert legacy_read_custom_command(iface) == expected
+        assert iface._parse_server_call(MessageType.S_ON_CUSTOM_COMMAND, None)[2] == expected
+
+        def bulk():
+            iface.mfile.seek(8)
+            iface._parse_server_call(MessageType.S_ON_CUSTOM_COMMAND, None)
+
+        legacy_rate = throughput(lambda: legacy_read_custom_command(iface), count)
+        bulk_rate = throughput(bulk, count)
+        print(f'{name:<28} per element {legacy_rate:10.0f} calls/s  bulk {bulk_rate:10.0f} calls/s  '
+              f'({bulk_rate / legacy_rate:.1f}x)')
+
+    iface.header.release()
+    iface.buffer.release()
+    iface.mfile.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    benchmark_message_encoding(count * 10)
+    benchmark_command_decoding(count // 10)
+    benchmark_event_buffer_encoding(count * 10)
+    benchmark_event_buffer_copies(count * 10)
+    benchmark_state_decoding(count)
+    benchmark_fingerprints(count * 10)
+    benchmark_state_copies(count * 10)
+
+    stop = Event()
+    servers = []
+    for buffer_size in [DEFAULT_SERVER_SIZE, LARGE_BUFFER_SIZE]:
+        ready = Event()
+        server = Process(target=serve, args=(f'{SERVER_NAME}{buffer_size}', buffer_size, ready, stop))
+        server.start()
+        ready.wait()
+        servers.append(server)
+
+    try:
+        benchmark_wait_strategies(count)
+        benchmark_get_simulation_state(count)
+        benchmark_clear_modes(count)
+        benchmark_context_mode_cache(count)
+        benchmark_metrics(count)
+    finally:
+        stop.set()
+        for server in servers:
+            server.join()
+
+
+if __name__ == '__main__':
+    main()
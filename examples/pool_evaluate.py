@@ -0,0 +1,62 @@
+from tminterface.interface import TMInterface, MAXINT32
+from tminterface.pool import TMInterfacePool, EvaluationJob
+from tminterface.server import ReferenceServer
+from tminterface.constants import ANALOG_STEER_NAME
+import threading
+import time
+import sys
+
+
+# Evaluates random steering candidates on several instances in parallel.
+# The instances are reference servers simulating in background threads,
+# replace them with game instances validating a replay to run it for real.
+def evaluate_steer(iface: TMInterface, _time: int):
+    state = iface.get_simulation_state()
+    events = iface.get_event_buffer().find(event_name=ANALOG_STEER_NAME)
+    return state.race_time, sum(ev.analog_value for ev in events)
+
+
+def main():
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    server_names = [f'TMInterfacePool{i}' for i in range(instances)]
+
+    servers = []
+    for name in server_names:
+        server = ReferenceServer(name)
+        server.start()
+        servers.append(server)
+
+    pool = TMInterfacePool(server_names)
+    pool.start()
+
+    threads = []
+    for server in servers:
+        server.wait_for_registration()
+        thread = threading.Thread(target=server.simulate, args=(MAXINT32 - 10,))
+        thread.start()
+        threads.append(thread)
+
+    state = servers[0].state
+    jobs = []
+    for steer in range(-65536, 65537, 1024):
+        event_buffer = ReferenceServer.initial_event_buffer()
+        event_buffer.add(0, ANALOG_STEER_NAME, steer)
+        jobs.append(EvaluationJob(state, event_buffer, 1000, evaluate_steer))
+
+    start = time.perf_counter()
+    results = pool.evaluate(jobs)
+    elapsed = time.perf_counter() - start
+
+    best = max(range(len(jobs)), key=lambda i: results[i][1])
+    print(f'Evaluated {len(jobs)} jobs in {elapsed:.3f}s ({len(jobs) / elapsed:.0f} jobs/s)')
+    print(f'Best result {results[best]} on {jobs[best].server_name}')
+    print(f'Jobs per instance: {pool.jobs_completed()}')
+
+    pool.close()
+    for server, thread in zip(servers, threads):
+        thread.join()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+from tminterface.interface import TMInterface
+from tminterface.client import Client
+from tminterface.server import ReferenceServer
+import time
+
+
+# Runs a client against the reference server, without a game instance.
+# Useful for profiling client code: the simulation runs as fast as the
+# client is able to process the calls.
+class MainClient(Client):
+    def __init__(self) -> None:
+        super(MainClient, self).__init__()
+        self.state = None
+
+    def on_registered(self, iface: TMInterface) -> None:
+        print(f'Registered to {iface.server_name}')
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if _time == 0:
+            self.state = iface.get_simulation_state()
+
+        iface.set_input_state(sim_clear_buffer=False, accelerate=True)
+
+
+def main():
+    server = ReferenceServer('TMInterfaceReference')
+    server.start()
+
+    iface = TMInterface('TMInterfaceReference')
+    iface.register(MainClient())
+    server.wait_for_registration()
+
+    start = time.perf_counter()
+    server.simulate(60000)
+    elapsed = time.perf_counter() - start
+    print(f'Simulated 60s of race time in {elapsed:.3f}s ({6000 / elapsed:.0f} steps/s)')
+
+    server.shutdown()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+from tminterface.interface import TMInterface, MessageType
+from tminterface.client import Client
+from tminterface.server import ReferenceServer
+from tminterface.recording import SessionRecorder, RecordKind, read_session
+from tminterface.replay import SessionReplayer
+import tempfile
+import os
+
+
+# Records a session of a client against the reference server, then replays it
+# without any server attached. The messages sent by the client during the replay
+# are recorded as well and compared with the original session, which is how
+# a change to a hook implementation can be checked for regressions.
+class MainClient(Client):
+    def __init__(self) -> None:
+        super(MainClient, self).__init__()
+        self.state = None
+
+    def on_simulation_begin(self, iface: TMInterface):
+        iface.remove_state_validation()
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if _time == 0:
+            self.state = iface.get_simulation_state()
+
+        if _time % 1000 == 0:
+            iface.set_input_state(sim_clear_buffer=False, accelerate=True, steer=_time * 10)
+
+
+def client_messages(path: str) -> list:
+    # The replayer only replays server calls, registering is done by the TMInterface thread
+    _, records = read_session(path)
+    return [(r.msgtype, r.data) for r in records if r.kind == RecordKind.CLIENT_MESSAGE and r.msgtype != MessageType.C_REGISTER]
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    recorded_path = os.path.join(directory, 'recorded.tmis')
+    replayed_path = os.path.join(directory, 'replayed.tmis')
+
+    server = ReferenceServer('TMInterfaceReplay0')
+    server.start()
+
+    recorder = SessionRecorder(recorded_path, server.buffer_size)
+    iface = TMInterface('TMInterfaceReplay0', server.buffer_size, recorder=recorder)
+    iface.register(MainClient())
+    server.wait_for_registration()
+    server.simulate(60000)
+    iface.close()
+    recorder.close()
+    server.stop()
+    print(f'Recorded {recorder.records} messages')
+
+    replayer = SessionReplayer(recorded_path)
+    recorder = SessionRecorder(replayed_path, replayer.buffer_size)
+    elapsed = replayer.replay(MainClient(), recorder=recorder)
+    recorder.close()
+    print(f'Replayed {replayer.calls_replayed} server calls in {elapsed:.3f}s '
+          f'({replayer.calls_replayed / elapsed:.0f} calls/s)')
+
+    if client_messages(recorded_path) == client_messages(replayed_path):
+        print('The replayed client sent the same messages as the recorded client')
+    else:
+        print('The replayed client sent different messages than the recorded client')
+
+    os.remove(recorded_path)
+    os.remove(replayed_path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
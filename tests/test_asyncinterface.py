@@ -0,0 +1,168 @@
+import asyncio
+import threading
+
+from tminterface.asyncinterface import AsyncTMInterface
+from tminterface.client import Client
+from tminterface.constants import BINARY_ACCELERATE_NAME
+from tminterface.server import ReferenceServer
+from tminterface.structs import BFEvaluationInfo, BFEvaluationResponse, BFEvaluationDecision
+
+INSTANCES = 3
+CHUNKED_BUFFER_SIZE = 4096
+CHUNKED_EVENT_COUNT = 3000
+
+
+class AsyncClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.registered = asyncio.Event()
+        self.steps = []
+        self.state = None
+        self.rewound = False
+        self.checkpoint_counts = []
+
+    async def on_registered(self, iface: AsyncTMInterface):
+        await iface.log('registered')
+        await iface.set_speed(2.0)
+        self.registered.set()
+
+    async def on_simulation_begin(self, iface: AsyncTMInterface):
+        await iface.remove_state_validation()
+        self.state = await iface.get_simulation_state()
+
+    async def on_simulation_step(self, iface: AsyncTMInterface, _time: int):
+        self.steps.append(_time)
+        await iface.set_input_state(steer=_time)
+        if _time == 50 and not self.rewound:
+            self.rewound = True
+            await iface.rewind_to_state(self.state)
+            # Let other instances run while this one waits
+            await asyncio.sleep(0.01)
+
+    def on_checkpoint_count_changed(self, iface: AsyncTMInterface, current: int, target: int):
+        self.checkpoint_counts.append((current, target))
+
+    async def on_bruteforce_evaluate(self, iface: AsyncTMInterface, info: BFEvaluationInfo) -> BFEvaluationResponse:
+        response = BFEvaluationResponse()
+        response.decision = BFEvaluationDecision.ACCEPT
+        return response
+
+
+async def run_instances(server_names: list) -> tuple:
+    servers = [ReferenceServer(name) for name in server_names]
+    for server in servers:
+        server.start()
+
+    ifaces = [AsyncTMInterface(name) for name in server_names]
+    clients = [AsyncClient() for _ in server_names]
+    try:
+        for iface, client in zip(ifaces, clients):
+            assert iface.register(client)
+
+        await asyncio.wait_for(asyncio.gather(*[client.registered.wait() for client in clients]), 5)
+
+        # The servers drive the simulations from their own threads, while one event loop runs all clients
+        def drive(server: ReferenceServer):
+            server.simulate(100)
+            server.responses = [server.bruteforce_evaluate(BFEvaluationInfo())]
+
+        threads = [threading.Thread(target=drive, args=(server,)) for server in servers]
+        for thread in threads:
+            thread.start()
+
+        while any(thread.is_alive() for thread in threads):
+            await asyncio.sleep(0.01)
+
+        context_mode = await ifaces[0].get_context_mode()
+        await asyncio.gather(*[iface.close() for iface in ifaces])
+        await asyncio.wait_for(asyncio.gather(*[iface.wait_closed() for iface in ifaces]), 5)
+    finally:
+        for server in servers:
+            server.stop()
+
+    return servers, ifaces, clients, context_mode
+
+
+def test_instances_on_one_event_loop():
+    server_names = [f'TMInterfaceTestAsync{i}' for i in range(INSTANCES)]
+    servers, ifaces, clients, context_mode = asyncio.run(run_instances(server_names))
+
+    assert context_mode == 0
+    for server, iface, client in zip(servers, ifaces, clients):
+        # The simulation continues after the rewound state
+        assert client.steps == list(range(0, 51, 10)) + list(range(10, 101, 10))
+        assert client.state is not None
+        assert len(client.checkpoint_counts) == 1
+        assert server.logs == [('log', 'registered')]
+        assert server.speed == 2.0
+        assert not server.state_validation
+        assert server.input_state
+        assert server.responses[0].decision == BFEvaluationDecision.ACCEPT
+        assert not iface.running
+
+
+class PollCountingInterface(AsyncTMInterface):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.response_polls = 0
+
+    async def _poll_response(self):
+        self.response_polls += 1
+        await super()._poll_response()
+
+
+class ChunkedClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.commands = []
+        self.results = {}
+
+    async def on_custom_command(self, iface: AsyncTMInterface, time_from: int, time_to: int, command: str, args: list):
+        self.commands.append((command, args))
+
+    async def on_simulation_step(self, iface: PollCountingInterface, _time: int):
+        if _time != 0:
+            return
+
+        event_buffer = await iface.get_event_buffer()
+        for i in range(CHUNKED_EVENT_COUNT):
+            event_buffer.add(i * 10, BINARY_ACCELERATE_NAME, i % 2 == 0)
+
+        # Every part of the transfer is awaited
+        iface.response_polls = 0
+        await iface.set_event_buffer(event_buffer)
+        self.results['send_polls'] = iface.response_polls
+
+        iface.response_polls = 0
+        self.results['event_buffer'] = await iface.get_event_buffer()
+        self.results['receive_polls'] = iface.response_polls
+        self.results['sent_event_buffer'] = event_buffer
+        self.results['state'] = await iface.get_simulation_state()
+
+
+def test_chunked_transfer():
+    server = ReferenceServer('TMInterfaceTestAsyncChunked0', CHUNKED_BUFFER_SIZE)
+    server.start()
+    client = ChunkedClient()
+
+    async def run():
+        iface = PollCountingInterface('TMInterfaceTestAsyncChunked0', CHUNKED_BUFFER_SIZE)
+        assert iface.register(client)
+        assert await asyncio.to_thread(server.wait_for_registration, 5)
+        await asyncio.to_thread(server.custom_command, -1, -1, 'load', ['x' * (2 * CHUNKED_BUFFER_SIZE)])
+        await asyncio.to_thread(server.simulate, 10)
+        await iface.close()
+        await asyncio.wait_for(iface.wait_closed(), 5)
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+
+    sent = client.results['sent_event_buffer'].to_array()
+    parts = -(-sent.nbytes // CHUNKED_BUFFER_SIZE)
+    assert client.commands == [('load', ['x' * (2 * CHUNKED_BUFFER_SIZE)])]
+    assert client.results['send_polls'] >= parts
+    assert client.results['receive_polls'] >= parts
+    assert sorted(client.results['event_buffer'].to_array().tolist()) == sorted(sent.tolist())
+    assert len(client.results['state'].data) > CHUNKED_BUFFER_SIZE
@@ -0,0 +1,80 @@
+import pytest
+
+from tminterface.client import Client
+from tminterface.interface import TMInterface, BufferClearMode
+from tminterface.server import ReferenceServer
+
+
+class CallsClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.results = []
+        self.dirty_calls = []
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if _time not in (100, 200):
+            return
+
+        def call(name: str, func):
+            result = func()
+            if any(iface.buffer):
+                self.dirty_calls.append((_time, name))
+
+            return result
+
+        call('set_input_state', lambda: iface.set_input_state(accelerate=True, steer=-20000 - _time))
+        state = call('get_simulation_state', iface.get_simulation_state)
+        event_buffer = call('get_event_buffer', iface.get_event_buffer)
+
+        state.position = [_time, 50, 500]
+        call('rewind_to_state', lambda: iface.rewind_to_state(state))
+        rewound = call('get_simulation_state', iface.get_simulation_state)
+
+        self.results.append((
+            bytes(state.data),
+            [(event.time, event.input_data) for event in event_buffer.events],
+            bytes(rewound.data),
+        ))
+
+
+def run_session(server_name: str, clear_mode: BufferClearMode) -> tuple:
+    server = ReferenceServer(server_name)
+    server.start()
+    iface = TMInterface(server_name, clear_mode=clear_mode)
+    client = CallsClient()
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+        server.simulate(300)
+    finally:
+        server.shutdown()
+        server.stop()
+
+    return server, client
+
+
+@pytest.fixture(scope='module')
+def full_session():
+    return run_session('TMInterfaceTestClearModes0', BufferClearMode.FULL)
+
+
+@pytest.mark.parametrize('clear_mode', [BufferClearMode.DIRTY, BufferClearMode.HEADER], ids=lambda mode: mode.name)
+def test_results_match_full_clearing(full_session, clear_mode):
+    full_server, full_client = full_session
+    server, client = run_session(f'TMInterfaceTestClearModes{int(clear_mode)}', clear_mode)
+
+    assert len(client.results) == 2
+    assert client.results == full_client.results
+    assert server.input_state == full_server.input_state
+    assert bytes(server.state.data) == bytes(full_server.state.data)
+
+
+@pytest.mark.parametrize('clear_mode', [BufferClearMode.FULL, BufferClearMode.DIRTY], ids=lambda mode: mode.name)
+def test_buffer_is_zero_after_each_call(full_session, clear_mode):
+    if clear_mode == BufferClearMode.FULL:
+        client = full_session[1]
+    else:
+        client = run_session('TMInterfaceTestClearModes3', clear_mode)[1]
+
+    assert len(client.results) == 2
+    assert client.dirty_calls == []
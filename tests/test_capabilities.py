@@ -0,0 +1,77 @@
+import pytest
+
+from tminterface.client import Client
+from tminterface.constants import BINARY_ACCELERATE_NAME
+from tminterface.interface import TMInterface, ServerException, CAPABILITY_CHUNKED_TRANSFER
+from tminterface.server import ReferenceServer
+
+BUFFER_SIZE = 4096
+EVENT_COUNT = 3000
+
+
+class LargeMessageClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.results = {}
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if _time != 0:
+            return
+
+        self.results['log'] = self._try(lambda: iface.log('small message'))
+
+        event_buffer = iface.get_event_buffer()
+        for i in range(EVENT_COUNT):
+            event_buffer.add(i * 10, BINARY_ACCELERATE_NAME, i % 2 == 0)
+
+        self.results['set_event_buffer'] = self._try(lambda: iface.set_event_buffer(event_buffer))
+        self.results['execute_command'] = self._try(lambda: iface.execute_command('x' * (2 * BUFFER_SIZE)))
+
+    @staticmethod
+    def _try(func):
+        try:
+            func()
+            return None
+        except ServerException as e:
+            return e
+
+
+def run_session(server_name: str, **server_kwargs) -> tuple:
+    server = ReferenceServer(server_name, BUFFER_SIZE, **server_kwargs)
+    server.start()
+    iface = TMInterface(server_name, BUFFER_SIZE)
+    client = LargeMessageClient()
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+        server.simulate(50)
+    finally:
+        server.shutdown()
+        server.stop()
+
+    return server, iface, client
+
+
+def test_negotiated_chunked_transfer():
+    server, iface, client = run_session('TMInterfaceTestCapabilities0')
+
+    assert iface.server_capabilities == CAPABILITY_CHUNKED_TRANSFER
+    assert server.capabilities == CAPABILITY_CHUNKED_TRANSFER
+    assert client.results == {'log': None, 'set_event_buffer': None, 'execute_command': None}
+    assert len(server.event_buffer.events) == EVENT_COUNT + 1
+    assert server.executed_commands == ['x' * (2 * BUFFER_SIZE)]
+
+
+@pytest.mark.parametrize('server_kwargs', [{'legacy': True}, {'chunked_transfer': False}], ids=['legacy', 'unsupported'])
+def test_fallback_without_chunked_transfer(server_kwargs):
+    server, iface, client = run_session('TMInterfaceTestCapabilities1', **server_kwargs)
+
+    # Oversized messages fail on the client instead of being sent in parts the server does not expect
+    assert iface.server_capabilities == 0
+    assert server.capabilities == 0
+    assert client.results['log'] is None
+    assert isinstance(client.results['set_event_buffer'], ServerException)
+    assert isinstance(client.results['execute_command'], ServerException)
+    assert len(server.event_buffer.events) == 1
+    assert server.executed_commands == []
+    assert server.logs == [('log', 'small message')]
@@ -0,0 +1,40 @@
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData
+
+
+def make_cp_data(passed: int) -> CheckpointData:
+    # 3 checkpoints (the last one being the finish) and 2 laps
+    return CheckpointData([False] * 3, [CheckpointTime(time=i * 1000 if i < passed else -1) for i in range(6)])
+
+
+def make_state(passed: int) -> SimStateData:
+    state = SimStateData()
+    state.cp_data = make_cp_data(passed)
+    state = SimStateData(bytearray(state.data))
+    state.invalidate_cp_data()
+    return state
+
+
+def test_counts_follow_replaced_checkpoint_data():
+    state = make_state(0)
+    assert state.checkpoint_counts == (0, 6, 0)
+
+    state.cp_data = make_cp_data(4)
+    assert state.checkpoint_counts == (4, 6, 1)
+
+
+def test_counts_follow_checkpoint_data_modified_in_place():
+    state = make_state(3)
+    assert state.checkpoint_counts == (3, 6, 1)
+
+    state.cp_data.cp_times[3].time = 4000
+    assert state.checkpoint_counts == (4, 6, 1)
+
+
+def test_counts_of_copies_are_independent():
+    state = make_state(3)
+    assert state.checkpoint_counts == (3, 6, 1)
+
+    copy = state.copy()
+    copy.cp_data = make_cp_data(6)
+    assert copy.checkpoint_counts == (6, 6, 2)
+    assert state.checkpoint_counts == (3, 6, 1)
@@ -0,0 +1,89 @@
+import asyncio
+
+from tminterface.asyncinterface import AsyncTMInterface
+from tminterface.client import Client
+from tminterface.interface import TMInterface
+from tminterface.server import ReferenceServer
+from tminterface.structs import BFEvaluationInfo
+
+
+class ClosingClient(Client):
+    def __init__(self, close_time: int):
+        super().__init__()
+        self.close_time = close_time
+        self.steps = []
+        self.deregistered = False
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        self.steps.append(_time)
+        if _time == self.close_time:
+            iface.close()
+
+    def on_bruteforce_evaluate(self, iface: TMInterface, info: BFEvaluationInfo):
+        iface.close()
+
+    def on_deregistered(self, iface: TMInterface):
+        self.deregistered = True
+
+
+class AsyncClosingClient(Client):
+    def __init__(self, close_time: int):
+        super().__init__()
+        self.close_time = close_time
+        self.steps = []
+
+    async def on_simulation_step(self, iface: AsyncTMInterface, _time: int):
+        self.steps.append(_time)
+        if _time == self.close_time:
+            await iface.close()
+
+
+def test_close_in_step():
+    server = ReferenceServer('TMInterfaceTestCloseInHook0', 4096)
+    server.start()
+    iface = TMInterface('TMInterfaceTestCloseInHook0', 4096)
+    client = ClosingClient(50)
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+        server.simulate(1000)
+        assert not server.registered
+    finally:
+        server.stop()
+
+    assert client.steps == [0, 10, 20, 30, 40, 50]
+    assert client.deregistered and iface.wait_closed(5)
+
+
+def test_close_in_bruteforce_evaluate():
+    server = ReferenceServer('TMInterfaceTestCloseInHook1', 4096)
+    server.start()
+    iface = TMInterface('TMInterfaceTestCloseInHook1', 4096)
+    try:
+        iface.register(ClosingClient(-1))
+        assert server.wait_for_registration(5)
+        server.bruteforce_evaluate(BFEvaluationInfo())
+        assert not server.registered
+    finally:
+        server.stop()
+
+
+def test_async_close_in_step():
+    server = ReferenceServer('TMInterfaceTestCloseInHook2', 4096)
+    server.start()
+    client = AsyncClosingClient(30)
+
+    async def run():
+        iface = AsyncTMInterface('TMInterfaceTestCloseInHook2', 4096)
+        assert iface.register(client)
+        await asyncio.wait_for(asyncio.to_thread(server.wait_for_registration, 5), 5)
+        await asyncio.wait_for(asyncio.to_thread(server.simulate, 1000), 5)
+        await asyncio.wait_for(iface.wait_closed(), 5)
+
+    try:
+        asyncio.run(run())
+        assert not server.registered
+    finally:
+        server.stop()
+
+    assert client.steps == [0, 10, 20, 30]
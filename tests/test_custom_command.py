@@ -0,0 +1,48 @@
+import struct
+
+from tminterface.client import Client
+from tminterface.interface import MessageType, TMInterface
+from tminterface.server import ReferenceServer
+
+
+class CommandClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.commands = []
+        self.exceptions = []
+
+    def on_custom_command(self, iface: TMInterface, time_from: int, time_to: int, command: str, args: list):
+        self.commands.append((time_from, time_to, command, args))
+
+    def on_client_exception(self, iface: TMInterface, exception: Exception):
+        self.exceptions.append(exception)
+
+
+def test_custom_commands():
+    server = ReferenceServer('TMInterfaceTestCustomCommand0', 4096)
+    server.start()
+    iface = TMInterface('TMInterfaceTestCustomCommand0', 4096)
+    client = CommandClient()
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+
+        # Strings are latin-1 on both sides, every byte is a character
+        server.custom_command(0, 100, 'load', ['Été.txt', '', 'x' * 1000])
+        server.custom_command(-1, -1, 'finish', [])
+
+        # A string longer than the message is reported, but the call is still processed
+        payload = struct.pack('iii', 10, 20, 1) + struct.pack('i', 4) + b'load' + struct.pack('i', 100000) + b'arg'
+        assert server.call(MessageType.S_ON_CUSTOM_COMMAND, payload) is not None
+        server.custom_command(-1, -1, 'after', ['error'])
+    finally:
+        server.shutdown()
+        server.stop()
+
+    assert client.commands == [
+        (0, 100, 'load', ['Été.txt', '', 'x' * 1000]),
+        (-1, -1, 'finish', []),
+        (10, 20, 'load', []),
+        (-1, -1, 'after', ['error']),
+    ]
+    assert len(client.exceptions) == 1 and isinstance(client.exceptions[0], struct.error)
@@ -0,0 +1,52 @@
+from tminterface.client import Client
+from tminterface.constants import BINARY_ACCELERATE_NAME
+from tminterface.interface import TMInterface
+from tminterface.server import ReferenceServer
+from tminterface.structs import BFEvaluationInfo
+
+
+class EventCountClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.counts = {}
+
+    def on_simulation_begin(self, iface: TMInterface):
+        self.counts['begin'] = len(iface.get_event_buffer().events)
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        self.counts[_time] = len(iface.get_event_buffer().events)
+        if _time == 10:
+            iface.execute_command('load inputs.txt')
+
+    def on_bruteforce_evaluate(self, iface: TMInterface, info: BFEvaluationInfo):
+        self.counts['bruteforce'] = len(iface.get_event_buffer().events)
+
+
+def run_session(server_name: str, **kwargs) -> dict:
+    # The server buffer is changed between the calls, as bruteforce or commands would
+    server = ReferenceServer(server_name)
+    server.start()
+    iface = TMInterface(server_name, **kwargs)
+    client = EventCountClient()
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+        server.simulation_begin()
+        server.event_buffer.add(100, BINARY_ACCELERATE_NAME, True)
+        server.bruteforce_evaluate(BFEvaluationInfo())
+        server.simulation_step(0)
+        server.simulation_step(10)
+        server.event_buffer.add(200, BINARY_ACCELERATE_NAME, True)
+        server.simulation_step(20)
+        server.simulation_end()
+    finally:
+        server.shutdown()
+        server.stop()
+
+    return client.counts
+
+
+def test_server_changes_are_seen():
+    expected = {'begin': 1, 'bruteforce': 2, 0: 2, 10: 2, 20: 3}
+    assert run_session('TMInterfaceTestEventBufferMirror0') == expected
+    assert run_session('TMInterfaceTestEventBufferMirror1', shadow_event_buffer=True) == expected
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from tminterface.constants import ANALOG_ACCELERATE_NAME, ANALOG_STEER_NAME, BINARY_ACCELERATE_NAME, BINARY_RACE_FINISH_NAME, \
+    BINARY_RACE_START_NAME
+from tminterface.eventbuffer import ArrayEventBufferData, EventBufferData
+
+CONTROL_NAMES = [BINARY_RACE_START_NAME, BINARY_RACE_FINISH_NAME, BINARY_ACCELERATE_NAME, ANALOG_STEER_NAME, ANALOG_ACCELERATE_NAME]
+
+
+def make_buffers() -> tuple:
+    # The same events, in a reference buffer and an array backed one
+    data = EventBufferData(5000)
+    data.control_names = CONTROL_NAMES[:]
+    data.clear()
+    data.add(0, BINARY_ACCELERATE_NAME, True)
+    for i, time in enumerate(range(0, 5000, 10)):
+        data.add(time, ANALOG_STEER_NAME, (i * 4099) % 131073 - 65536)
+
+    data.add(2000, BINARY_ACCELERATE_NAME, False)
+    data.add(5000, BINARY_RACE_FINISH_NAME, True)
+    return data, ArrayEventBufferData.from_buffer(data)
+
+
+def test_matches_event_buffer():
+    data, array_data = make_buffers()
+    assert array_data.to_bytes() == data.to_bytes()
+    assert [ev.analog_value for ev in array_data.events] == [ev.analog_value for ev in data.events]
+    assert [ev.binary_value for ev in array_data.events] == [ev.binary_value for ev in data.events]
+
+    data.sort()
+    array_data.sort()
+    assert array_data.to_bytes() == data.to_bytes()
+
+    queries = [
+        {},
+        {'time': 2000},
+        {'event_name': BINARY_ACCELERATE_NAME},
+        {'event_name': BINARY_ACCELERATE_NAME, 'value': False},
+        {'event_name': ANALOG_STEER_NAME, 'value': -65536},
+        {'event_name': ANALOG_STEER_NAME, 'value': 4099 - 65536, 'time': 10},
+    ]
+    for query in queries:
+        expected = [ev.data for ev in data.find(**query)]
+        assert expected and [ev.data for ev in array_data.find(**query)] == expected
+
+    with pytest.raises(ValueError):
+        array_data.find(event_name='Horn')
+
+
+def test_add_arrays():
+    data, array_data = make_buffers()
+    times = np.arange(0, 1000, 10)
+    values = np.linspace(-65536, 65536, len(times)).astype(np.int64)
+    array_data.add(times, ANALOG_ACCELERATE_NAME, values)
+    for time, value in zip(times.tolist(), values.tolist()):
+        data.add(time, ANALOG_ACCELERATE_NAME, value)
+
+    array_data.add(times, BINARY_ACCELERATE_NAME, True)
+    for time in times.tolist():
+        data.add(time, BINARY_ACCELERATE_NAME, True)
+
+    assert array_data.to_bytes() == data.to_bytes()
+    with pytest.raises(ValueError):
+        array_data.add(0, 'Horn', True)
+
+
+def test_copies_share_until_modified():
+    _, base = make_buffers()
+    original = base.to_bytes()
+
+    cpy = base.copy()
+    assert cpy._array is base._array
+    cpy.add(100, ANALOG_STEER_NAME, 1000)
+    cpy.events[0].time = 100500
+    assert base.to_bytes() == original
+    assert cpy.to_bytes()[8:len(original)] == original[8:]
+
+    cpy = base.copy()
+    base.sort()
+    base.clear()
+    assert len(cpy.events) * 8 == len(original) and cpy.to_bytes() == original
+    assert len(base.events) == 1 and base.events[0].name_index == 0
+
+    cpy.events = [ev for ev in cpy.events if ev.name_index != CONTROL_NAMES.index(ANALOG_STEER_NAME)]
+    assert len(cpy.find(event_name=ANALOG_STEER_NAME)) == 0
+    assert len(cpy.events) == 4
@@ -0,0 +1,59 @@
+import numpy as np
+
+from tminterface.fingerprint import StateFingerprinter, fingerprint
+from tminterface.statebatch import SimStateBatch
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData
+
+# The pointer to the owning object of dyna.current_state, masked out
+CURRENT_STATE_OWNER_OFFSET = 848
+
+
+def make_state(seed: int = 0) -> SimStateData:
+    state = SimStateData()
+    state.cp_data = CheckpointData([False] * 3, [CheckpointTime(time=-1) for _ in range(6)])
+    rng = np.random.default_rng(seed)
+    state = SimStateData(bytearray(rng.integers(0, 256, len(state.data), dtype=np.uint8).tobytes()))
+    state.flags = 0xFFFFFFFF
+    state.cp_data = CheckpointData([False] * 3, [CheckpointTime(time=-1) for _ in range(6)])
+    state = SimStateData(bytearray(state.data))
+    state.invalidate_cp_data()
+    return state
+
+
+def test_equal_for_identical_physics():
+    state = make_state()
+    key = fingerprint(state)
+    assert fingerprint(SimStateData(bytearray(state.data))) == key
+
+    # Fields outside of the physics regions and masked fields are not hashed
+    other = SimStateData(bytearray(state.data))
+    other.timers[1] = 12345
+    other.player_info.race_time = 12345
+    other.data[CURRENT_STATE_OWNER_OFFSET:CURRENT_STATE_OWNER_OFFSET + 4] = b'\x01\x02\x03\x04'
+    assert fingerprint(other) == key
+
+    other.position = [1, 2, 3]
+    assert fingerprint(other) != key
+
+
+def test_checkpoints():
+    state = make_state()
+    other = SimStateData(bytearray(state.data))
+    other.invalidate_cp_data()
+    other.cp_data.cp_times[0].time = 1000
+    other.cp_data = other.cp_data
+
+    assert fingerprint(other) != fingerprint(state)
+    fingerprinter = StateFingerprinter(include_checkpoints=False)
+    assert fingerprinter.fingerprint(other) == fingerprinter.fingerprint(state)
+
+
+def test_batch_matches_states():
+    states = [make_state(i % 4) for i in range(10)]
+    batch = SimStateBatch.from_states(states)
+    for fingerprinter in [StateFingerprinter(), StateFingerprinter(('scene_mobil',), False)]:
+        expected = [fingerprinter.fingerprint(state) for state in states]
+        assert fingerprinter.fingerprint_batch(batch).tolist() == expected
+        assert len(set(expected)) == 4
+
+    assert len(StateFingerprinter().fingerprint_batch(SimStateBatch(len(states[0].data)))) == 0
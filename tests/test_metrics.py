@@ -0,0 +1,58 @@
+import threading
+
+from tminterface.client import Client
+from tminterface.interface import TMInterface
+from tminterface.metrics import Metrics, MetricsReporter
+from tminterface.server import ReferenceServer
+
+
+class CallsClient(Client):
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        # Every step records a new set of keys, while the reporter takes snapshots
+        if _time % 30 == 0:
+            iface.get_simulation_state()
+        elif _time % 30 == 10:
+            iface.set_speed(1.0)
+        else:
+            iface.get_checkpoint_state()
+
+    def on_simulation_begin(self, iface: TMInterface):
+        iface.set_timeout(2000)
+
+
+def test_reporter_against_live_client():
+    errors = []
+    snapshots = []
+
+    def report(snapshot: dict):
+        snapshots.append(snapshot)
+
+    server = ReferenceServer('TMInterfaceTestMetrics0')
+    server.start()
+    metrics = Metrics()
+    iface = TMInterface('TMInterfaceTestMetrics0', metrics=metrics)
+    reporter = MetricsReporter(metrics, interval=0, report=report)
+    excepthook = threading.excepthook
+    threading.excepthook = lambda args: errors.append(args.exc_value)
+    try:
+        reporter.start()
+        iface.register(CallsClient())
+        assert server.wait_for_registration(5)
+        for _ in range(5):
+            metrics.reset()
+            server.simulate(300)
+
+        assert reporter.thread.is_alive()
+    finally:
+        reporter.stop()
+        threading.excepthook = excepthook
+        server.shutdown()
+        server.stop()
+
+    assert errors == []
+    assert snapshots
+    names = set()
+    for snapshot in snapshots:
+        names.update(snapshot['round_trips'])
+
+    assert {'C_SIM_GET_STATE', 'C_SET_GAME_SPEED', 'C_GET_CHECKPOINT_STATE', 'C_SET_TIMEOUT'} <= names
@@ -0,0 +1,62 @@
+import collections
+import threading
+
+from tminterface.constants import ANALOG_STEER_NAME
+from tminterface.interface import TMInterface, MAXINT32
+from tminterface.pool import TMInterfacePool, EvaluationJob
+from tminterface.server import ReferenceServer
+
+INSTANCES = 3
+JOBS = 40
+
+
+def test_evaluate_across_reference_servers():
+    server_names = [f'TMInterfaceTestPool{i}' for i in range(INSTANCES)]
+    servers = [ReferenceServer(name) for name in server_names]
+    for server in servers:
+        server.start()
+
+    pool = TMInterfacePool(server_names)
+    pool.start()
+
+    threads = []
+    for server in servers:
+        assert server.wait_for_registration(5)
+        thread = threading.Thread(target=server.simulate, args=(MAXINT32 - 10,))
+        thread.start()
+        threads.append(thread)
+
+    evaluations = collections.Counter()
+    lock = threading.Lock()
+
+    def metrics(index: int):
+        def evaluate(iface: TMInterface, _time: int):
+            with lock:
+                evaluations[index] += 1
+
+            events = iface.get_event_buffer().find(event_name=ANALOG_STEER_NAME)
+            return index, _time, [event.analog_value for event in events]
+
+        return evaluate
+
+    jobs = []
+    for i in range(JOBS):
+        event_buffer = ReferenceServer.initial_event_buffer()
+        event_buffer.add(0, ANALOG_STEER_NAME, i * 1000)
+        jobs.append(EvaluationJob(servers[0].state, event_buffer, 500, metrics(i)))
+
+    try:
+        results = pool.evaluate(jobs, timeout=10)
+        completed = pool.jobs_completed()
+    finally:
+        pool.close()
+        for server, thread in zip(servers, threads):
+            thread.join(5)
+            server.stop()
+
+    # Results come back in submission order, each job is evaluated exactly once
+    assert results == [(i, 500, [i * 1000]) for i in range(JOBS)]
+    assert evaluations == {i: 1 for i in range(JOBS)}
+    assert set(completed) == set(server_names)
+    assert sum(completed.values()) == JOBS
+    assert collections.Counter(job.server_name for job in jobs) == {name: n for name, n in completed.items() if n}
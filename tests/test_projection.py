@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from tminterface.projection import StateProjection
+from tminterface.statebatch import SimStateBatch
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData
+
+
+def make_state(time: int) -> SimStateData:
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.cp_data = CheckpointData([False] * 3, [CheckpointTime(time=-1) for _ in range(6)])
+    state = SimStateData(bytearray(state.data))
+    state.invalidate_cp_data()
+    state.timers[1] = time
+    state.position = [time, 1, 2]
+    state.velocity = [0, 0, time / 10]
+    state.scene_mobil.last_has_any_lateral_contact_time = time - 50
+    state.simulation_wheels[2].real_time_state.has_ground_contact = True
+    state.simulation_wheels[0].steerable = time % 20 == 0
+    return state
+
+
+FIELDS = ['position', 'velocity', 'time', 'wheel_contacts', 'scene_mobil.last_has_any_lateral_contact_time', 'simulation_wheels.0.steerable']
+
+
+def test_unpack():
+    projection = StateProjection(FIELDS)
+    state = make_state(100)
+    position, velocity, time, contacts, lateral_contact_time, steerable = projection.unpack(state)
+    assert list(position) == state.position and list(velocity) == state.velocity
+    assert time == 100 and lateral_contact_time == 50
+    assert contacts == (0, 0, 1, 0) and steerable == 1
+    assert projection.shapes == [(3,), (3,), (), (4,), (), ()]
+
+    # Raw buffers are read at an offset
+    assert projection.unpack(b'\x00' * 16 + bytes(state.data), 16) == projection.unpack(state)
+
+
+def test_record_and_batch():
+    projection = StateProjection(FIELDS)
+    states = [make_state(i * 10) for i in range(6)]
+    records = projection.unpack_batch(SimStateBatch.from_states(states))
+    assert records.dtype == projection.dtype
+    for state, record in zip(states, records):
+        expected = projection.record(state)
+        assert expected.tobytes() == record.tobytes()
+        assert np.allclose(record['position'], state.position)
+        assert record['time'] == state.timers[1]
+
+
+@pytest.mark.parametrize('field', ['dyna', 'timers.1000', 'timers.1.x', 'dyna.unknown', 'position.x'])
+def test_invalid_fields(field):
+    with pytest.raises(ValueError):
+        StateProjection([field])
@@ -0,0 +1,81 @@
+import pytest
+
+from tminterface.client import Client
+from tminterface.constants import DEFAULT_SERVER_SIZE
+from tminterface.interface import TMInterface, MessageType
+from tminterface.recording import RecordKind, SessionRecorder, read_session
+from tminterface.replay import ReplayMismatchException, SessionReplayer
+from tminterface.server import ReferenceServer
+
+
+class ReadingClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.steps = []
+        self.results = None
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        self.steps.append(_time)
+        if _time == 100:
+            state = iface.get_simulation_state()
+            cp_data = iface.get_checkpoint_state()
+            event_buffer = iface.get_event_buffer()
+            self.results = (bytes(state.data), bytes(cp_data.data), [(ev.time, ev.input_data) for ev in event_buffer.events])
+
+
+class DivergingClient(Client):
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if _time == 100:
+            iface.get_context_mode()
+            iface.get_simulation_state()
+
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('recording') / 'session.tmrec')
+    server = ReferenceServer('TMInterfaceTestRecording0')
+    server.start()
+    recorder = SessionRecorder(path, server.buffer_size)
+    iface = TMInterface('TMInterfaceTestRecording0', recorder=recorder)
+    client = ReadingClient()
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+        server.simulate(500)
+        server.shutdown()
+    finally:
+        server.stop()
+        recorder.close()
+
+    return path, client
+
+
+def test_recorded_session(session):
+    path, client = session
+    buffer_size, records = read_session(path)
+
+    assert buffer_size == DEFAULT_SERVER_SIZE
+    calls = [record.msgtype for record in records if record.kind == RecordKind.SERVER_CALL]
+    assert calls.count(MessageType.S_ON_SIM_STEP) == len(client.steps)
+    assert MessageType.C_SIM_GET_STATE in [record.msgtype for record in records if record.kind == RecordKind.CLIENT_MESSAGE]
+
+
+def test_replay_reproduces_the_session(session):
+    path, client = session
+    replayed = ReadingClient()
+    replayer = SessionReplayer(path)
+    replayer.replay(replayed)
+
+    assert replayed.steps == client.steps
+    assert replayed.results == client.results
+    assert replayer.mismatches == 0
+
+
+def test_replay_detects_diverging_clients(session):
+    path, _ = session
+    with pytest.raises(ReplayMismatchException):
+        SessionReplayer(path).replay(DivergingClient())
+
+    replayer = SessionReplayer(path, strict=False)
+    replayer.replay(DivergingClient())
+    assert replayer.mismatches == 1
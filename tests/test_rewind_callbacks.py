@@ -0,0 +1,48 @@
+from tminterface.client import Client
+from tminterface.interface import TMInterface
+from tminterface.server import ReferenceServer
+from tminterface.structs import CheckpointData, CheckpointTime
+
+
+class RewindClient(Client):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if _time == 100:
+            iface.rewind_to_state(iface.get_simulation_state())
+
+
+class OverridingClient(RewindClient):
+    def on_checkpoint_count_changed(self, iface: TMInterface, current: int, target: int):
+        self.calls.append(('checkpoints', current, target))
+
+
+def run_session(server_name: str, client: Client):
+    server = ReferenceServer(server_name)
+    # A map of 3 checkpoints and 2 laps, for the lap count to be available
+    server.state.cp_data = CheckpointData([False] * 3, [CheckpointTime(time=-1) for _ in range(6)])
+    server.start()
+    iface = TMInterface(server_name)
+    try:
+        iface.register(client)
+        assert server.wait_for_registration(5)
+        server.simulate(200)
+    finally:
+        server.shutdown()
+        server.stop()
+
+
+def test_hook_overridden_in_class():
+    client = OverridingClient()
+    run_session('TMInterfaceTestRewindCallbacks0', client)
+    assert [call[0] for call in client.calls] == ['checkpoints']
+
+
+def test_hooks_assigned_on_instance():
+    client = RewindClient()
+    client.on_checkpoint_count_changed = lambda iface, current, target: client.calls.append(('checkpoints', current, target))
+    client.on_laps_count_changed = lambda iface, current: client.calls.append(('laps', current))
+    run_session('TMInterfaceTestRewindCallbacks1', client)
+    assert [call[0] for call in client.calls] == ['checkpoints', 'laps']
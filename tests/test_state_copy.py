@@ -0,0 +1,80 @@
+import numpy as np
+
+from tminterface import util
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData
+
+
+def make_state() -> SimStateData:
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.cp_data = CheckpointData([False] * 3, [CheckpointTime(time=-1) for _ in range(6)])
+    state = SimStateData(bytearray(state.data))
+    state.invalidate_cp_data()
+    state.position = [1, 2, 3]
+    return state
+
+
+def test_copy_shares_data_until_written():
+    state = make_state()
+    original = bytes(state.data)
+
+    copy = state.copy()
+    assert copy.data is state.data
+    assert copy.position == [1, 2, 3]
+    assert copy.data is state.data
+
+    copy.position = [4, 5, 6]
+    assert copy.data is not state.data
+    assert bytes(state.data) == original
+    assert state.position == [1, 2, 3]
+
+
+def test_writes_to_the_original_do_not_reach_the_copy():
+    state = make_state()
+    copy = state.copy()
+
+    state.position = [7, 8, 9]
+    state.timers[1] = 1000
+    assert copy.position == [1, 2, 3]
+    assert copy.time == 0
+
+
+def test_nested_structs_of_copies():
+    state = make_state()
+
+    copy = state.copy()
+    copy.dyna.current_state.position = [4, 5, 6]
+    assert state.position == [1, 2, 3]
+
+    copy = state.copy()
+    state.dyna.current_state.position = [7, 8, 9]
+    assert copy.position == [1, 2, 3]
+    assert state.position == [7, 8, 9]
+
+
+def test_structs_cached_before_copying():
+    state = make_state()
+    dyna = state.dyna
+    timers = state.timers
+    cp_data = state.cp_data
+
+    copy = state.copy()
+    dyna.current_state.position = [9, 9, 9]
+    timers[1] = 1000
+    cp_data.cp_times[0].time = 500
+    assert copy.position == [1, 2, 3]
+    assert copy.time == 0
+    assert copy.cp_data.cp_times[0].time == -1
+    assert state.position == [9, 9, 9]
+    assert state.time == 1000
+
+
+def test_rotation_matrix_setter_updates_quat():
+    state = make_state()
+    copy = state.copy()
+
+    matrix = [[0, 0, 1], [0, 1, 0], [-1, 0, 0]]
+    copy.rotation_matrix = matrix
+    assert np.allclose(copy.rotation_matrix, matrix)
+    assert np.allclose(list(copy.dyna.current_state.quat), util.mat3_to_quat(np.array(matrix, dtype=float)))
+    assert np.allclose(state.rotation_matrix, 0)
@@ -0,0 +1,39 @@
+from tminterface.statearchive import StateArchive
+from tminterface.structs import SimStateData
+
+
+def make_state(time: int) -> SimStateData:
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.timers[1] = time
+    state.position = [time, 0, 0]
+    return SimStateData(bytearray(state.data))
+
+
+def test_views_survive_growing_refreshing_and_closing(tmp_path):
+    path = str(tmp_path / 'run.tmsa')
+    writer = StateArchive.create(path, make_state(0), 0)
+    reader = StateArchive(path)
+
+    writer_view = writer.get(0, view=True)
+    reader_view = reader.get(0, view=True)
+
+    # Appending past the initial capacity grows the file and remaps it while views are alive
+    count = StateArchive.min_capacity * 2 + 1
+    for i in range(1, count):
+        assert writer.append(make_state(i * 10))
+
+    # The reader follows the writer past the end of its mapping
+    last_time = (count - 1) * 10
+    assert reader.get(last_time).position == [last_time, 0, 0]
+    assert reader.refresh() == count
+    assert reader.get(last_time, view=True).position == [last_time, 0, 0]
+
+    writer.close()
+    reader.close()
+    assert writer_view.position == [0, 0, 0]
+    assert reader_view.position == [0, 0, 0]
+
+    with StateArchive(path) as archive:
+        assert len(archive) == count
+        assert [archive.state(i).time for i in (0, -1)] == [0, last_time]
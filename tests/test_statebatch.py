@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from tminterface.statebatch import SimStateBatch, state_dtype
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData
+
+
+def make_state(time: int) -> SimStateData:
+    state = SimStateData()
+    state.flags = 0xFFFFFFFF
+    state.cp_data = CheckpointData([False] * 3, [CheckpointTime(time=-1) for _ in range(6)])
+    state = SimStateData(bytearray(state.data))
+    state.invalidate_cp_data()
+    state.timers[1] = time
+    state.position = [time, 1, 2]
+    state.velocity = [0, 0, time / 10]
+    state.player_info.race_time = time
+    state.simulation_wheels[2].real_time_state.has_ground_contact = True
+    return state
+
+
+def test_dtype_matches_struct_layout():
+    dtype = state_dtype()
+    state = SimStateData()
+    assert dtype.itemsize == SimStateData.min_size
+    assert dtype.fields['dyna'][1] == state.calc_field_offset(SimStateData.dyna_field)
+    assert dtype.fields['player_info'][1] == state.calc_field_offset(SimStateData.player_info_field)
+
+
+def test_accessors():
+    states = [make_state(i * 10) for i in range(5)]
+    batch = SimStateBatch.from_states(states)
+
+    assert len(batch) == 5
+    assert np.array_equal(batch.times, [0, 10, 20, 30, 40])
+    assert np.array_equal(batch.race_times, [0, 10, 20, 30, 40])
+    assert np.allclose(batch.positions, [state.position for state in states])
+    assert np.allclose(batch.velocities, [state.velocity for state in states])
+    assert np.array_equal(batch.wheel_contacts[0], [False, False, True, False])
+    assert batch.rotation_matrices.shape == (5, 3, 3)
+    assert batch.quats.shape == (5, 4)
+
+
+def test_states_round_trip_and_growth():
+    batch = SimStateBatch(capacity=2)
+    states = [make_state(i * 10) for i in range(9)]
+    batch.extend(states)
+
+    assert batch.capacity >= 9
+    for i, state in enumerate(states):
+        assert bytes(batch.state(i).data) == bytes(state.data)
+
+    copy = batch[-1]
+    assert copy.time == 80
+    assert copy.cp_data.cp_times_length == 6
+
+    view = batch.state(0, view=True)
+    view.position = [5, 5, 5]
+    assert np.allclose(batch.positions[0], [5, 5, 5])
+
+    batch.positions[1] = [7, 7, 7]
+    assert batch.state(1).position == [7, 7, 7]
+
+
+def test_state_size_mismatch():
+    batch = SimStateBatch.from_states([make_state(0)])
+    with pytest.raises(ValueError):
+        batch.append(SimStateData())
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from tminterface.statehistory import StateHistory
+from tminterface.structs import CheckpointData, CheckpointTime, SimStateData
+
+
+@pytest.fixture(scope='module')
+def base_data() -> bytes:
+    state = SimStateData()
+    state.cp_data = CheckpointData([False] * 5, [CheckpointTime(time=-1) for _ in range(5)])
+    # Random bytes, so that deltas only cover the fields changed between ticks
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 256, len(state.data), dtype=np.uint8).tobytes()
+
+
+def make_state(base_data: bytes, tick: int, seed: int = 0) -> SimStateData:
+    state = SimStateData(bytearray(base_data))
+    state.flags = 0xFFFFFFFF
+    state.position = [tick * 0.1, 5, tick + seed]
+    state.velocity = [tick, 1, 2]
+    state.timers[1] = tick * 10
+    return state
+
+
+@pytest.mark.parametrize('compression_level', [0, 6])
+@pytest.mark.parametrize('capacity, keyframe_interval', [(100, 10), (7, 10), (1, 1), (50, 3)])
+def test_states_round_trip(base_data, capacity, keyframe_interval, compression_level):
+    history = StateHistory(capacity, keyframe_interval, compression_level)
+    expected = {}
+    for tick in range(300):
+        state = make_state(base_data, tick)
+        history.append(state)
+        expected[tick * 10] = bytes(state.data)
+
+    # Rewinding and appending different states discards the newer ones
+    for tick in range(290, 320):
+        state = make_state(base_data, tick, seed=1000)
+        history.append(state)
+        expected[tick * 10] = bytes(state.data)
+
+    times = history.times
+    assert len(history) == len(times) == min(capacity, 320)
+    assert times == sorted(times) and times[-1] == 3190
+    for time in times:
+        assert bytes(history.get(time).data) == expected[time]
+
+    payloads = sum(len(payload) for group in history.groups for payload in group.payloads if payload is not None)
+    assert history.memory_usage == payloads
+
+
+def test_deltas_are_smaller_than_states(base_data):
+    history = StateHistory(100, 10)
+    for tick in range(100):
+        history.append(make_state(base_data, tick))
+
+    assert history.bytes_per_tick < len(base_data) / 5
+
+
+def test_missing_and_cleared_states(base_data):
+    history = StateHistory(10)
+    history.append(make_state(base_data, 0))
+    assert 0 in history
+    with pytest.raises(KeyError):
+        history.get(10)
+
+    with pytest.raises(ValueError):
+        history.append(SimStateData(bytearray(base_data[:-4])), 10)
+
+    history.clear()
+    assert len(history) == 0 and history.memory_usage == 0
+    with pytest.raises(ValueError):
+        StateHistory(0)
@@ -0,0 +1,406 @@
+import asyncio
+import inspect
+import struct
+import time
+
+from tminterface.interface import TMInterface, MessageType, CAPABILITIES_MAGIC, MODE_SIMULATION, RESPONSE_CHUNKED
+from tminterface.client import Client
+from tminterface.structs import CheckpointData, ClassicString, SimStateData
+from tminterface.eventbuffer import EventBufferData
+from tminterface.constants import DEFAULT_SERVER_SIZE
+
+
+class AsyncTMInterface(TMInterface):
+    """
+    AsyncTMInterface is an asyncio front-end of TMInterface. Every call to the server is a coroutine
+    and client hooks may be coroutine functions (async def), so that one event loop can drive
+    many instances at once and overlap waiting for the game with other I/O.
+
+    Instead of a thread, the client is run by a task created on the running event loop in register().
+    The task polls the shared buffer for server calls and awaits the client hooks. Waiting
+    for server responses is done by polling the message header from the event loop: the header
+    is checked spin_count times, yielding to other tasks between the checks, and then
+    with sleeps doubling from min_delay up to max_delay. While no server calls arrive,
+    the task polls for them in the same way.
+
+    Hooks that call the interface have to be coroutine functions and await the calls:
+
+        class MainClient(Client):
+            async def on_simulation_step(self, iface, _time: int):
+                state = await iface.get_simulation_state()
+
+    Calls are serialized per instance, so the interface can also be used from other tasks
+    while a hook is running. Apart from being coroutines, the calls behave the same as
+    in TMInterface, see its documentation for each of them. The parts of a message
+    larger than the buffer (see chunked_transfer) are exchanged by the same coroutine,
+    awaiting the response to each part.
+
+    Args:
+        server_name (str): the server tag to connect to
+        buffer_size (int): the buffer size used by the server
+        spin_count (int): the number of header checks before starting to sleep
+        min_delay (float): the first sleep time in seconds
+        max_delay (float): the maximum sleep time in seconds
+        **kwargs: additional keyword arguments passed to TMInterface
+
+    Attributes:
+        spin_count (int): the number of header checks before starting to sleep
+        min_delay (float): the first sleep time in seconds
+        max_delay (float): the maximum sleep time in seconds
+        task (asyncio.Task): the task running the client, None if no client is registered
+    """
+    def __init__(
+        self,
+        server_name='TMInterface0',
+        buffer_size=DEFAULT_SERVER_SIZE,
+        spin_count: int = 100,
+        min_delay: float = 0.00001,
+        max_delay: float = 0.001,
+        **kwargs
+    ):
+        super(AsyncTMInterface, self).__init__(server_name, buffer_size, **kwargs)
+        self.spin_count = spin_count
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.task = None
+        self.lock = None
+        self.pending_transfer = None
+        self.received_payload = None
+
+    def register(self, client: Client) -> bool:
+        """
+        Registers a client on the server, creating the task that runs it on the running event loop.
+
+        Must be called from a coroutine. After a successful registration, :meth:`Client.on_registered`
+        will be called with the instance of the AsyncTMInterface class.
+
+        Args:
+            client (Client): a Client instance to register
+
+        Returns:
+            True if registration was scheduled, False if client is already registered
+        """
+        if self.client is not None or self.registered:
+            return False
+
+        self.client = client
+        self.lock = asyncio.Lock()
+        self.task = asyncio.get_running_loop().create_task(self._main_loop())
+        return True
+
+    async def wait_closed(self):
+        """
+        Waits until the client task has finished, after the client has been closed
+        or the server has shut down.
+        """
+        if self.task is not None:
+            await self.task
+
+    async def close(self):
+        if self.lock is None:
+            self.running = False
+            self.close_event.set()
+            return
+
+        async with self.lock:
+            if self.registered:
+                self._send_template(MessageType.C_DEREGISTER, 0)
+                self.registered = False
+                await self._call_hook('on_deregistered')
+
+            self.context_mode = None
+            self.event_buffer = None
+            self.running = False
+            self.close_event.set()
+
+    async def set_timeout(self, timeout_ms: int):
+        await self._exchange(MessageType.C_SET_TIMEOUT, timeout_ms)
+
+    async def set_speed(self, speed: float):
+        await self._exchange(MessageType.C_SET_GAME_SPEED, speed)
+
+    async def set_input_state(self, sim_clear_buffer: bool = True, **kwargs):
+        if await self._in_simulation(sim_clear_buffer):
+            await self.clear_event_buffer()
+
+        await self._exchange(MessageType.C_SET_INPUT_STATES, *self._input_state_values(kwargs))
+        self.event_buffer_stale = True
+
+    async def respawn(self, sim_clear_events: bool = True):
+        if await self._in_simulation(sim_clear_events):
+            await self.clear_event_buffer()
+
+        await self._exchange(MessageType.C_RESPAWN, 0)
+        self.event_buffer_stale = True
+
+    async def give_up(self):
+        await self._exchange(MessageType.C_GIVE_UP, 0)
+
+    async def horn(self, sim_clear_events: bool = True):
+        if await self._in_simulation(sim_clear_events):
+            await self.clear_event_buffer()
+
+        await self._exchange(MessageType.C_HORN, 0)
+        self.event_buffer_stale = True
+
+    async def execute_command(self, command: str):
+        self.event_buffer = None
+        await self._exchange(MessageType.C_EXECUTE_COMMAND, 0, data=ClassicString(command).data)
+
+    async def remove_state_validation(self):
+        await self._exchange(MessageType.C_REMOVE_STATE_VALIDATION, 0)
+
+    async def prevent_simulation_finish(self):
+        await self._exchange(MessageType.C_PREVENT_SIMULATION_FINISH, 0)
+
+    async def rewind_to_state(self, state: SimStateData):
+        await self._exchange(MessageType.C_SIM_REWIND_TO_STATE, data=state.data)
+        for name, *args in self._rewind_callbacks(state):
+            await self._call_hook(name, *args)
+
+    async def set_checkpoint_state(self, data: CheckpointData):
+        await self._exchange(MessageType.C_SET_CHECKPOINT_STATE, data=data.data)
+
+    async def set_event_buffer(self, data: EventBufferData):
+        async with self.lock:
+            try:
+                self._send_event_buffer(data)
+                await self._wait_for_response()
+            except Exception:
+                self.event_buffer = None
+                raise
+
+        self._mirror_event_buffer(data)
+
+    async def get_context_mode(self) -> int:
+        if self.context_mode is not None:
+            self.round_trips_saved += 1
+            return self.context_mode
+
+        async with self.lock:
+            self._send_template(MessageType.C_GET_CONTEXT_MODE)
+            await self._wait_for_response(False)
+            return self._read_context_mode()
+
+    async def get_checkpoint_state(self) -> CheckpointData:
+        async with self.lock:
+            self._send_template(MessageType.C_GET_CHECKPOINT_STATE)
+            await self._wait_for_response(False)
+            return self._read_checkpoint_state()
+
+    async def get_simulation_state(self, state: SimStateData = None, view: bool = False) -> SimStateData:
+        async with self.lock:
+            self._send_template(MessageType.C_SIM_GET_STATE)
+            await self._wait_for_response(False)
+            return self._read_simulation_state(state, view)
+
+    async def get_event_buffer(self) -> EventBufferData:
+        if self.event_buffer is not None and not self.event_buffer_stale:
+            if self.check_event_buffer:
+                self._check_event_buffer(await self._request_event_buffer(), True)
+
+            return self.event_buffer.copy()
+
+        data = await self._request_event_buffer()
+        if self.shadow_event_buffer and self.simulating:
+            self.event_buffer = data.copy()
+            self.event_buffer_stale = False
+
+        return data
+
+    async def clear_event_buffer(self):
+        if self.event_buffer is not None:
+            if self.check_event_buffer:
+                self._check_event_buffer(await self._request_event_buffer(), not self.event_buffer_stale)
+
+            event_buffer = self._empty_event_buffer()
+        else:
+            event_buffer = await self.get_event_buffer()
+
+        event_buffer.clear()
+        await self.set_event_buffer(event_buffer)
+
+    async def set_simulation_time_limit(self, time: int):
+        await self._exchange(MessageType.C_SIM_SET_TIME_LIMIT, time)
+
+    async def register_custom_command(self, command: str):
+        async with self.lock:
+            self._send_template(MessageType.C_REGISTER_CUSTOM_COMMAND, 0, data=ClassicString(command).data)
+            await self._wait_for_response(False)
+            self._read_custom_command_response(command)
+
+    async def log(self, message: str, severity='log'):
+        async with self.lock:
+            self._send_message(self._log_message(message, severity))
+            await self._wait_for_response()
+
+    async def _exchange(self, msgtype: int, *values, data=None):
+        # Sends a message and waits for the server to process it
+        async with self.lock:
+            self._send_template(msgtype, *values, data=data)
+            await self._wait_for_response()
+
+    async def _request_event_buffer(self) -> EventBufferData:
+        async with self.lock:
+            self._send_template(MessageType.C_SIM_GET_EVENT_BUFFER)
+            await self._wait_for_response(False)
+            return self._read_event_buffer()
+
+    async def _in_simulation(self, clear_events: bool) -> bool:
+        if not clear_events:
+            self.round_trips_saved += 1
+            return False
+
+        return await self.get_context_mode() == MODE_SIMULATION
+
+    async def _call_hook(self, name: str, *args):
+        result = getattr(self.client, name)(self, *args)
+        if inspect.isawaitable(result):
+            result = await result
+
+        return result
+
+    async def _poll(self, condition):
+        # Polls the header until the condition is met, without blocking the event loop
+        for _ in range(self.spin_count):
+            if condition():
+                return
+
+            await asyncio.sleep(0)
+
+        delay = self.min_delay
+        while not condition():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_delay)
+
+    async def _wait_for_response(self, clear: bool = True):
+        if self.mfile is None:
+            return
+
+        if self.pending_transfer is not None:
+            # The message does not fit into the buffer, its parts are sent before waiting for the response
+            transfer, self.pending_transfer = self.pending_transfer, None
+            await self._run_transfer(transfer)
+
+        await self._poll_response()
+        if clear:
+            self._clear_buffer()
+        elif struct.unpack_from('i', self.buffer, 4)[0] == RESPONSE_CHUNKED:
+            # The response does not fit into the buffer, its parts are received before it is read
+            self.received_payload = await self._run_transfer(self._receive_chunks())
+
+    async def _poll_response(self):
+        value = MessageType.S_RESPONSE | 0xFF00
+        await self._poll(lambda: self.header[0] == value)
+        if self.metrics is not None:
+            self.metrics.record_round_trip(self.sent_type, time.perf_counter_ns() - self.sent_time)
+
+    async def _run_transfer(self, transfer) -> bytearray:
+        # Runs the steps of a chunked transfer, awaiting the response to each part
+        try:
+            while True:
+                next(transfer)
+                await self._poll_response()
+        except StopIteration as e:
+            return e.value
+
+    def _send_chunked(self, msgtype: int, payload):
+        # The parts are sent by the following _wait_for_response
+        self._check_chunked_transfer(msgtype)
+        self.pending_transfer = self._send_chunks(msgtype, payload)
+
+    def _receive_chunked(self) -> bytearray:
+        # The parts were received by _wait_for_response or _read_chunked_server_call
+        payload, self.received_payload = self.received_payload, None
+        return payload
+
+    def _read_error_code(self) -> int:
+        if self.received_payload is not None:
+            return RESPONSE_CHUNKED
+
+        return super(AsyncTMInterface, self)._read_error_code()
+
+    async def _read_chunked_server_call(self):
+        msgtype = self.header[0] & 0xFF
+        self._record_chunked_server_call(msgtype)
+        async with self.lock:
+            payload = await self._run_transfer(self._receive_chunks())
+
+        return self._parse_server_call(msgtype, payload)
+
+    async def _connect(self):
+        if not self._is_mapped_file_present():
+            print(f"No TMI instance with server name {self.server_name} found, waiting for TMI instance to open..")
+            while self.running and not self._is_mapped_file_present():
+                await asyncio.sleep(1)
+
+        self.mfile = self.transport.open()
+        self.buffer = memoryview(self.mfile)
+        self.header = self.buffer[:4].cast('i')
+
+    async def _main_loop(self):
+        try:
+            await self._connect()
+        except Exception as e:
+            self.client.on_client_exception(self, e)
+            self.running = False
+            return
+
+        if self.running:
+            async with self.lock:
+                self._send_template(MessageType.C_REGISTER, CAPABILITIES_MAGIC, self._client_capabilities())
+                await self._wait_for_response(False)
+                self._read_server_capabilities()
+                self._clear_buffer()
+
+            self.registered = True
+
+        while self.running:
+            await self._poll(self._has_server_call)
+            if self.running:
+                await self._process_server_message()
+
+    def _has_server_call(self) -> bool:
+        # The header also holds pending client messages and server responses,
+        # which are handled by the task that sent the message
+        header = self.header[0]
+        if not self.running:
+            return True
+
+        return header & 0xFF00 != 0 and MessageType.S_RESPONSE < header & 0xFF < MessageType.C_REGISTER
+
+    async def _process_server_message(self):
+        if struct.unpack_from('i', self.buffer, 4)[0] == RESPONSE_CHUNKED:
+            call = await self._read_chunked_server_call()
+        else:
+            call = self._read_server_call()
+
+        if call is None:
+            return
+
+        msgtype, hook, args = call
+        if msgtype == MessageType.S_SHUTDOWN:
+            await self.close()
+            await self._call_hook('on_shutdown')
+            return
+
+        self._before_server_call(msgtype)
+        if self.metrics is not None:
+            start = time.perf_counter_ns()
+            result = await self._call_hook(hook, *args)
+            self.metrics.record_hook(hook, time.perf_counter_ns() - start)
+        else:
+            result = await self._call_hook(hook, *args)
+
+        self._after_server_call(msgtype)
+
+        # The client closed itself inside the hook, the response would
+        # overwrite the deregistration before the server reads it
+        if not self.running:
+            return
+
+        async with self.lock:
+            if msgtype == MessageType.S_ON_BRUTEFORCE_EVALUATE:
+                self._respond_to_bruteforce_call(msgtype, result)
+            else:
+                self._respond_to_call(msgtype)
@@ -2,7 +2,6 @@
 from tminterface.structs import BFEvaluationInfo, BFEvaluationResponse
 from tminterface.constants import DEFAULT_SERVER_SIZE
 import signal
-import time
 import sys
 
 
@@ -166,5 +165,6 @@ def run_client(client: Client, server_name: str = 'TMInterface0', buffer_size=DE
 
     iface.register(client)
 
-    while iface.running:
-        time.sleep(0)
+    # Wake up periodically, waiting without a timeout cannot be interrupted by signals on Windows
+    while not iface.wait_closed(0.5):
+        pass
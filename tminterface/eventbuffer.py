@@ -3,6 +3,7 @@ from tminterface.constants import ANALOG_ACCELERATE_NAME, ANALOG_STEER_NAME, BIN
 from typing import Union
 from math import ceil
 from bytefield import ByteStruct, IntegerField
+import numpy as np
 
 
 class Event(ByteStruct):
@@ -75,6 +76,12 @@ class Event(ByteStruct):
         self.input_data = self.input_data & 0xFF000000 | (util.analog_value_to_data(value) & 0xFFFFFF)
 
 
+EVENT_DTYPE = np.dtype([('time', np.int32), ('input_data', np.uint32)])
+"""
+The NumPy structured dtype of an event, with the same layout as the Event class.
+"""
+
+
 class EventBufferData(object):
     """
     The internal event buffer used to hold player inputs in run or simulation mode.
@@ -100,6 +107,12 @@ class EventBufferData(object):
     event can also be saved in the replay file itself. The very first input that can be applied
     by the player happens at stored time of 100010.
 
+    An event buffer can also hold its events as a NumPy structured array of EVENT_DTYPE,
+    which is how buffers received from the server are stored (see from_array). The Event
+    objects are then only created when the events attribute is first accessed, so that
+    copying, sorting and sending a buffer does not create an object for each event.
+    Use to_array to work with the events in bulk.
+
     Arguments:
         events_duration (int): the duration of the events, equalling the finish time, mostly ignored and does not need to be set
 
@@ -111,7 +124,71 @@ class EventBufferData(object):
     def __init__(self, events_duration: int):
         self.events_duration = events_duration
         self.control_names = []
-        self.events = []
+        self._events = []
+        self._array = None
+
+    @classmethod
+    def from_array(cls, events_duration: int, array: np.ndarray, control_names: list = None):
+        """
+        Creates an event buffer holding the events of a structured array.
+
+        The array is not copied and is owned by the buffer afterwards.
+
+        Args:
+            events_duration (int): the duration of the events
+            array (np.ndarray): the events, a one dimensional array of EVENT_DTYPE
+            control_names (list): the list of supported event types, empty if None
+
+        Returns:
+            EventBufferData: the event buffer
+        """
+        data = cls(events_duration)
+        if control_names is not None:
+            data.control_names = control_names
+
+        data._events = None
+        data._array = array
+        return data
+
+    @property
+    def events(self) -> list:
+        if self._events is None:
+            raw = self._array.tobytes()
+            self._events = [Event(bytearray(raw[i:i + Event.min_size])) for i in range(0, len(raw), Event.min_size)]
+            self._array = None
+
+        return self._events
+
+    @events.setter
+    def events(self, events: list):
+        self._events = events
+        self._array = None
+
+    def to_array(self) -> np.ndarray:
+        """
+        Converts the events to a structured array of EVENT_DTYPE.
+
+        Modifying the returned array does not modify the buffer.
+
+        Returns:
+            np.ndarray: the events, in the order they are held by the buffer
+        """
+        if self._events is None:
+            return self._array.copy()
+
+        return np.array([(ev.time, ev.input_data & 0xFFFFFFFF) for ev in self._events], dtype=EVENT_DTYPE)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the events in the format used by the game, 8 bytes per event.
+
+        Returns:
+            bytes: the events, in the order they are held by the buffer
+        """
+        if self._events is None:
+            return self._array.tobytes()
+
+        return b''.join([ev.data for ev in self._events])
 
     def copy(self):
         """
@@ -120,9 +197,12 @@ class EventBufferData(object):
         Returns:
             a deep copy of the original event buffer
         """
+        if self._events is None:
+            return EventBufferData.from_array(self.events_duration, self._array.copy(), self.control_names[:])
+
         cpy = EventBufferData(self.events_duration)
         cpy.control_names = self.control_names[:]
-        cpy.events = [Event(ev.time, ev.data) for ev in self.events]
+        cpy.events = [Event(ev.time, ev.input_data) for ev in self.events]
         return cpy
 
     def clear(self):
@@ -144,6 +224,12 @@ class EventBufferData(object):
         Calling this is not needed, if you are calling set_event_buffer.
         The server will always take care of properly sorting the events.
         """
+        if self._events is None:
+            # A stable sort of the negated times keeps the order of equal times, the same as sorted()
+            order = np.argsort(-self._array['time'].astype(np.int64), kind='stable')
+            self._array = self._array[order]
+            return
+
         self.events = sorted(self.events, key=lambda ev: ev.time, reverse=True)
 
     def add(self, time: int, event_name: str, value: Union[int, bool]):
@@ -308,3 +394,226 @@ class EventBufferData(object):
                 commands += f'{time} steer {ev.analog_value}\n'
 
         return commands
+
+
+class EventView(object):
+    """
+    A lightweight view of an event held by an ArrayEventBufferData, providing the
+    same accessors as the Event class without copying the event.
+
+    A view refers to the position of the event in the buffer. Once the buffer is sorted,
+    cleared or assigned new events, the view refers to whichever event is at that position.
+
+    Args:
+        buffer (ArrayEventBufferData): the buffer holding the event
+        index (int): the position of the event in the buffer
+    """
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index: int):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def time(self) -> int:
+        return int(self.buffer._array['time'][self.index])
+
+    @time.setter
+    def time(self, time: int):
+        self.buffer._writable()['time'][self.index] = time
+
+    @property
+    def input_data(self) -> int:
+        return int(self.buffer._array['input_data'][self.index])
+
+    @input_data.setter
+    def input_data(self, input_data: int):
+        self.buffer._writable()['input_data'][self.index] = int(input_data) & 0xFFFFFFFF
+
+    @property
+    def data(self) -> bytes:
+        return self.buffer._array[self.index:self.index + 1].tobytes()
+
+    name_index = Event.name_index
+    binary_value = Event.binary_value
+    analog_value = Event.analog_value
+
+
+class ArrayEventBufferData(EventBufferData):
+    """
+    An event buffer holding its events in a NumPy structured array of EVENT_DTYPE,
+    meant for code that copies and modifies buffers many times, e.g. in a bruteforce:
+
+        base = ArrayEventBufferData.from_buffer(iface.get_event_buffer())
+        for steer in range(-65536, 65537, 4096):
+            data = base.copy()
+            data.add(times, ANALOG_STEER_NAME, steer)
+            iface.set_event_buffer(data)
+
+    Copies share the array of the buffer they were copied from until one of them is
+    modified, so copying a buffer takes constant time regardless of the number of events.
+    clear, sort and find operate on the whole array at once and add accepts arrays of times
+    and values to add many events at once.
+
+    The events attribute returns a new list of EventView objects on each access instead
+    of a list of Event objects. Modifying the views modifies the buffer, but adding
+    or removing views from the list does not: use add, or assign a list of events
+    to the events attribute instead.
+
+    Arguments:
+        events_duration (int): the duration of the events, equalling the finish time, mostly ignored and does not need to be set
+        capacity (int): the number of events to allocate space for initially
+
+    Attributes:
+        events_duration (int): the duration of the events
+        control_names (list): the list of supported event types by this buffer
+        events (list): views of the events held by this buffer
+    """
+    def __init__(self, events_duration: int, capacity: int = 16):
+        super(ArrayEventBufferData, self).__init__(events_duration)
+        self._events = None
+        self._array = np.empty(capacity, EVENT_DTYPE)
+        self._count = 0
+        self._shared = False
+
+    @classmethod
+    def from_array(cls, events_duration: int, array: np.ndarray, control_names: list = None):
+        data = cls(events_duration, 0)
+        if control_names is not None:
+            data.control_names = control_names
+
+        data._array = array
+        data._count = len(array)
+        return data
+
+    @classmethod
+    def from_buffer(cls, data: EventBufferData):
+        """
+        Creates an array backed copy of an event buffer.
+
+        Args:
+            data (EventBufferData): the event buffer to copy
+
+        Returns:
+            ArrayEventBufferData: the copy
+        """
+        return cls.from_array(data.events_duration, data.to_array(), data.control_names[:])
+
+    @property
+    def events(self) -> list:
+        return [EventView(self, i) for i in range(self._count)]
+
+    @events.setter
+    def events(self, events: list):
+        self._array = np.array([(ev.time, ev.input_data & 0xFFFFFFFF) for ev in events], dtype=EVENT_DTYPE)
+        self._count = len(self._array)
+        self._shared = False
+
+    def to_array(self) -> np.ndarray:
+        return self._array[:self._count].copy()
+
+    def to_bytes(self) -> bytes:
+        return self._array[:self._count].tobytes()
+
+    def copy(self):
+        """
+        Copies the event buffer, sharing the events until either buffer is modified.
+
+        Returns:
+            ArrayEventBufferData: the copy
+        """
+        cpy = ArrayEventBufferData(self.events_duration, 0)
+        cpy.control_names = self.control_names[:]
+        cpy._array = self._array
+        cpy._count = self._count
+        cpy._shared = self._shared = True
+        return cpy
+
+    def clear(self):
+        self._count = 0
+        self.add(-10, '_FakeIsRaceRunning', True)
+
+    def sort(self):
+        times = self._array['time'][:self._count]
+        order = np.argsort(-times.astype(np.int64), kind='stable')
+        self._array = self._array[:self._count][order]
+        self._shared = False
+
+    def add(self, time, event_name: str, value):
+        """
+        Adds events to the event buffer, see EventBufferData.add.
+
+        Both time and value may also be arrays, to add an event for each of their elements at once.
+
+        Args:
+            time: zero based timestamp when the input is injected, or an array of timestamps
+            event_name (str): the event name that specifies the input type
+            value: the value for the event, based on the event type, or an array of values
+        """
+        try:
+            index = self.control_names.index(event_name)
+        except ValueError:
+            raise ValueError(f'Event name "{event_name}" does not exist in this event buffer')
+
+        analog = event_name == ANALOG_ACCELERATE_NAME or event_name == ANALOG_STEER_NAME
+        if np.ndim(time) == 0 and np.ndim(value) == 0:
+            data = -value if analog else int(value)
+            self._reserve(1)[0] = (time + 100010, (index << 24) | (data & 0xFFFFFF))
+            return
+
+        times, values = np.broadcast_arrays(np.asarray(time, np.int64), np.asarray(value))
+        data = -values.astype(np.int64) if analog else values.astype(np.int64)
+        events = self._reserve(len(times))
+        events['time'] = times + 100010
+        events['input_data'] = (index << 24) | (data & 0xFFFFFF)
+
+    def find(self, **kwargs):
+        """
+        Finds matching events according to keyword arguments, see EventBufferData.find.
+
+        Returns:
+            list: views of the events that matched the query
+        """
+        index = -1
+        if 'event_name' in kwargs:
+            try:
+                index = self.control_names.index(kwargs['event_name'])
+            except ValueError:
+                raise ValueError(f'Event name "{kwargs["event_name"]}" does not exist in this event buffer')
+
+        events = self._array[:self._count]
+        mask = np.ones(self._count, dtype=bool)
+        if 'time' in kwargs:
+            mask &= events['time'] - 100010 == kwargs['time']
+
+        if index >= 0:
+            mask &= events['input_data'] >> 24 == index
+            if 'value' in kwargs:
+                data = (events['input_data'] & 0xFFFFFF).astype(np.int32)
+                if kwargs['event_name'] == ANALOG_STEER_NAME or kwargs['event_name'] == ANALOG_ACCELERATE_NAME:
+                    # Sign extend the 24 bit value, see util.data_to_analog_value
+                    mask &= -((data << 8) >> 8) == kwargs['value']
+                else:
+                    mask &= (data != 0) == bool(kwargs['value'])
+
+        return [EventView(self, i) for i in np.flatnonzero(mask)[::-1].tolist()]
+
+    def _writable(self) -> np.ndarray:
+        # Copies the array before the first write if it is shared with another buffer
+        if self._shared:
+            self._array = self._array.copy()
+            self._shared = False
+
+        return self._array
+
+    def _reserve(self, count: int) -> np.ndarray:
+        # Makes room for events at the end of the buffer, returning their slice
+        end = self._count + count
+        if self._shared or end > len(self._array):
+            array = np.empty(max(end, len(self._array) * 2, 16), EVENT_DTYPE)
+            array[:self._count] = self._array[:self._count]
+            self._array = array
+            self._shared = False
+
+        self._count = end
+        return self._array[end - count:end]
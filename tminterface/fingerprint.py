@@ -0,0 +1,208 @@
+from tminterface.structs import SimStateData
+from tminterface.statebatch import SimStateBatch, state_dtype
+import numpy as np
+
+PHYSICS_REGIONS = ('dyna.current_state', 'scene_mobil', 'simulation_wheels')
+"""
+The regions of SimStateData hashed by default, as paths of field names.
+"""
+
+EXCLUDED_FIELDS = ('rest', 'owner')
+"""
+The names of fields left out of the hashed regions: byte arrays of unknown layout,
+which may hold pointers, and pointers to the owning objects.
+"""
+
+_CP_DATA_OFFSET = SimStateData().calc_field_offset(SimStateData.cp_data_field)
+# The checkpoint arrays start after the reserved field of the checkpoint data
+_CP_ARRAYS_OFFSET = _CP_DATA_OFFSET + 4
+_SEED = 0x544D496E74657266
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_SHIFT = np.uint64(32)
+
+
+def _mix_words(words: np.ndarray) -> np.ndarray:
+    # Spreads the bits of every word over its high bits and folds them back, in place
+    words *= _MULTIPLIER
+    words ^= words >> _SHIFT
+    return words
+
+
+def _finalize(digest: int, count: int) -> int:
+    # The splitmix64 finalizer, applied to the sum of the mixed words
+    digest ^= count
+    digest = ((digest ^ (digest >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    digest = ((digest ^ (digest >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return digest ^ (digest >> 31)
+
+
+def _splitmix(values: np.ndarray) -> np.ndarray:
+    # The splitmix64 finalizer, applied to every element
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+class StateFingerprinter(object):
+    """
+    StateFingerprinter computes 64 bit fingerprints of simulation states that are equal
+    for physically identical states, e.g. to prune duplicate branches in a search:
+
+        fingerprinter = StateFingerprinter()
+        seen = set()
+        ...
+        def on_simulation_step(self, iface, _time: int):
+            key = fingerprinter.fingerprint(iface.get_simulation_state())
+            if key in seen:
+                # An identical state was already explored
+            seen.add(key)
+
+    Only the physics regions of the state are hashed (see PHYSICS_REGIONS), and within them
+    only the bytes of fields described by the structs in tminterface.structs: padding,
+    undescribed bytes and the fields in EXCLUDED_FIELDS are masked out, as they hold pointers
+    and other instance specific values. If include_checkpoints is enabled, the checkpoint
+    arrays of the state are hashed as well.
+
+    The masked state is hashed as 8 byte words (the checkpoint arrays as 4 byte words):
+    every word is combined with a key for its position and mixed with a multiplication,
+    and the sum of the mixed words is passed through the splitmix64 finalizer.
+    This is a fast, non-cryptographic hash computed with a few NumPy operations over a view
+    of the state, which also allows hashing all states of a SimStateBatch at once
+    (see fingerprint_batch). Fingerprints are stable across processes, but depend
+    on the regions hashed.
+
+    Args:
+        regions (tuple): the regions to hash, as paths of SimStateData field names separated by dots
+        include_checkpoints (bool): whether to hash the checkpoint arrays
+
+    Attributes:
+        regions (tuple): the hashed regions
+        include_checkpoints (bool): whether the checkpoint arrays are hashed
+        mask (np.ndarray): the mask applied to the state before the checkpoint data, 0xFF for every hashed byte
+        start (int): the offset of the first hashed word of the state
+        end (int): the offset after the last hashed word of the state, before the checkpoint data
+    """
+    def __init__(self, regions: tuple = PHYSICS_REGIONS, include_checkpoints: bool = True):
+        self.regions = regions
+        self.include_checkpoints = include_checkpoints
+
+        dtype = state_dtype()
+        self.mask = np.zeros(_CP_DATA_OFFSET, np.uint8)
+        for region in regions:
+            region_dtype, offset = dtype, 0
+            for name in region.split('.'):
+                region_dtype, field_offset = region_dtype.fields[name][:2]
+                offset += field_offset
+
+            _mark_fields(self.mask, region_dtype, offset)
+
+        hashed = np.flatnonzero(self.mask)
+        if len(hashed) == 0:
+            raise ValueError('No fields to hash in the provided regions')
+
+        # The hashed part of the state is read as whole words, of which only
+        # the words containing hashed bytes are kept
+        self.start = int(hashed[0]) // 8 * 8
+        self.end = -(-(int(hashed[-1]) + 1) // 8) * 8
+        words_mask = np.zeros(self.end - self.start, np.uint8)
+        covered = self.mask[self.start:self.end]
+        words_mask[:len(covered)] = covered
+        words_mask = words_mask.view(np.uint64)
+        self._word_indices = np.flatnonzero(words_mask)
+        self._words_mask = words_mask[self._word_indices]
+        self._keys = np.zeros(0, np.uint64)
+
+    def fingerprint(self, state: SimStateData) -> int:
+        """
+        Computes the fingerprint of a state.
+
+        Args:
+            state (SimStateData): the state
+
+        Returns:
+            int: the 64 bit fingerprint
+        """
+        data = state.data
+        words = np.frombuffer(data, np.uint64, (self.end - self.start) // 8, self.start)
+        words = words[self._word_indices] & self._words_mask
+        if self.include_checkpoints:
+            cp_words = np.frombuffer(data, np.uint32, (len(data) - _CP_ARRAYS_OFFSET) // 4, _CP_ARRAYS_OFFSET)
+            words = np.concatenate((words, cp_words.astype(np.uint64)))
+
+        words ^= self._keys_for(len(words))
+        return _finalize(int(_mix_words(words).sum(dtype=np.uint64)), len(words))
+
+    def fingerprint_batch(self, batch: SimStateBatch) -> np.ndarray:
+        """
+        Computes the fingerprints of all states of a batch at once.
+
+        Args:
+            batch (SimStateBatch): the batch of states
+
+        Returns:
+            np.ndarray: the fingerprints of the states as uint64, shape (N,)
+        """
+        if batch.count == 0:
+            return np.zeros(0, np.uint64)
+
+        raw = batch.raw[:batch.count]
+        words = np.ascontiguousarray(raw[:, self.start:self.end]).view(np.uint64)
+        words = words[:, self._word_indices] & self._words_mask
+        if self.include_checkpoints:
+            cp_words = np.ascontiguousarray(raw[:, _CP_ARRAYS_OFFSET:]).view(np.uint32)
+            words = np.concatenate((words, cp_words.astype(np.uint64)), axis=1)
+
+        count = words.shape[1]
+        words ^= self._keys_for(count)
+        digests = _mix_words(words).sum(axis=1, dtype=np.uint64)
+        digests ^= np.uint64(count)
+        return _splitmix(digests)
+
+    def _keys_for(self, count: int) -> np.ndarray:
+        # The keys are derived from the word positions, so that they can be extended for larger checkpoint data
+        if len(self._keys) < count:
+            self._keys = _splitmix(np.arange(count, dtype=np.uint64) + np.uint64(_SEED))
+
+        return self._keys[:count]
+
+
+def _mark_fields(mask: np.ndarray, dtype: np.dtype, offset: int):
+    # Marks the bytes of every field of a dtype in the mask, except the excluded ones
+    if dtype.subdtype is not None:
+        base, shape = dtype.subdtype
+        for i in range(int(np.prod(shape))):
+            _mark_fields(mask, base, offset + i * base.itemsize)
+        return
+
+    if dtype.names is None:
+        mask[offset:offset + dtype.itemsize] = 0xFF
+        return
+
+    for name in dtype.names:
+        if name not in EXCLUDED_FIELDS:
+            field_dtype, field_offset = dtype.fields[name][:2]
+            _mark_fields(mask, field_dtype, offset + field_offset)
+
+
+_default_fingerprinter = None
+
+
+def fingerprint(state: SimStateData) -> int:
+    """
+    Computes the fingerprint of a state with the default StateFingerprinter,
+    hashing the physics regions and the checkpoint arrays.
+
+    Args:
+        state (SimStateData): the state
+
+    Returns:
+        int: the 64 bit fingerprint
+    """
+    global _default_fingerprinter
+    if _default_fingerprinter is None:
+        _default_fingerprinter = StateFingerprinter()
+
+    return _default_fingerprinter.fingerprint(state)
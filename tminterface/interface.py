@@ -1,13 +1,16 @@
 import struct
 import threading
 import time
-import mmap
-from ctypes import windll, c_char_p
-from typing import Tuple
+
+import numpy as np
 
 from tminterface.client import Client
+from tminterface.transport import Transport, default_transport
+from tminterface.waitstrategy import WaitStrategy, YieldWaitStrategy
 from tminterface.structs import BFEvaluationResponse, BFEvaluationInfo, ClassicString, CheckpointData, SimStateData
-from tminterface.eventbuffer import EventBufferData, Event
+from tminterface.eventbuffer import EventBufferData, EVENT_DTYPE
+from tminterface.metrics import Metrics
+from tminterface.recording import RecordKind, SessionRecorder
 from tminterface.constants import *
 from enum import IntEnum, auto
 
@@ -48,6 +51,8 @@ class MessageType(IntEnum):
     C_REGISTER_CUSTOM_COMMAND = auto()
     C_LOG = auto()
     ANY = auto()
+    C_TRANSFER_CHUNK = auto()
+    C_GET_CHUNK = auto()
 
 
 RESPONSE_TOO_LONG = 1
@@ -55,9 +60,41 @@ CLIENT_ALREADY_REGISTERED = 2
 NO_EVENT_BUFFER = 3
 NO_PLAYER_INFO = 4
 COMMAND_ALREADY_REGISTERED = 5
+RESPONSE_CHUNKED = 6
 
 MAXINT32 = 2 ** 31 - 1
 
+# Capabilities are negotiated on registration: the client sends its capabilities
+# after CAPABILITIES_MAGIC and servers supporting the negotiation respond with theirs
+# after CAPABILITIES_RESPONSE_MAGIC. Servers that do not know about capabilities ignore them
+# and respond without a payload, leaving the registration message of the client in the buffer.
+CAPABILITIES_MAGIC = 0x53504143
+CAPABILITIES_RESPONSE_MAGIC = 0x43565253
+CAPABILITY_CHUNKED_TRANSFER = 0x1
+
+# The header of a C_TRANSFER_CHUNK message: type, error code, message type, total size and offset
+CHUNK_HEADER_SIZE = 20
+
+
+class BufferClearMode(IntEnum):
+    """
+    The way the client clears the shared buffer after a server response has been read.
+
+    `FULL`: zero the whole buffer, the default
+
+    `DIRTY`: zero only the range written by the last message and read from the response
+
+    `HEADER`: zero only the message header
+
+    The server only reads as much of a message as its type defines, so leaving
+    stale bytes after the end of the message does not change how it is interpreted.
+    Clearing less of the buffer makes each call cheaper, which matters
+    especially if the buffer size was raised with /serversize.
+    """
+    FULL = 0
+    DIRTY = 1
+    HEADER = 2
+
 
 class Message(object):
     """
@@ -121,10 +158,152 @@ class Message(object):
     def to_data(self) -> bytearray:
         return bytearray(struct.pack('i', self._type)) + bytearray(struct.pack('i', self.error_code)) + self.data
 
+    def pack_into(self, buffer) -> int:
+        """
+        Writes the error code and the data of the message into a buffer.
+
+        The message type is not written, it is written by the sender last,
+        as writing it hands the message over to the receiving side.
+
+        Args:
+            buffer (memoryview): the buffer to write the message into, starting at offset 0
+
+        Returns:
+            int: the size of the whole message in bytes
+        """
+        _error_code.pack_into(buffer, 4, self.error_code)
+        end = 8 + len(self.data)
+        buffer[8:end] = self.data
+        return end
+
     def __len__(self):
         return 8 + len(self.data)
 
 
+class MessageTemplate(object):
+    """
+    The MessageTemplate class is a precompiled layout of a message that consists of
+    a fixed set of fields, optionally followed by a single variable length buffer.
+
+    Unlike Message, a template does not build the message in an intermediate buffer.
+    All of the fields are packed into the destination with a single struct.Struct.pack_into call,
+    which makes it suited for messages that are sent many times, such as input states
+    or call acknowledgements. Templates are stateless and are reused for every message
+    of their type, see MESSAGE_TEMPLATES.
+
+    Fields are packed in native byte order without any alignment, the same way
+    Message writes them one by one.
+
+    Args:
+        _type (int): the message type
+        fmt (str): the struct format of the fields following the message header
+
+    Attributes:
+        _type (int): the message type
+        layout (struct.Struct): the compiled layout of the error code and the fields
+        size (int): the size of the message in bytes, without the variable length buffer
+    """
+    def __init__(self, _type: int, fmt: str = ''):
+        self._type = _type
+        self.layout = struct.Struct('=i' + fmt)
+        self.size = 4 + self.layout.size
+
+    def pack_into(self, buffer, *values, data=None, error_code: int = 0) -> int:
+        """
+        Writes the error code, the fields and the variable length buffer of the message into a buffer.
+
+        As with Message.pack_into, the message type is not written.
+
+        Args:
+            buffer (memoryview): the buffer to write the message into, starting at offset 0
+            *values: the values of the fields, in the order of the template format
+            data (bytearray): the variable length buffer written after the fields, None if there is none
+            error_code (int): the error code of the message
+
+        Returns:
+            int: the size of the whole message in bytes
+        """
+        self.layout.pack_into(buffer, 4, error_code, *values)
+        if data is None:
+            return self.size
+
+        end = self.size + len(data)
+        buffer[self.size:end] = data
+        return end
+
+
+_error_code = struct.Struct('=i')
+
+
+def _unpack_string(buffer, offset: int) -> tuple:
+    """
+    Decodes a string prefixed with its length from a buffer with a single slice.
+
+    Every byte is decoded into the character with the same code point,
+    the same as calling chr() on each byte.
+
+    Args:
+        buffer (bytes-like): the buffer to decode from
+        offset (int): the offset of the length prefix
+
+    Returns:
+        tuple: the decoded string and the offset after the string
+    """
+    length = _error_code.unpack_from(buffer, offset)[0]
+    offset += 4
+    if length <= 0:
+        return '', offset
+
+    end = offset + length
+    if end > len(buffer):
+        raise struct.error(f'string of {length} bytes does not fit into a buffer of {len(buffer)} bytes')
+
+    return bytes(buffer[offset:end]).decode('latin-1'), end
+
+
+MESSAGE_TEMPLATES = {
+    MessageType.C_REGISTER: MessageTemplate(MessageType.C_REGISTER, 'ii'),
+    MessageType.C_DEREGISTER: MessageTemplate(MessageType.C_DEREGISTER, 'i'),
+    MessageType.C_PROCESSED_CALL: MessageTemplate(MessageType.C_PROCESSED_CALL, 'i'),
+    MessageType.C_SET_INPUT_STATES: MessageTemplate(MessageType.C_SET_INPUT_STATES, '6i'),
+    MessageType.C_RESPAWN: MessageTemplate(MessageType.C_RESPAWN, 'i'),
+    MessageType.C_GIVE_UP: MessageTemplate(MessageType.C_GIVE_UP, 'i'),
+    MessageType.C_HORN: MessageTemplate(MessageType.C_HORN, 'i'),
+    MessageType.C_SIM_REWIND_TO_STATE: MessageTemplate(MessageType.C_SIM_REWIND_TO_STATE),
+    MessageType.C_SIM_GET_STATE: MessageTemplate(MessageType.C_SIM_GET_STATE),
+    MessageType.C_SIM_GET_EVENT_BUFFER: MessageTemplate(MessageType.C_SIM_GET_EVENT_BUFFER),
+    MessageType.C_GET_CONTEXT_MODE: MessageTemplate(MessageType.C_GET_CONTEXT_MODE),
+    MessageType.C_SIM_SET_EVENT_BUFFER: MessageTemplate(MessageType.C_SIM_SET_EVENT_BUFFER, '11iI'),
+    MessageType.C_SIM_SET_TIME_LIMIT: MessageTemplate(MessageType.C_SIM_SET_TIME_LIMIT, 'i'),
+    MessageType.C_GET_CHECKPOINT_STATE: MessageTemplate(MessageType.C_GET_CHECKPOINT_STATE),
+    MessageType.C_SET_CHECKPOINT_STATE: MessageTemplate(MessageType.C_SET_CHECKPOINT_STATE),
+    MessageType.C_SET_GAME_SPEED: MessageTemplate(MessageType.C_SET_GAME_SPEED, 'd'),
+    MessageType.C_EXECUTE_COMMAND: MessageTemplate(MessageType.C_EXECUTE_COMMAND, 'i'),
+    MessageType.C_SET_TIMEOUT: MessageTemplate(MessageType.C_SET_TIMEOUT, 'i'),
+    MessageType.C_REMOVE_STATE_VALIDATION: MessageTemplate(MessageType.C_REMOVE_STATE_VALIDATION, 'i'),
+    MessageType.C_PREVENT_SIMULATION_FINISH: MessageTemplate(MessageType.C_PREVENT_SIMULATION_FINISH, 'i'),
+    MessageType.C_REGISTER_CUSTOM_COMMAND: MessageTemplate(MessageType.C_REGISTER_CUSTOM_COMMAND, 'i'),
+    MessageType.C_TRANSFER_CHUNK: MessageTemplate(MessageType.C_TRANSFER_CHUNK, 'iii'),
+    MessageType.C_GET_CHUNK: MessageTemplate(MessageType.C_GET_CHUNK, 'i'),
+}
+
+EVENT_BUFFER_NAMES_ORDER = [
+    BINARY_RACE_START_NAME,
+    BINARY_RACE_FINISH_NAME,
+    BINARY_ACCELERATE_NAME,
+    BINARY_BRAKE_NAME,
+    BINARY_LEFT_NAME,
+    BINARY_RIGHT_NAME,
+    ANALOG_STEER_NAME,
+    ANALOG_ACCELERATE_NAME,
+    BINARY_RESPAWN_NAME,
+    BINARY_HORN_NAME
+]
+
+# The control name ids of a set event buffer message, they are not read by the server
+_UNUSED_CONTROL_IDS = (-1,) * len(EVENT_BUFFER_NAMES_ORDER)
+
+
 class ServerException(Exception):
     """
     An exception thrown when the server cannot perform requested operation.
@@ -132,6 +311,14 @@ class ServerException(Exception):
     pass
 
 
+class EventBufferMismatchException(Exception):
+    """
+    An exception thrown when the event buffer mirrored by the client does not match
+    the event buffer of the server. Only thrown if check_event_buffer is enabled.
+    """
+    pass
+
+
 class TMInterface(object):
     """
     TMInterface is the main class to communicate with the TMInterface server.
@@ -149,21 +336,101 @@ class TMInterface(object):
                            specified by tminterface.constants.DEFAULT_BUFFER_SIZE.
                            Using a custom size requires launching TMInterface with the
                            /serversize command line parameter: TMInterface.exe /serversize=size.
+        transport (Transport): the transport providing the shared memory mapping, None to use
+                               the default transport for the current platform (see tminterface.transport)
+        wait_strategy (WaitStrategy): the strategy used to wait for server responses, None to use
+                                      a YieldWaitStrategy (see tminterface.waitstrategy)
+        clear_mode (BufferClearMode): how much of the buffer is cleared after reading a response
+        cache_context_mode (bool): whether to cache the context mode for the session instead of
+                                   requesting it from the server on every call, see get_context_mode
+        shadow_event_buffer (bool): whether to mirror the simulation event buffer on the client,
+                                    see get_event_buffer
+        check_event_buffer (bool): whether to compare the mirrored event buffer with the server event buffer
+                                   each time it is used instead of a request, for debugging
+        idle_delay (float): the maximum time in seconds the client thread sleeps between polls
+                            for server calls while no calls arrive
+        metrics (Metrics): the metrics to record round trip latencies, message sizes and hook times into,
+                           None to disable instrumentation (see tminterface.metrics)
+        recorder (SessionRecorder): the recorder to capture every message exchanged with the server into,
+                                    None to disable recording (see tminterface.recording)
+        chunked_transfer (bool): whether to transfer messages larger than the buffer in multiple parts,
+                                 if the server supports it
+        rewind_callbacks (bool): whether to call the checkpoint and lap count hooks of the client
+                                 after rewinding to a state, see rewind_to_state
 
     Attributes:
         server_name (str): the server tag that's used
         running (bool): whether the client is running or not
         registered (bool): whether the client is registered
         mfile (mmap.mmap): the internal mapped file used for communication
+        buffer (memoryview): a memoryview of the whole mapped file
+        header (memoryview): the message header of the mapped file, viewed as a single int32
         buffer_size (int): the buffer size used for communication
         client (Client): the registered client that's controlling the server
+        transport (Transport): the transport providing the shared memory mapping
+        wait_strategy (WaitStrategy): the strategy used to wait for server responses
+        clear_mode (BufferClearMode): how much of the buffer is cleared after reading a response
+        cache_context_mode (bool): whether the context mode is cached for the session
+        context_mode (int): the cached context mode, None if it is not known yet
+        round_trips_saved (int): the number of context mode requests answered without a round trip to the server
+        shadow_event_buffer (bool): whether the simulation event buffer is mirrored on the client
+        check_event_buffer (bool): whether the mirrored event buffer is compared with the server event buffer
+        event_buffer (EventBufferData): the mirrored event buffer, None if it is not known
+        event_buffer_stale (bool): whether the server has added events to the buffer since it was mirrored
+        simulating (bool): whether a simulation is running, between on_simulation_begin and on_simulation_end
+        idle_delay (float): the maximum time in seconds the client thread sleeps between polls for server calls
+        close_event (threading.Event): set when the client has been closed
+        metrics (Metrics): the metrics instrumentation is recorded into, None if it is disabled
+        recorder (SessionRecorder): the recorder messages are captured into, None if recording is disabled
+        chunked_transfer (bool): whether messages larger than the buffer are transferred in multiple parts
+        server_capabilities (int): the capabilities the server reported on registration, 0 if it did not report any
+        rewind_callbacks (bool): whether the checkpoint and lap count hooks are called after rewinding to a state
     """
-    def __init__(self, server_name='TMInterface0', buffer_size=DEFAULT_SERVER_SIZE):
+    def __init__(
+        self,
+        server_name='TMInterface0',
+        buffer_size=DEFAULT_SERVER_SIZE,
+        transport: Transport = None,
+        wait_strategy: WaitStrategy = None,
+        clear_mode: BufferClearMode = BufferClearMode.FULL,
+        cache_context_mode: bool = True,
+        shadow_event_buffer: bool = False,
+        check_event_buffer: bool = False,
+        idle_delay: float = 0.001,
+        metrics: Metrics = None,
+        recorder: SessionRecorder = None,
+        chunked_transfer: bool = True,
+        rewind_callbacks: bool = True
+    ):
         self.server_name = server_name
         self.running = True
         self.registered = False
         self.mfile = None
         self.buffer_size = buffer_size
+        self.transport = transport if transport is not None else default_transport(server_name, buffer_size)
+        self.wait_strategy = wait_strategy if wait_strategy is not None else YieldWaitStrategy()
+        self.buffer = None
+        self.header = None
+        self.payload_dirty = False
+        self.clear_mode = clear_mode
+        self.dirty_size = 0
+        self.cache_context_mode = cache_context_mode
+        self.context_mode = None
+        self.round_trips_saved = 0
+        self.shadow_event_buffer = shadow_event_buffer
+        self.check_event_buffer = check_event_buffer
+        self.event_buffer = None
+        self.event_buffer_stale = False
+        self.simulating = False
+        self.idle_delay = idle_delay
+        self.close_event = threading.Event()
+        self.metrics = metrics
+        self.recorder = recorder
+        self.chunked_transfer = chunked_transfer
+        self.server_capabilities = 0
+        self.rewind_callbacks = rewind_callbacks
+        self.sent_type = None
+        self.sent_time = 0
         self.client = None
         self.empty_buffer = bytearray(self.buffer_size)
         self.thread = None
@@ -213,13 +480,27 @@ class TMInterface(object):
         will be called with the instance of the TMInterface class.
         """
         if self.registered:
-            msg = Message(MessageType.C_DEREGISTER)
-            msg.write_int32(0)
-            self._send_message(msg)
+            self._send_template(MessageType.C_DEREGISTER, 0)
             self.client.on_deregistered(self)
             self.thread = None
 
+        self.context_mode = None
+        self.event_buffer = None
         self.running = False
+        self.close_event.set()
+
+    def wait_closed(self, timeout: float = None) -> bool:
+        """
+        Blocks until the client is closed, either by calling close()
+        or by the server shutting down.
+
+        Args:
+            timeout (float): the maximum time to wait in seconds, None to wait forever
+
+        Returns:
+            bool: True if the client has been closed, False if the timeout expired
+        """
+        return self.close_event.wait(timeout)
 
     def set_timeout(self, timeout_ms: int):
         """
@@ -235,9 +516,7 @@ class TMInterface(object):
         Args:
             timeout_ms (int): the timeout in milliseconds
         """
-        msg = Message(MessageType.C_SET_TIMEOUT)
-        msg.write_int32(timeout_ms)
-        self._send_message(msg)
+        self._send_template(MessageType.C_SET_TIMEOUT, timeout_ms)
         self._wait_for_server_response()
 
     def set_speed(self, speed: float):
@@ -256,9 +535,7 @@ class TMInterface(object):
             speed (float): the speed to set, 1 is the default normal game speed,
                         factors <1 will slow down the game while factors >1 will speed it up
         """
-        msg = Message(MessageType.C_SET_GAME_SPEED)
-        msg.write_double(speed)
-        self._send_message(msg)
+        self._send_template(MessageType.C_SET_GAME_SPEED, speed)
         self._wait_for_server_response()
 
     def set_input_state(self, sim_clear_buffer: bool = True, **kwargs):
@@ -300,42 +577,12 @@ class TMInterface(object):
             steer (int): the steer analog input, in range of [-65536, 65536]
             gas (int): the gas analog input, in range of [-65536, 65536]
         """
-        if self.get_context_mode() == MODE_SIMULATION and sim_clear_buffer:
+        if self._in_simulation(sim_clear_buffer):
             self.clear_event_buffer()
 
-        msg = Message(MessageType.C_SET_INPUT_STATES)
-        if 'left' in kwargs:
-            msg.write_int32(int(kwargs['left']))
-        else:
-            msg.write_int32(-1)
-
-        if 'right' in kwargs:
-            msg.write_int32(int(kwargs['right']))
-        else:
-            msg.write_int32(-1)
-
-        if 'accelerate' in kwargs:
-            msg.write_int32(int(kwargs['accelerate']))
-        else:
-            msg.write_int32(-1)
-
-        if 'brake' in kwargs:
-            msg.write_int32(int(kwargs['brake']))
-        else:
-            msg.write_int32(-1)
-
-        if 'steer' in kwargs:
-            msg.write_int32(kwargs['steer'])
-        else:
-            msg.write_int32(MAXINT32)
-
-        if 'gas' in kwargs:
-            msg.write_int32(kwargs['gas'])
-        else:
-            msg.write_int32(MAXINT32)
-
-        self._send_message(msg)
+        self._send_template(MessageType.C_SET_INPUT_STATES, *self._input_state_values(kwargs))
         self._wait_for_server_response()
+        self.event_buffer_stale = True
 
     def respawn(self, sim_clear_events: bool = True):
         """
@@ -358,13 +605,12 @@ class TMInterface(object):
         Args:
             sim_clear_events (bool): whether to clear all other events in simulation mode
         """
-        if self.get_context_mode() == MODE_SIMULATION and sim_clear_events:
+        if self._in_simulation(sim_clear_events):
             self.clear_event_buffer()
 
-        msg = Message(MessageType.C_RESPAWN)
-        msg.write_int32(0)
-        self._send_message(msg)
+        self._send_template(MessageType.C_RESPAWN, 0)
         self._wait_for_server_response()
+        self.event_buffer_stale = True
 
     def give_up(self):
         """
@@ -373,9 +619,7 @@ class TMInterface(object):
         This function does not do anything in a simulation context.
         To rewind to the start of the race in the simulation context, use simulation states.
         """
-        msg = Message(MessageType.C_GIVE_UP)
-        msg.write_int32(0)
-        self._send_message(msg)
+        self._send_template(MessageType.C_GIVE_UP, 0)
         self._wait_for_server_response()
 
     def horn(self, sim_clear_events: bool = True):
@@ -392,13 +636,12 @@ class TMInterface(object):
         Args:
             sim_clear_events (bool): whether to clear all other events in simulation mode
         """
-        if self.get_context_mode() == MODE_SIMULATION and sim_clear_events:
+        if self._in_simulation(sim_clear_events):
             self.clear_event_buffer()
 
-        msg = Message(MessageType.C_HORN)
-        msg.write_int32(0)
-        self._send_message(msg)
+        self._send_template(MessageType.C_HORN, 0)
         self._wait_for_server_response()
+        self.event_buffer_stale = True
 
     def execute_command(self, command: str):
         """
@@ -410,12 +653,10 @@ class TMInterface(object):
         Args:
             command (str): the command to execute
         """
+        # Commands can modify the event buffer, e.g. by loading inputs
+        self.event_buffer = None
         command_str = ClassicString(command)
-
-        msg = Message(MessageType.C_EXECUTE_COMMAND)
-        msg.write_int32(0)
-        msg.write_buffer(command_str.data)
-        self._send_message(msg)
+        self._send_template(MessageType.C_EXECUTE_COMMAND, 0, data=command_str.data)
         self._wait_for_server_response()
 
     def remove_state_validation(self):
@@ -430,9 +671,7 @@ class TMInterface(object):
         therefore allowing for input modification without stopping
         the simulation prematurely.
         """
-        msg = Message(MessageType.C_REMOVE_STATE_VALIDATION)
-        msg.write_int32(0)
-        self._send_message(msg)
+        self._send_template(MessageType.C_REMOVE_STATE_VALIDATION, 0)
         self._wait_for_server_response()
 
     def prevent_simulation_finish(self):
@@ -445,9 +684,7 @@ class TMInterface(object):
         and can be also done manually in the client if additional handling
         is required.
         """
-        msg = Message(MessageType.C_PREVENT_SIMULATION_FINISH)
-        msg.write_int32(0)
-        self._send_message(msg)
+        self._send_template(MessageType.C_PREVENT_SIMULATION_FINISH, 0)
         self._wait_for_server_response()
 
     def rewind_to_state(self, state: SimStateData):
@@ -473,25 +710,20 @@ class TMInterface(object):
         being at time 10. If you want to apply any immediate input state,
         make sure to apply it in the same physics step as the call to rewind_to_state.
 
+        After rewinding, Client.on_checkpoint_count_changed and Client.on_laps_count_changed
+        are called with the counts of the state (see SimStateData.checkpoint_counts), unless
+        rewind_callbacks is disabled. Hooks the client does not override are not called.
+
         Args:
             state (SimStateData): the state to restore, obtained through get_simulation_state
         """
-        msg = Message(MessageType.C_SIM_REWIND_TO_STATE)
-        msg.write_buffer(state.data)
-        self._send_message(msg)
-
-        # Send client the number of CPs of the state rewinded to
-        cp_count = len([cp_time.time for cp_time in state.cp_data.cp_times if cp_time.time != -1])
-        cp_target = len(state.cp_data.cp_times)
-        self.client.on_checkpoint_count_changed(self, cp_count, cp_target)
-
-        # Send client the number of laps of the state rewinded to
-        if (len(state.cp_data.cp_states) > 0):
-            lap_count = cp_count // len(state.cp_data.cp_states)
-            self.client.on_laps_count_changed(self, lap_count)
-
+        self._send_template(MessageType.C_SIM_REWIND_TO_STATE, data=state.data)
         self._wait_for_server_response()
 
+        # Send client the number of CPs and laps of the state rewinded to
+        for name, *args in self._rewind_callbacks(state):
+            getattr(self.client, name)(self, *args)
+
     def set_checkpoint_state(self, data: CheckpointData):
         """
         Sets the checkpoint state of the game.
@@ -500,9 +732,7 @@ class TMInterface(object):
         Args:
             data (CheckpointData): the checkpoint data
         """
-        msg = Message(MessageType.C_SET_CHECKPOINT_STATE)
-        msg.write_buffer(data.data)
-        self._send_message(msg)
+        self._send_template(MessageType.C_SET_CHECKPOINT_STATE, data=data.data)
         self._wait_for_server_response()
 
     def set_event_buffer(self, data: EventBufferData):
@@ -518,17 +748,15 @@ class TMInterface(object):
         Args:
             data (EventBufferData): the new event buffer
         """
-        msg = Message(MessageType.C_SIM_SET_EVENT_BUFFER)
-        for _ in range(10):
-            msg.write_int32(-1)
-
-        msg.write_int32(data.events_duration)
-        msg.write_uint32(len(data.events))
-        for event in data.events:
-            msg.write_buffer(event.data)
+        try:
+            self._send_event_buffer(data)
+            self._wait_for_server_response()
+        except Exception:
+            # The server may or may not have replaced its buffer
+            self.event_buffer = None
+            raise
 
-        self._send_message(msg)
-        self._wait_for_server_response()
+        self._mirror_event_buffer(data)
 
     def get_context_mode(self) -> int:
         """
@@ -538,16 +766,29 @@ class TMInterface(object):
         "run" mode, that is a normal race or "simulation" mode, which is when
         a player validates a replay.
 
+        The context mode can only change when a simulation begins or ends. If cache_context_mode
+        is enabled, the mode is requested from the server once and cached until the next
+        simulation begin, simulation end or client registration.
+
         Returns:
             int: MODE_SIMULATION (0) if the player is in the simulation mode, MODE_RUN (1) if in a normal race
         """
-        msg = Message(MessageType.C_GET_CONTEXT_MODE)
-        self._send_message(msg)
+        if self.context_mode is not None:
+            self.round_trips_saved += 1
+            return self.context_mode
+
+        self._send_template(MessageType.C_GET_CONTEXT_MODE)
         self._wait_for_server_response(False)
+        return self._read_context_mode()
 
+    def _read_context_mode(self) -> int:
         self.mfile.seek(8)
         mode = self._read_int32()
         self._clear_buffer()
+
+        if self.cache_context_mode:
+            self.context_mode = mode
+
         return mode
 
     def get_checkpoint_state(self) -> CheckpointData:
@@ -559,44 +800,94 @@ class TMInterface(object):
         Returns:
             CheckpointData: the object that holds the two arrays representing checkpoint state
         """
-        msg = Message(MessageType.C_GET_CHECKPOINT_STATE)
-        self._send_message(msg)
+        self._send_template(MessageType.C_GET_CHECKPOINT_STATE)
         self._wait_for_server_response(False)
+        return self._read_checkpoint_state()
 
-        self.mfile.seek(4)
-        error_code = self._read_int32()
+    def _read_checkpoint_state(self) -> CheckpointData:
+        error_code = self._read_error_code()
         if error_code == NO_PLAYER_INFO:
             raise ServerException('Failed to get checkpoint state: no player info available')
 
+        if error_code == RESPONSE_CHUNKED:
+            return CheckpointData(self._receive_chunked()[:CheckpointData.min_size])
+
         data = CheckpointData(self.mfile.read(CheckpointData.min_size))
 
         self._clear_buffer()
         return data
 
-    def get_simulation_state(self) -> SimStateData:
+    def get_simulation_state(self, state: SimStateData = None, view: bool = False) -> SimStateData:
         """
         Gets the current simulation state of the race.
 
         The method can be called in on_run_step or on_simulation_step calls.
         See SimStateData for more information.
 
+        By default, the state is copied once from the shared buffer into a new SimStateData.
+        To avoid allocating a new object on every call, pass an existing state, which will be
+        overwritten in place. Its data is reused if the size of the state did not change.
+
+        Pass view=True to decode the state directly from the shared buffer, without copying it.
+        A viewing state is only valid until the next message is sent through this TMInterface instance,
+        this includes any other call as well as returning from the current hook. After that, the
+        buffer is overwritten with new messages. Use it to read a few fields of the state right
+        away, and copy it with SimStateData(bytearray(state.data)) if it is needed for longer.
+        A state larger than the buffer, transferred in parts (see chunked_transfer), is always copied.
+
+        Args:
+            state (SimStateData): an existing state to overwrite, None to create a new one
+            view (bool): whether to return a state viewing the shared buffer instead of a copy
+
         Returns:
             SimStateData: the object holding the simulation state
         """
-        msg = Message(MessageType.C_SIM_GET_STATE)
-        self._send_message(msg)
+        self._send_template(MessageType.C_SIM_GET_STATE)
         self._wait_for_server_response(False)
+        return self._read_simulation_state(state, view)
 
-        self.mfile.seek(4)
-        error_code = self._read_int32()
+    def _read_simulation_state(self, state: SimStateData, view: bool) -> SimStateData:
+        error_code = self._read_error_code()
+        if error_code == NO_PLAYER_INFO:
+            self._clear_buffer()
+            raise ServerException('Failed to get simulation state: no player info available')
 
-        state = SimStateData(self.mfile.read(SimStateData.min_size))
-        state.cp_data.read_from_file(self.mfile)
+        if error_code == RESPONSE_TOO_LONG:
+            self._clear_buffer()
+            raise ServerException('Failed to get simulation state: the state does not fit into the buffer')
 
-        if error_code == NO_PLAYER_INFO:
-            raise ServerException('Failed to get checkpoint state: no player info available')
+        if error_code == RESPONSE_CHUNKED:
+            # The state does not fit into the buffer, it can only be copied
+            data = self._receive_chunked()
+            size = len(data)
+            view = False
+        else:
+            size = SimStateData.size_in(self.buffer, 8)
+            data = self.buffer[8:8 + size]
+            self.dirty_size = max(self.dirty_size, 8 + size)
+            self.mfile.seek(8 + size)
+
+        if view:
+            state = SimStateData(data)
+            self._clear_header()
+        else:
+            if state is None:
+                state = SimStateData(bytearray(data))
+            else:
+                # The data of a state sharing it with its copies is replaced, not overwritten
+                if isinstance(state.data, bytearray) and len(state.data) == size and not state._shared:
+                    state.data[:] = data
+                else:
+                    state.data = bytearray(data)
+                    state._shared = False
 
-        self._clear_buffer()
+                state.instance_data.clear()
+
+            if error_code != RESPONSE_CHUNKED:
+                self._clear_buffer()
+
+        state.invalidate_cp_data()
+        state.update_checkpoint_counts()
         return state
 
     def get_event_buffer(self) -> EventBufferData:
@@ -608,68 +899,69 @@ class TMInterface(object):
 
         See EventBufferData for more information.
 
+        If shadow_event_buffer is enabled, the event buffer is mirrored on the client for the
+        duration of a simulation. The mirror is kept up to date by set_event_buffer and
+        clear_event_buffer, so getting the buffer again does not need a request to the server.
+        Calls that make the server add events (set_input_state, respawn and horn)
+        mark the mirrored events as stale, the next call requests the buffer from the server again.
+        The mirror is dropped whenever the server may change the buffer on its own: after
+        execute_command, a failed set_event_buffer and on every bruteforce evaluation.
+        Enable it only if the buffer is not modified by other means, e.g. by console commands
+        executed by the player.
+
         Returns:
             EventBufferData: the event buffer holding all the inputs of the current simulation
         """
-        msg = Message(MessageType.C_SIM_GET_EVENT_BUFFER)
-        self._send_message(msg)
-        self._wait_for_server_response(False)
+        if self.event_buffer is not None and not self.event_buffer_stale:
+            if self.check_event_buffer:
+                self._check_event_buffer(self._request_event_buffer(), True)
 
-        self.mfile.seek(4)
-        error_code = self._read_uint32()
-        if error_code == NO_EVENT_BUFFER:
-            raise ServerException('Failed to get event buffer: no event buffer available')
-
-        names = [None] * 10
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_RACE_START_NAME
-
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_RACE_FINISH_NAME
+            return self.event_buffer.copy()
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_ACCELERATE_NAME
+        data = self._request_event_buffer()
+        if self.shadow_event_buffer and self.simulating:
+            self.event_buffer = data.copy()
+            self.event_buffer_stale = False
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_BRAKE_NAME
+        return data
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_LEFT_NAME
+    def _request_event_buffer(self) -> EventBufferData:
+        self._send_template(MessageType.C_SIM_GET_EVENT_BUFFER)
+        self._wait_for_server_response(False)
+        return self._read_event_buffer()
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_RIGHT_NAME
+    def _read_event_buffer(self) -> EventBufferData:
+        error_code = self._read_error_code()
+        if error_code == NO_EVENT_BUFFER:
+            self._clear_buffer()
+            raise ServerException('Failed to get event buffer: no event buffer available')
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = ANALOG_STEER_NAME
+        if error_code == RESPONSE_TOO_LONG:
+            self._clear_buffer()
+            raise ServerException('Failed to get event buffer: the event buffer does not fit into the buffer')
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = ANALOG_ACCELERATE_NAME
+        if error_code == RESPONSE_CHUNKED:
+            return self._parse_event_buffer(self._receive_chunked(), 0)[0]
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_RESPAWN_NAME
+        data, end = self._parse_event_buffer(self.buffer, 8)
+        self.mfile.seek(end)
+        self._clear_buffer()
+        return data
 
-        _id = self._read_int32()
-        if _id != -1:
-            names[_id] = BINARY_HORN_NAME
+    def _parse_event_buffer(self, buffer, offset: int) -> tuple:
+        # Returns the event buffer stored in the buffer and the offset after it
+        ids = struct.unpack_from('10i', buffer, offset)
+        names = [None] * 10
+        for name, _id in zip(EVENT_BUFFER_NAMES_ORDER, ids):
+            if _id != -1:
+                names[_id] = name
 
-        data = EventBufferData(self._read_uint32())
-        data.control_names = names
-        events = self._read_uint32()
-        for _ in range(events):
-            ev = Event(self.mfile.read(Event.min_size))
-            data.events.append(ev)
+        events_duration, events = struct.unpack_from('II', buffer, offset + 40)
+        offset += 48
 
-        self._clear_buffer()
-        return data
+        # Copy all events out of the buffer at once, Event objects are created on access
+        array = np.frombuffer(buffer, EVENT_DTYPE, events, offset).copy()
+        return EventBufferData.from_array(events_duration, array, names), offset + array.nbytes
 
     def clear_event_buffer(self):
         """
@@ -678,8 +970,18 @@ class TMInterface(object):
 
         A race running event should always be present in the buffer, to
         make the game start the race.
+
+        If the event buffer is mirrored (see get_event_buffer), the cleared
+        buffer is sent without requesting the current one from the server.
         """
-        event_buffer = self.get_event_buffer()
+        if self.event_buffer is not None:
+            if self.check_event_buffer:
+                self._check_event_buffer(self._request_event_buffer(), not self.event_buffer_stale)
+
+            event_buffer = self._empty_event_buffer()
+        else:
+            event_buffer = self.get_event_buffer()
+
         event_buffer.clear()
         self.set_event_buffer(event_buffer)
 
@@ -705,9 +1007,7 @@ class TMInterface(object):
             time (int): the time at which the game stops simulating, pass -1 to reset
                         to the original value
         """
-        msg = Message(MessageType.C_SIM_SET_TIME_LIMIT)
-        msg.write_int32(time)
-        self._send_message(msg)
+        self._send_template(MessageType.C_SIM_SET_TIME_LIMIT, time)
         self._wait_for_server_response()
 
     def register_custom_command(self, command: str):
@@ -733,13 +1033,11 @@ class TMInterface(object):
             command (str): the command to register, the command cannot contain spaces
         """
         str = ClassicString(command)
-
-        msg = Message(MessageType.C_REGISTER_CUSTOM_COMMAND)
-        msg.write_int32(0)
-        msg.write_buffer(str.data)
-        self._send_message(msg)
+        self._send_template(MessageType.C_REGISTER_CUSTOM_COMMAND, 0, data=str.data)
         self._wait_for_server_response(False)
+        self._read_custom_command_response(command)
 
+    def _read_custom_command_response(self, command: str):
         self.mfile.seek(4)
         error_code = self._read_int32()
         if error_code == COMMAND_ALREADY_REGISTERED:
@@ -757,6 +1055,10 @@ class TMInterface(object):
             message (str): the message to print
             severity (str): one of: "log", "success", "warning", "error", the message severity
         """
+        self._send_message(self._log_message(message, severity))
+        self._wait_for_server_response()
+
+    def _log_message(self, message: str, severity: str) -> Message:
         severity_id = 0
         if severity == 'success':
             severity_id = 1
@@ -768,20 +1070,96 @@ class TMInterface(object):
         msg = Message(MessageType.C_LOG)
         msg.write_int32(severity_id)
         self._write_vector(msg, [ord(c) for c in message], 1)
-        self._send_message(msg)
-        self._wait_for_server_response()
+        return msg
 
-    def _on_bruteforce_validate_call(self, msgtype: MessageType):
-        info = BFEvaluationInfo(self.mfile.read(BFEvaluationInfo.min_size))
-
-        resp = self.client.on_bruteforce_evaluate(self, info)
+    def _respond_to_bruteforce_call(self, msgtype: int, resp: BFEvaluationResponse):
         if not resp:
             resp = BFEvaluationResponse()
 
-        msg = Message(MessageType.C_PROCESSED_CALL)
-        msg.write_int32(msgtype)
-        msg.write_buffer(resp.data)
-        self._send_message(msg)
+        self._send_template(MessageType.C_PROCESSED_CALL, msgtype, data=resp.data)
+
+    def _input_state_values(self, kwargs: dict) -> tuple:
+        return (
+            int(kwargs.get('left', -1)),
+            int(kwargs.get('right', -1)),
+            int(kwargs.get('accelerate', -1)),
+            int(kwargs.get('brake', -1)),
+            kwargs.get('steer', MAXINT32),
+            kwargs.get('gas', MAXINT32)
+        )
+
+    def _send_event_buffer(self, data: EventBufferData):
+        # The events are serialized at once and copied into the buffer behind the fields
+        events = data.to_bytes()
+        self._send_template(
+            MessageType.C_SIM_SET_EVENT_BUFFER,
+            *_UNUSED_CONTROL_IDS,
+            data.events_duration,
+            len(events) // EVENT_DTYPE.itemsize,
+            data=events
+        )
+
+    def _mirror_event_buffer(self, data: EventBufferData):
+        if self.event_buffer is not None:
+            # The server keeps its own events duration and control names
+            mirror = EventBufferData.from_array(
+                self.event_buffer.events_duration,
+                data.to_array(),
+                self.event_buffer.control_names[:]
+            )
+            mirror.sort()
+            self.event_buffer = mirror
+            self.event_buffer_stale = False
+
+    def _rewind_callbacks(self, state: SimStateData) -> list:
+        # The checkpoint and lap count callbacks emitted after rewinding to a state
+        if not self.rewind_callbacks:
+            return []
+
+        cp_count, cp_target, lap_count = state.checkpoint_counts
+        callbacks = []
+        if self._overrides_hook('on_checkpoint_count_changed'):
+            callbacks.append(('on_checkpoint_count_changed', cp_count, cp_target))
+
+        if lap_count is not None and self._overrides_hook('on_laps_count_changed'):
+            callbacks.append(('on_laps_count_changed', lap_count))
+
+        return callbacks
+
+    def _overrides_hook(self, name: str) -> bool:
+        # Hooks are overridden in the client class or assigned on the client instance,
+        # any attribute other than the method of Client counts as an override
+        hook = getattr(self.client, name)
+        return getattr(hook, '__func__', hook) is not getattr(Client, name)
+
+    def _empty_event_buffer(self) -> EventBufferData:
+        data = EventBufferData(self.event_buffer.events_duration)
+        data.control_names = self.event_buffer.control_names[:]
+        return data
+
+    def _check_event_buffer(self, data: EventBufferData, check_events: bool):
+        if data.events_duration != self.event_buffer.events_duration:
+            raise EventBufferMismatchException(
+                f'Mirrored events duration {self.event_buffer.events_duration} does not match {data.events_duration}'
+            )
+
+        if data.control_names != self.event_buffer.control_names:
+            raise EventBufferMismatchException('Mirrored control names do not match the server control names')
+
+        if check_events:
+            # The order of events with equal times depends on how the server sorts the buffer
+            mirrored = np.sort(self.event_buffer.to_array(), order=['time', 'input_data'])
+            events = np.sort(data.to_array(), order=['time', 'input_data'])
+            if not np.array_equal(mirrored, events):
+                raise EventBufferMismatchException('Mirrored events do not match the server events')
+
+    def _in_simulation(self, clear_events: bool) -> bool:
+        # Only request the context mode if the events would be cleared
+        if not clear_events:
+            self.round_trips_saved += 1
+            return False
+
+        return self.get_context_mode() == MODE_SIMULATION
 
     def _write_vector(self, msg: Message, vector: list, field_sizes):
         is_list = isinstance(field_sizes, list)
@@ -790,12 +1168,13 @@ class TMInterface(object):
         else:
             item_size = field_sizes
 
-        if len(msg) + 4 > self.buffer_size:
+        max_size = MAXINT32 if self._chunked_transfer_enabled() else self.buffer_size
+        if len(msg) + 4 > max_size:
             return False
 
         vsize = len(vector)
         msgsize = len(msg) + 4 + item_size * vsize
-        if msgsize > self.buffer_size:
+        if msgsize > max_size:
             msg.write_int32(0)
             msg.error_code = RESPONSE_TOO_LONG
             return True
@@ -811,110 +1190,168 @@ class TMInterface(object):
 
         return True
 
-    def __read_vector(self, field_sizes: Tuple[int, list]) -> list:
-        if self.mfile.tell() + 4 > self.buffer_size:
-            return []
-
-        size = self._read_int32()
-        vec = []
-        for _ in range(size):
-            if isinstance(field_sizes, list):
-                tup = []
-                for size in field_sizes:
-                    tup.append(self._read_int(size))
-
-                vec.append(tuple(tup))
-            else:
-                vec.append(self._read_int(field_sizes))
-
-        return vec
-
     def _main_thread(self):
+        polls = 0
+        delay = 0.00001
         while self.running:
             if not self._ensure_connected():
-                time.sleep(0)
+                self.close_event.wait(self.idle_delay)
                 continue
 
             if not self.registered:
-                msg = Message(MessageType.C_REGISTER)
-                self._send_message(msg)
-                self._wait_for_server_response()
-                self.registered = True
+                self._register()
 
-            self._process_server_message()
-            time.sleep(0)
+            if self._process_server_message():
+                polls = 0
+                delay = 0.00001
+                continue
+
+            # Calls arrive back to back while the game is running or simulating, start
+            # sleeping between polls only after some time without any calls
+            polls += 1
+            if polls < 100:
+                time.sleep(0)
+            else:
+                time.sleep(delay)
+                delay = min(delay * 2, self.idle_delay)
 
-    def _process_server_message(self):
+    def _process_server_message(self) -> bool:
+        call = self._read_server_call()
+        if call is None:
+            return False
+
+        msgtype, hook, args = call
+        if msgtype == MessageType.S_SHUTDOWN:
+            self.close()
+            self.client.on_shutdown(self)
+            return True
+
+        self._before_server_call(msgtype)
+        if self.metrics is not None:
+            start = time.perf_counter_ns()
+            result = getattr(self.client, hook)(self, *args)
+            self.metrics.record_hook(hook, time.perf_counter_ns() - start)
+        else:
+            result = getattr(self.client, hook)(self, *args)
+
+        self._after_server_call(msgtype)
+
+        # The client closed itself inside the hook, the response would
+        # overwrite the deregistration before the server reads it
+        if not self.running:
+            return True
+
+        if msgtype == MessageType.S_ON_BRUTEFORCE_EVALUATE:
+            self._respond_to_bruteforce_call(msgtype, result)
+        else:
+            self._respond_to_call(msgtype)
+
+        return True
+
+    def _read_server_call(self):
+        # Reads a pending server call, returning its type, the client hook
+        # handling the call and the hook arguments or None if there is no call
         if self.mfile is None:
-            return
+            return None
 
-        self.mfile.seek(0)
-        msgtype = self._read_int32()
+        msgtype = self.header[0]
         if msgtype & 0xFF00 == 0:
-            return
+            return None
 
         msgtype &= 0xFF
+        error_code = _error_code.unpack_from(self.buffer, 4)[0]
+        if error_code == RESPONSE_CHUNKED and MessageType.S_RESPONSE < msgtype < MessageType.C_REGISTER:
+            self._record_chunked_server_call(msgtype)
+            return self._parse_server_call(msgtype, self._receive_chunked())
+
+        self.mfile.seek(8)
+        call = self._parse_server_call(msgtype, None)
+        if call is not None and (self.metrics is not None or self.recorder is not None):
+            self._record_server_call(msgtype)
+
+        return call
+
+    def _record_chunked_server_call(self, msgtype: int):
+        # The call does not fit into the buffer, record the first part
+        # as received before requesting the rest from the server
+        if self.metrics is not None or self.recorder is not None:
+            self.mfile.seek(min(12 + struct.unpack_from('I', self.buffer, 8)[0], self.buffer_size))
+            self._record_server_call(msgtype)
 
-        # error_code = self.__read_int32()
-        self._skip(4)
+    def _parse_server_call(self, msgtype: int, payload: bytearray):
+        # Parses a call from the file position, or from the payload if the call was chunked
+        if msgtype == MessageType.S_ON_CUSTOM_COMMAND:
+            if payload is not None:
+                return msgtype, 'on_custom_command', self._parse_custom_command(payload, 0)[0]
+
+            args, end = self._parse_custom_command(self.buffer, 8)
+            self.mfile.seek(end)
+            return msgtype, 'on_custom_command', args
 
         if msgtype == MessageType.S_SHUTDOWN:
-            self.close()
-            self.client.on_shutdown(self)
+            return msgtype, 'on_shutdown', ()
         elif msgtype == MessageType.S_ON_RUN_STEP:
-            _time = self._read_int32()
-            self.client.on_run_step(self, _time)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_run_step', (self._read_int32(),)
         elif msgtype == MessageType.S_ON_SIM_BEGIN:
-            self.client.on_simulation_begin(self)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_simulation_begin', ()
         elif msgtype == MessageType.S_ON_SIM_STEP:
-            _time = self._read_int32()
-            self.client.on_simulation_step(self, _time)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_simulation_step', (self._read_int32(),)
         elif msgtype == MessageType.S_ON_SIM_END:
-            result = self._read_int32()
-            self.client.on_simulation_end(self, result)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_simulation_end', (self._read_int32(),)
         elif msgtype == MessageType.S_ON_CHECKPOINT_COUNT_CHANGED:
             current = self._read_int32()
             target = self._read_int32()
-            self.client.on_checkpoint_count_changed(self, current, target)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_checkpoint_count_changed', (current, target)
         elif msgtype == MessageType.S_ON_LAPS_COUNT_CHANGED:
-            current = self._read_int32()
-            self.client.on_laps_count_changed(self, current)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_laps_count_changed', (self._read_int32(),)
         elif msgtype == MessageType.S_ON_BRUTEFORCE_EVALUATE:
-            self._on_bruteforce_validate_call(msgtype)
+            return msgtype, 'on_bruteforce_evaluate', (BFEvaluationInfo(self.mfile.read(BFEvaluationInfo.min_size)),)
         elif msgtype == MessageType.S_ON_REGISTERED:
-            self.registered = True
-            self.client.on_registered(self)
-            self._respond_to_call(msgtype)
-        elif msgtype == MessageType.S_ON_CUSTOM_COMMAND:
-            _from = self._read_int32()
-            to = self._read_int32()
-            n_args = self._read_int32()
-            command = self._read_string()
-            args = []
-            for _ in range(n_args):
-                args.append(self._read_string())
-
-            self.client.on_custom_command(self, _from, to, command, args)
-            self._respond_to_call(msgtype)
+            return msgtype, 'on_registered', ()
 
-    def _is_mapped_file_present(self):
-        FILE_MAP_ALL_ACCESS = 0xF001F
-        inherit_handle = 0
-        HANDLE_NAME = c_char_p(bytes(self.server_name.encode()))
-        h = windll.kernel32.OpenFileMappingA(FILE_MAP_ALL_ACCESS, inherit_handle, HANDLE_NAME)
-        is_opened = h != 0
+        return None
+
+    def _parse_custom_command(self, buffer, offset: int) -> tuple:
+        # Returns the hook arguments of a custom command call and the offset after the call.
+        # A malformed call is reported to the client, keeping the strings read before the error
+        _from, to = 0, 0
+        strings = []
+        try:
+            _from, to, n_args = struct.unpack_from('iii', buffer, offset)
+            offset += 12
+            for _ in range(n_args + 1):
+                string, offset = _unpack_string(buffer, offset)
+                strings.append(string)
+        except struct.error as e:
+            self.client.on_client_exception(self, e)
+            if not strings:
+                strings.append('')
+
+        return (_from, to, strings[0], strings[1:]), offset
+
+    def _before_server_call(self, msgtype: int):
+        if msgtype == MessageType.S_ON_SIM_BEGIN:
+            self.context_mode = None
+            self.simulating = True
+            self.event_buffer = None
+        elif msgtype == MessageType.S_ON_REGISTERED:
+            self.registered = True
+            self.context_mode = None
+            self.simulating = False
+            self.event_buffer = None
+        elif msgtype == MessageType.S_ON_BRUTEFORCE_EVALUATE:
+            # Bruteforce changes the inputs of the simulation between evaluations
+            self.event_buffer = None
 
-        if is_opened:
-            # close again to prevent handle leaks
-            windll.kernel32.CloseHandle(h)
+    def _after_server_call(self, msgtype: int):
+        # The game leaves the simulation after the call is processed
+        if msgtype == MessageType.S_ON_SIM_END:
+            self.context_mode = None
+            self.simulating = False
+            self.event_buffer = None
 
-        return is_opened
+    def _is_mapped_file_present(self):
+        return self.transport.is_present()
 
     def _ensure_connected(self):
         if self.mfile is not None:
@@ -924,9 +1361,12 @@ class TMInterface(object):
             if not self._is_mapped_file_present():
                 print(f"No TMI instance with server name {self.server_name} found, waiting for TMI instance to open..")
                 while not self._is_mapped_file_present():
-                    time.sleep(1)
+                    if self.close_event.wait(1):
+                        return False
 
-            self.mfile = mmap.mmap(-1, self.buffer_size, tagname=self.server_name)
+            self.mfile = self.transport.open()
+            self.buffer = memoryview(self.mfile)
+            self.header = self.buffer[:4].cast('i')
             return True
         except Exception as e:
             self.client.on_client_exception(self, e)
@@ -937,33 +1377,211 @@ class TMInterface(object):
         if self.mfile is None:
             return
 
-        self.mfile.seek(0)
-        while self._read_int32() != MessageType.S_RESPONSE | 0xFF00:
-            self.mfile.seek(0)
-            time.sleep(0)
+        self.wait_strategy.wait(self.header, MessageType.S_RESPONSE | 0xFF00)
+        if self.metrics is not None:
+            self.metrics.record_round_trip(self.sent_type, time.perf_counter_ns() - self.sent_time)
 
         if clear:
             self._clear_buffer()
 
     def _respond_to_call(self, msgtype: int):
-        msg = Message(MessageType.C_PROCESSED_CALL)
-        msg.write_int32(msgtype)
-        self._send_message(msg)
+        self._send_template(MessageType.C_PROCESSED_CALL, msgtype)
 
     def _send_message(self, message: Message):
         if self.mfile is None:
             return
 
-        data = message.to_data()
+        if len(message) > self.buffer_size:
+            self._send_chunked(message._type, message.data)
+            return
+
+        if self.payload_dirty:
+            self._clear_buffer()
+
+        self.dirty_size = message.pack_into(self.buffer)
+        if self.metrics is not None or self.recorder is not None:
+            self._record_sent(message._type)
+
+        self.header[0] = message._type | 0xFF00
+
+    def _send_template(self, msgtype: int, *values, data=None):
+        if self.mfile is None:
+            return
+
+        if data is not None and MESSAGE_TEMPLATES[msgtype].size + len(data) > self.buffer_size:
+            self._send_chunked(msgtype, MESSAGE_TEMPLATES[msgtype].layout.pack(0, *values)[4:] + data)
+            return
+
+        if self.payload_dirty:
+            self._clear_buffer()
+
+        # The header is written last, the server reads the message
+        # as soon as the message type is set with the 0xFF flag
+        self.dirty_size = MESSAGE_TEMPLATES[msgtype].pack_into(self.buffer, *values, data=data)
+        if self.metrics is not None or self.recorder is not None:
+            self._record_sent(msgtype)
+
+        self.header[0] = msgtype | 0xFF00
+
+    def _register(self):
+        self._send_template(MessageType.C_REGISTER, CAPABILITIES_MAGIC, self._client_capabilities())
+        self._wait_for_server_response(False)
+        self._read_server_capabilities()
+        self._clear_buffer()
+        self.registered = True
+
+    def _client_capabilities(self) -> int:
+        return CAPABILITY_CHUNKED_TRANSFER if self.chunked_transfer else 0
+
+    def _read_server_capabilities(self):
+        # Servers that do not support capabilities leave the registration message in the buffer,
+        # which holds CAPABILITIES_MAGIC and not the response magic
+        magic, capabilities = struct.unpack_from('ii', self.buffer, 8)
+        if magic == CAPABILITIES_RESPONSE_MAGIC:
+            self.server_capabilities = capabilities
+            self.mfile.seek(16)
+        else:
+            self.server_capabilities = 0
+
+    def _chunked_transfer_enabled(self) -> bool:
+        return self.chunked_transfer and self.server_capabilities & CAPABILITY_CHUNKED_TRANSFER != 0
+
+    def _read_error_code(self) -> int:
+        # Reads the error code of the response, leaving the file positioned at its payload
+        self.mfile.seek(4)
+        return self._read_int32()
+
+    def _check_chunked_transfer(self, msgtype: int):
+        if not self._chunked_transfer_enabled():
+            raise ServerException(f'Failed to send {MessageType(msgtype).name}: the message does not fit into '
+                                  f'the buffer of {self.buffer_size} bytes and chunked transfer is not available')
+
+    def _send_chunked(self, msgtype: int, payload):
+        self._check_chunked_transfer(msgtype)
+        self._complete_transfer(self._send_chunks(msgtype, payload))
+
+    def _receive_chunked(self) -> bytearray:
+        return self._complete_transfer(self._receive_chunks())
+
+    def _complete_transfer(self, transfer) -> bytearray:
+        # Runs the steps of a chunked transfer, waiting for the server to respond to each part
+        try:
+            while True:
+                next(transfer)
+                self._wait_for_server_response(False)
+        except StopIteration as e:
+            return e.value
+
+    def _send_chunks(self, msgtype: int, payload):
+        # Sends the payload in parts that fit into the buffer, yielding to wait for the server
+        # to acknowledge every part but the last one. The server handles the message
+        # once it has received the last part, the response to it is the response to the message
+        payload = memoryview(payload)
+        part_size = self.buffer_size - CHUNK_HEADER_SIZE
+        offset = 0
+        while True:
+            end = min(offset + part_size, len(payload))
+            self._send_template(MessageType.C_TRANSFER_CHUNK, msgtype, len(payload), offset, data=payload[offset:end])
+            if end == len(payload):
+                return
+
+            yield
+            self.mfile.seek(4)
+            if self._read_int32() != 0:
+                self._clear_buffer()
+                raise ServerException(f'Failed to send {MessageType(msgtype).name}: the server rejected a part of the message')
+
+            self._clear_buffer()
+            offset = end
+
+    def _receive_chunks(self):
+        # The first part of the payload follows its total size, the following parts
+        # are requested from the server one by one, yielding to wait for each of them.
+        # Returns the whole payload
+        total = struct.unpack_from('I', self.buffer, 8)[0]
+        end = min(12 + total, self.buffer_size)
+        payload = bytearray(self.buffer[12:end])
+        self.mfile.seek(end)
+        self._clear_buffer()
+
+        while len(payload) < total:
+            self._send_template(MessageType.C_GET_CHUNK, len(payload))
+            yield
+            self.mfile.seek(4)
+            if self._read_int32() != 0:
+                self._clear_buffer()
+                raise ServerException('Failed to receive a message: the server has no more parts to send')
+
+            end = 8 + min(total - len(payload), self.buffer_size - 8)
+            payload += self.buffer[8:end]
+            self.mfile.seek(end)
+            self._clear_buffer()
+
+        return payload
+
+    def _record_sent(self, msgtype: int):
+        # Rewind the file so that the size of the response can be
+        # taken from the file position once it has been read
+        if self.metrics is not None:
+            self.metrics.record_sent(msgtype, self.dirty_size)
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.CLIENT_MESSAGE, msgtype, self.buffer[4:self.dirty_size])
+
         self.mfile.seek(0)
-        self.mfile.write(data)
+        if msgtype == MessageType.C_PROCESSED_CALL or msgtype == MessageType.C_DEREGISTER:
+            self.sent_type = None
+        else:
+            self.sent_type = msgtype
 
-        self.mfile.seek(1)
-        self.mfile.write(bytearray([0xFF]))
+        self.sent_time = time.perf_counter_ns()
+
+    def _record_received(self):
+        # Called when a response is cleared, the header and error code are always read
+        if self.sent_type is not None:
+            size = max(self.mfile.tell(), 8)
+            if self.metrics is not None:
+                self.metrics.record_received(self.sent_type, size)
+            if self.recorder is not None:
+                self.recorder.record(RecordKind.SERVER_RESPONSE, self.sent_type, self.buffer[4:size])
+
+            self.sent_type = None
+
+    def _record_server_call(self, msgtype: int):
+        # The call has been read up to the file position
+        size = self.mfile.tell()
+        if self.metrics is not None:
+            self.metrics.record_received(msgtype, size)
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.SERVER_CALL, msgtype, self.buffer[4:size])
 
     def _clear_buffer(self):
-        self.mfile.seek(0)
-        self.mfile.write(self.empty_buffer)
+        if self.metrics is not None or self.recorder is not None:
+            self._record_received()
+
+        if self.clear_mode == BufferClearMode.FULL:
+            end = self.buffer_size
+        elif self.clear_mode == BufferClearMode.DIRTY:
+            end = min(max(self.dirty_size, self.mfile.tell()), self.buffer_size)
+        else:
+            end = 4
+
+        # Clear the header last: the server can write a new message
+        # into the buffer as soon as it sees an empty header
+        if end > 4:
+            self.buffer[4:end] = memoryview(self.empty_buffer)[4:end]
+
+        self.header[0] = 0
+        self.payload_dirty = False
+        self.dirty_size = 0
+
+    def _clear_header(self):
+        # Leave the payload in place until the next message is sent,
+        # it is still being viewed by the caller
+        if self.metrics is not None or self.recorder is not None:
+            self._record_received()
+
+        self.header[0] = 0
+        self.payload_dirty = True
 
     def _read(self, num_bytes: int, typestr: str):
         arr = self.mfile.read(num_bytes)
@@ -995,9 +1613,5 @@ class TMInterface(object):
     def _read_uint16(self):
         return self._read(2, 'H')
 
-    def _read_string(self):
-        chars = [chr(b) for b in self.__read_vector(1)]
-        return ''.join(chars)
-
     def _skip(self, n):
         self.mfile.seek(self.mfile.tell() + n)
@@ -0,0 +1,330 @@
+import threading
+import time
+
+
+class LatencyHistogram(object):
+    """
+    A histogram of latencies in nanoseconds with logarithmic buckets, in the style of HdrHistogram.
+
+    Each power of two is divided into 16 linear sub-buckets, so every recorded value is
+    counted with a relative error of at most 1/16 (6.25%), no matter its magnitude. Values
+    below 32ns are counted exactly. Recording a value is a constant time operation that does
+    not allocate, which keeps the histogram cheap enough to record every message.
+
+    Attributes:
+        counts (list): the number of values recorded in each bucket
+        count (int): the number of values recorded
+        total (int): the sum of the values recorded, in nanoseconds
+        min (int): the smallest value recorded, in nanoseconds
+        max (int): the largest value recorded, in nanoseconds
+    """
+    SUB_BUCKETS = 16
+    BUCKETS = 64 * SUB_BUCKETS
+
+    def __init__(self):
+        self.counts = [0] * LatencyHistogram.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket_index(value: int) -> int:
+        """
+        Computes the index of the bucket a value is counted in.
+
+        Args:
+            value (int): the value in nanoseconds
+
+        Returns:
+            int: the index of the bucket
+        """
+        if value < 2 * LatencyHistogram.SUB_BUCKETS:
+            return max(value, 0)
+
+        # Keep the 5 most significant bits of the value, the leading one
+        # selects the power of two and the remaining four the sub-bucket
+        shift = value.bit_length() - 5
+        return min((shift + 1) * LatencyHistogram.SUB_BUCKETS + (value >> shift) - LatencyHistogram.SUB_BUCKETS,
+                   LatencyHistogram.BUCKETS - 1)
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """
+        Computes the value that represents a bucket, the middle of its range.
+
+        Args:
+            index (int): the index of the bucket
+
+        Returns:
+            int: the value in nanoseconds
+        """
+        if index < 2 * LatencyHistogram.SUB_BUCKETS:
+            return index
+
+        shift = index // LatencyHistogram.SUB_BUCKETS - 1
+        lowest = (index % LatencyHistogram.SUB_BUCKETS + LatencyHistogram.SUB_BUCKETS) << shift
+        return lowest + (1 << shift) // 2
+
+    def record(self, value: int):
+        """
+        Records a value.
+
+        Args:
+            value (int): the value in nanoseconds
+        """
+        self.counts[LatencyHistogram.bucket_index(value)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percentile: float) -> int:
+        """
+        Computes the value at a percentile of the recorded values.
+
+        Args:
+            percentile (float): the percentile in range [0, 100]
+
+        Returns:
+            int: the value in nanoseconds, 0 if no values were recorded
+        """
+        if self.count == 0:
+            return 0
+
+        target = max(1, int(self.count * percentile / 100 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(max(LatencyHistogram.bucket_value(index), self.min), self.max)
+
+        return self.max
+
+    def summary(self) -> dict:
+        """
+        Summarizes the histogram, with all values converted to microseconds.
+
+        Returns:
+            dict: the count, mean, min, p50, p90, p99 and max of the recorded values
+        """
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count / 1000 if self.count else 0.0,
+            'min_us': self.min / 1000,
+            'p50_us': self.percentile(50) / 1000,
+            'p90_us': self.percentile(90) / 1000,
+            'p99_us': self.percentile(99) / 1000,
+            'max_us': self.max / 1000
+        }
+
+
+class Metrics(object):
+    """
+    Metrics collects instrumentation data of a TMInterface: the round trip latency of every
+    message type, the bytes sent and received for each of them, the time spent inside each
+    client hook and the number of server callbacks.
+
+    Instrumentation is opt-in. A TMInterface only records metrics if a Metrics instance
+    is passed to it, otherwise recording costs a single attribute check per message:
+
+        metrics = Metrics()
+        iface = TMInterface('TMInterface0', metrics=metrics)
+        ...
+        print(metrics.snapshot())
+
+    The round trip of a message is measured from writing it into the shared buffer until
+    the server response arrives. Comparing it with the hook times tells whether a client
+    is bound by the messaging or by its own code.
+
+    Attributes:
+        round_trips (dict): the latency histograms keyed by message type
+        hooks (dict): the latency histograms of the time spent inside client hooks, keyed by hook name
+        bytes_sent (dict): the bytes sent keyed by message type
+        bytes_received (dict): the bytes received keyed by message type, including server calls
+        callbacks (int): the number of server calls processed
+        start_time (float): the time the collection started at, from time.perf_counter
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all collected data and restarts the collection.
+        """
+        self.round_trips = {}
+        self.hooks = {}
+        self.bytes_sent = {}
+        self.bytes_received = {}
+        self.callbacks = 0
+        self.start_time = time.perf_counter()
+
+    def record_round_trip(self, msgtype: int, elapsed: int):
+        """
+        Records the round trip latency of a message.
+
+        Args:
+            msgtype (int): the message type
+            elapsed (int): the latency in nanoseconds
+        """
+        histogram = self.round_trips.get(msgtype)
+        if histogram is None:
+            histogram = self.round_trips[msgtype] = LatencyHistogram()
+
+        histogram.record(elapsed)
+
+    def record_hook(self, hook: str, elapsed: int):
+        """
+        Records the time spent inside a client hook.
+
+        Args:
+            hook (str): the name of the hook, e.g. on_simulation_step
+            elapsed (int): the time spent in nanoseconds
+        """
+        histogram = self.hooks.get(hook)
+        if histogram is None:
+            histogram = self.hooks[hook] = LatencyHistogram()
+
+        histogram.record(elapsed)
+        self.callbacks += 1
+
+    def record_sent(self, msgtype: int, size: int):
+        """
+        Records the size of a message sent to the server.
+
+        Args:
+            msgtype (int): the message type
+            size (int): the size of the message in bytes
+        """
+        self.bytes_sent[msgtype] = self.bytes_sent.get(msgtype, 0) + size
+
+    def record_received(self, msgtype: int, size: int):
+        """
+        Records the size of a message read from the server.
+
+        Args:
+            msgtype (int): the type of the message the response belongs to, or the type of the server call
+            size (int): the size of the message in bytes
+        """
+        self.bytes_received[msgtype] = self.bytes_received.get(msgtype, 0) + size
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        Creates a snapshot of the collected data, with message types converted to their names.
+
+        Args:
+            reset (bool): whether to reset the collection after the snapshot, so the next one
+                          covers only the time after this one
+
+        Returns:
+            dict: the snapshot of the collected data
+        """
+        from tminterface.interface import MessageType
+
+        # The client thread may add keys while the snapshot is created, e.g. when it is
+        # created by a MetricsReporter. The items are copied before iterating over them,
+        # which does not release the GIL.
+        elapsed = time.perf_counter() - self.start_time
+        callbacks = self.callbacks
+        round_trips = list(self.round_trips.items())
+        hooks = list(self.hooks.items())
+        bytes_sent = list(self.bytes_sent.items())
+        bytes_received = list(self.bytes_received.items())
+        if reset:
+            self.reset()
+
+        return {
+            'elapsed': elapsed,
+            'callbacks': callbacks,
+            'callbacks_per_second': callbacks / elapsed if elapsed > 0 else 0.0,
+            'round_trips': {MessageType(t).name: h.summary() for t, h in round_trips},
+            'hooks': {name: h.summary() for name, h in hooks},
+            'bytes_sent': {MessageType(t).name: n for t, n in bytes_sent},
+            'bytes_received': {MessageType(t).name: n for t, n in bytes_received},
+        }
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """
+    Formats a snapshot created by Metrics.snapshot as a human readable table.
+
+    Args:
+        snapshot (dict): the snapshot
+
+    Returns:
+        str: the formatted snapshot
+    """
+    lines = [f'{snapshot["callbacks"]} callbacks in {snapshot["elapsed"]:.1f}s ({snapshot["callbacks_per_second"]:.0f}/s)']
+
+    def histogram_line(name: str, summary: dict) -> str:
+        return (f'  {name:<32} {summary["count"]:>9}  mean {summary["mean_us"]:9.1f}us  '
+                f'p50 {summary["p50_us"]:9.1f}us  p99 {summary["p99_us"]:9.1f}us  max {summary["max_us"]:9.1f}us')
+
+    if snapshot['round_trips']:
+        lines.append('Round trips:')
+        for name, summary in sorted(snapshot['round_trips'].items()):
+            lines.append(histogram_line(name, summary))
+
+    if snapshot['hooks']:
+        lines.append('Hooks:')
+        for name, summary in sorted(snapshot['hooks'].items()):
+            lines.append(histogram_line(name, summary))
+
+    names = sorted(set(snapshot['bytes_sent']) | set(snapshot['bytes_received']))
+    if names:
+        lines.append('Bytes:')
+        for name in names:
+            lines.append(f'  {name:<32} sent {snapshot["bytes_sent"].get(name, 0):>12}  '
+                         f'received {snapshot["bytes_received"].get(name, 0):>12}')
+
+    return '\n'.join(lines)
+
+
+class MetricsReporter(object):
+    """
+    Reports snapshots of Metrics periodically from a background thread.
+
+    Args:
+        metrics (Metrics): the metrics to report
+        interval (float): the time between reports in seconds
+        report (callable): the function called with each snapshot, None to print it with format_snapshot
+        reset (bool): whether to reset the metrics after each report, so every report covers one interval
+
+    Attributes:
+        metrics (Metrics): the metrics to report
+        interval (float): the time between reports in seconds
+        report (callable): the function called with each snapshot
+        reset (bool): whether to reset the metrics after each report
+    """
+    def __init__(self, metrics: Metrics, interval: float = 5.0, report=None, reset: bool = True):
+        self.metrics = metrics
+        self.interval = interval
+        self.report = report if report is not None else lambda snapshot: print(format_snapshot(snapshot))
+        self.reset = reset
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Starts reporting.
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._report_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops reporting and waits for the reporting thread to finish.
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _report_thread(self):
+        while not self.stop_event.wait(self.interval):
+            self.report(self.metrics.snapshot(self.reset))
@@ -0,0 +1,242 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from tminterface.interface import TMInterface
+from tminterface.client import Client
+from tminterface.structs import SimStateData
+from tminterface.eventbuffer import EventBufferData
+from tminterface.constants import DEFAULT_SERVER_SIZE
+
+
+def final_state(iface: TMInterface, _time: int) -> SimStateData:
+    """
+    The default metrics function of a TMInterfacePool, returning
+    the simulation state at the end of the evaluation.
+
+    Args:
+        iface (TMInterface): the interface the job was evaluated on
+        _time (int): the race time of the step the job ended on
+
+    Returns:
+        SimStateData: the simulation state at the end of the evaluation
+    """
+    return iface.get_simulation_state()
+
+
+class EvaluationJob(object):
+    """
+    A single unit of work of a TMInterfacePool: simulate the provided event buffer
+    from the provided state until end_time and collect the metrics at that time.
+
+    Args:
+        state (SimStateData): the state to rewind to before simulating
+        event_buffer (EventBufferData): the inputs to simulate
+        end_time (int): the race time at which the metrics are collected
+        metrics (callable): the function called with the interface and the race time
+                            at end_time, its return value is the result of the job
+
+    Attributes:
+        state (SimStateData): the state to rewind to before simulating
+        event_buffer (EventBufferData): the inputs to simulate
+        end_time (int): the race time at which the metrics are collected
+        metrics (callable): the function returning the result of the job
+        future (concurrent.futures.Future): the future holding the result of the job
+        server_name (str): the server name of the instance that evaluated the job, None if it was not evaluated yet
+    """
+    def __init__(self, state: SimStateData, event_buffer: EventBufferData, end_time: int, metrics=final_state):
+        self.state = state
+        self.event_buffer = event_buffer
+        self.end_time = end_time
+        self.metrics = metrics
+        self.future = Future()
+        self.server_name = None
+
+
+class PoolClient(Client):
+    """
+    The client registered by a TMInterfacePool on each of its instances.
+
+    While a simulation is running on the instance, the client takes jobs from the pool queue
+    in on_simulation_step, rewinds to the job state and replaces the event buffer.
+    Once the race time reaches the end time of the job, the client collects the job result
+    and immediately starts the next job. Instances that finish jobs faster take more of them
+    from the shared queue, which balances the load across instances.
+
+    While there is no job to evaluate, the client holds the simulation in the step hook.
+    The server timeout is disabled on registration so the server waits for it.
+
+    Args:
+        pool (TMInterfacePool): the pool the client takes jobs from
+
+    Attributes:
+        pool (TMInterfacePool): the pool the client takes jobs from
+        job (EvaluationJob): the job being evaluated, None if the client is idle
+        jobs_completed (int): the number of jobs evaluated by the client
+        closed (threading.Event): set when the client has been closed
+    """
+    def __init__(self, pool) -> None:
+        super(PoolClient, self).__init__()
+        self.pool = pool
+        self.job = None
+        self.jobs_completed = 0
+        self.closed = threading.Event()
+
+    def on_registered(self, iface: TMInterface) -> None:
+        iface.set_timeout(-1)
+
+    def on_deregistered(self, iface: TMInterface):
+        self._fail_job(iface)
+        self.closed.set()
+
+    def on_simulation_begin(self, iface: TMInterface):
+        iface.remove_state_validation()
+
+    def on_simulation_step(self, iface: TMInterface, _time: int):
+        if self.job is not None and _time >= self.job.end_time:
+            job, self.job = self.job, None
+            try:
+                job.future.set_result(job.metrics(iface, _time))
+            except Exception as e:
+                job.future.set_exception(e)
+
+            self.jobs_completed += 1
+
+        if self.job is None:
+            self._start_next_job(iface)
+
+    def on_checkpoint_count_changed(self, iface: TMInterface, current: int, target: int):
+        # Keep the simulation running, the job ends at its end time
+        if target > 0 and current == target:
+            iface.prevent_simulation_finish()
+
+    def on_simulation_end(self, iface: TMInterface, result: int):
+        self._fail_job(iface)
+
+    def _start_next_job(self, iface: TMInterface):
+        while True:
+            if self.pool.closing:
+                iface.close()
+                return
+
+            try:
+                job = self.pool.jobs.get(timeout=self.pool.poll_interval)
+            except queue.Empty:
+                continue
+
+            if job.future.set_running_or_notify_cancel():
+                break
+
+        job.server_name = iface.server_name
+        self.job = job
+        iface.rewind_to_state(job.state)
+        iface.set_event_buffer(job.event_buffer)
+
+    def _fail_job(self, iface: TMInterface):
+        if self.job is not None:
+            job, self.job = self.job, None
+            job.future.set_exception(RuntimeError(f'Simulation on {iface.server_name} ended before the job was evaluated'))
+
+
+class TMInterfacePool(object):
+    """
+    TMInterfacePool drives many TMInterface instances (servers) from one process, to evaluate
+    candidate inputs in parallel. A TMInterface server serves only one client, so throughput
+    is scaled by running several game instances (TMInterface0, TMInterface1, ...) and connecting
+    to each of them.
+
+    Jobs are submitted to a queue shared by all instances. Each instance evaluates
+    jobs one after another while a simulation is running on it (e.g. while validating a replay),
+    see PoolClient for details. The results are returned through futures:
+
+        pool = TMInterfacePool(['TMInterface0', 'TMInterface1'])
+        pool.start()
+        results = pool.evaluate([EvaluationJob(state, event_buffer, 5000) for event_buffer in candidates])
+        pool.close()
+
+    Args:
+        server_names (list): the server names of the instances to connect to
+        buffer_size (int): the buffer size used by the servers
+        poll_interval (float): how often idle clients check if the pool is closing, in seconds
+        **kwargs: additional keyword arguments passed to each TMInterface
+
+    Attributes:
+        server_names (list): the server names of the instances
+        interfaces (list): the TMInterface of each instance
+        clients (list): the PoolClient of each instance
+        jobs (queue.Queue): the queue of jobs waiting to be evaluated
+        poll_interval (float): how often idle clients check if the pool is closing, in seconds
+        closing (bool): whether the pool is being closed
+    """
+    def __init__(self, server_names: list, buffer_size=DEFAULT_SERVER_SIZE, poll_interval: float = 0.05, **kwargs):
+        self.server_names = list(server_names)
+        self.interfaces = [TMInterface(name, buffer_size, **kwargs) for name in self.server_names]
+        self.clients = [PoolClient(self) for _ in self.server_names]
+        self.jobs = queue.Queue()
+        self.poll_interval = poll_interval
+        self.closing = False
+
+    def start(self):
+        """
+        Registers a PoolClient on each instance of the pool.
+        """
+        for iface, client in zip(self.interfaces, self.clients):
+            iface.register(client)
+
+    def submit(self, job: EvaluationJob) -> Future:
+        """
+        Queues a job to be evaluated by the first available instance.
+
+        Args:
+            job (EvaluationJob): the job to evaluate
+
+        Returns:
+            concurrent.futures.Future: the future holding the result of the job
+        """
+        self.jobs.put(job)
+        return job.future
+
+    def evaluate(self, jobs: list, timeout: float = None) -> list:
+        """
+        Evaluates all jobs across the instances of the pool and waits for their results.
+
+        Args:
+            jobs (list): the jobs to evaluate
+            timeout (float): the maximum time to wait for each result in seconds, None to wait forever
+
+        Returns:
+            list: the results of the jobs, in the same order as the jobs
+        """
+        futures = [self.submit(job) for job in jobs]
+        return [future.result(timeout) for future in futures]
+
+    def jobs_completed(self) -> dict:
+        """
+        Gets the number of jobs evaluated by each instance.
+
+        Returns:
+            dict: the number of completed jobs keyed by server name
+        """
+        return {name: client.jobs_completed for name, client in zip(self.server_names, self.clients)}
+
+    def close(self, timeout: float = 1):
+        """
+        Closes the connection to every instance of the pool.
+
+        Clients inside a simulation close their connection from the step hook. Clients that do not
+        close in the timeout window (e.g. because no simulation is running) are closed directly.
+        Jobs that were not evaluated are cancelled.
+
+        Args:
+            timeout (float): the time to wait for each client to close itself, in seconds
+        """
+        self.closing = True
+        for iface, client in zip(self.interfaces, self.clients):
+            if not client.closed.wait(timeout) and iface.running:
+                iface.close()
+
+        while True:
+            try:
+                self.jobs.get_nowait().future.cancel()
+            except queue.Empty:
+                break
@@ -0,0 +1,215 @@
+import struct
+from operator import itemgetter
+
+from tminterface.structs import SimStateData
+from tminterface.statebatch import SimStateBatch, state_dtype
+import numpy as np
+
+FIELD_ALIASES = {
+    'time': 'timers.1',
+    'position': 'dyna.current_state.position',
+    'velocity': 'dyna.current_state.linear_speed',
+    'angular_velocity': 'dyna.current_state.angular_speed',
+    'rotation_matrix': 'dyna.current_state.rotation',
+    'quat': 'dyna.current_state.quat',
+    'race_time': 'player_info.race_time',
+    'display_speed': 'player_info.display_speed',
+    'wheel_contacts': 'simulation_wheels.real_time_state.has_ground_contact',
+}
+"""
+Short names of fields that can be projected, mapped to their paths in SimStateData.
+"""
+
+_STRUCT_FORMATS = {
+    ('b', 1): '?',
+    ('i', 1): 'b', ('u', 1): 'B',
+    ('i', 2): 'h', ('u', 2): 'H',
+    ('i', 4): 'i', ('u', 4): 'I',
+    ('i', 8): 'q', ('u', 8): 'Q',
+    ('f', 4): 'f', ('f', 8): 'd',
+}
+
+
+class StateProjection(object):
+    """
+    StateProjection reads a chosen set of fields of simulation states straight from their
+    raw bytes, without creating the SimStateData struct tree. The projection is compiled once
+    into a single struct.Struct, so reading the fields of a state is one unpack_from call:
+
+        projection = StateProjection(['position', 'velocity', 'time', 'wheel_contacts',
+                                      'scene_mobil.last_has_any_lateral_contact_time'])
+        ...
+        def on_simulation_step(self, iface, _time: int):
+            position, velocity, time, contacts, lateral_contact_time = projection.unpack(iface.get_simulation_state())
+
+    A field is given by its path in SimStateData, the names of the nested fields separated
+    by dots (see state_dtype for the available fields), or by one of the names in FIELD_ALIASES.
+    A number in a path selects an element of an array field (e.g. timers.1 or
+    simulation_wheels.0.steerable). A name following an array of structs selects the field
+    in every element (e.g. simulation_wheels.real_time_state.has_ground_contact).
+
+    Unlike the SimStateData properties, projected fields are read regardless of the flags
+    of the state, fields that are not available in a state are zero. Boolean fields are
+    stored as 4 byte integers in the state and are read as such, as 0 or 1.
+
+    Args:
+        fields (list): the fields to project, as paths or aliases
+
+    Attributes:
+        fields (list): the projected fields, as given
+        paths (list): the paths of the projected fields, with aliases resolved
+        shapes (list): the shape of every projected field, () for single values
+        dtype (np.dtype): the structured dtype of a projected record, with a field for each projected field
+        struct (struct.Struct): the compiled struct, unpacking the projected values in order of their offset
+        start (int): the offset of the first projected value in a state
+    """
+    def __init__(self, fields: list):
+        self.fields = list(fields)
+        self.paths = [FIELD_ALIASES.get(field, field) for field in self.fields]
+        self.shapes = []
+
+        dtype = state_dtype()
+        resolved = []
+        for path in self.paths:
+            offsets, leaf = _resolve(dtype, path)
+            self.shapes.append(offsets.shape)
+            resolved.append((offsets, leaf))
+
+        # Every value is unpacked once, in order of its offset
+        elements = {}
+        for offsets, leaf in resolved:
+            for offset in offsets.ravel().tolist():
+                elements[offset] = leaf
+
+        ordered = sorted(elements)
+        self.start = ordered[0]
+        fmt = '<'
+        position = self.start
+        for offset in ordered:
+            if offset < position:
+                raise ValueError(f'Overlapping fields at offset {offset}')
+
+            if offset > position:
+                fmt += f'{offset - position}x'
+
+            leaf = elements[offset]
+            fmt += _STRUCT_FORMATS[(leaf.kind, leaf.itemsize)]
+            position = offset + leaf.itemsize
+
+        self.struct = struct.Struct(fmt)
+
+        index = {offset: i for i, offset in enumerate(ordered)}
+        self._getters = []
+        flat = []
+        for (offsets, leaf), shape in zip(resolved, self.shapes):
+            indices = [index[offset] for offset in offsets.ravel().tolist()]
+            flat += indices
+            if shape == ():
+                self._getters.append(itemgetter(indices[0]))
+            elif len(indices) == 1:
+                self._getters.append(lambda values, i=indices[0]: (values[i],))
+            else:
+                self._getters.append(itemgetter(*indices))
+
+        self._flat_getter = itemgetter(*flat) if len(flat) > 1 else lambda values: (values[flat[0]],)
+        self.dtype = np.dtype([
+            (field, leaf, shape) for field, (offsets, leaf), shape in zip(self.fields, resolved, self.shapes)
+        ])
+        self._packed = struct.Struct('<' + ''.join(
+            _STRUCT_FORMATS[(leaf.kind, leaf.itemsize)] * offsets.size for offsets, leaf in resolved
+        ))
+        self._gathers = [
+            ((offsets[..., np.newaxis] + np.arange(leaf.itemsize)).ravel(), leaf) for offsets, leaf in resolved
+        ]
+
+    def unpack(self, state, offset: int = 0) -> tuple:
+        """
+        Reads the projected fields of a state.
+
+        Args:
+            state: the state, a SimStateData or any object supporting the buffer protocol holding the state data
+            offset (int): the offset of the state data in the buffer
+
+        Returns:
+            tuple: the value of every projected field in the order they were given, array fields
+                   as flat tuples of their elements
+        """
+        data = state.data if isinstance(state, SimStateData) else state
+        values = self.struct.unpack_from(data, offset + self.start)
+        return tuple([getter(values) for getter in self._getters])
+
+    def record(self, state, offset: int = 0) -> np.void:
+        """
+        Reads the projected fields of a state into a record of the projection dtype.
+
+        Args:
+            state: the state, a SimStateData or any object supporting the buffer protocol holding the state data
+            offset (int): the offset of the state data in the buffer
+
+        Returns:
+            np.void: the record, its fields are accessed by the names the fields were given by
+        """
+        data = state.data if isinstance(state, SimStateData) else state
+        values = self.struct.unpack_from(data, offset + self.start)
+        return np.frombuffer(self._packed.pack(*self._flat_getter(values)), self.dtype)[0]
+
+    def unpack_batch(self, batch: SimStateBatch) -> np.ndarray:
+        """
+        Reads the projected fields of all states of a batch at once.
+
+        Args:
+            batch (SimStateBatch): the batch of states
+
+        Returns:
+            np.ndarray: the records of the projection dtype, shape (N,)
+        """
+        records = np.empty(batch.count, self.dtype)
+        if batch.count == 0:
+            return records
+
+        raw = batch.raw[:batch.count]
+        for field, shape, (columns, leaf) in zip(self.fields, self.shapes, self._gathers):
+            records[field] = np.ascontiguousarray(raw[:, columns]).view(leaf).reshape((batch.count,) + shape)
+
+        return records
+
+
+def _resolve(dtype: np.dtype, path: str) -> tuple:
+    # Resolves a path into the offsets of its elements, shaped as the field, and the dtype of an element
+    offsets = np.zeros((), np.int64)
+    for name in path.split('.'):
+        if name.isdigit():
+            if dtype.subdtype is None:
+                raise ValueError(f'Cannot index {path}, {name} does not follow an array')
+
+            base, shape = dtype.subdtype
+            if int(name) >= shape[0]:
+                raise ValueError(f'Index {name} of {path} out of range')
+
+            offsets = offsets + int(name) * int(np.prod(shape[1:])) * base.itemsize
+            dtype = np.dtype((base, shape[1:])) if len(shape) > 1 else base
+            continue
+
+        # A field of an array of structs is selected in every element
+        while dtype.subdtype is not None:
+            base, shape = dtype.subdtype
+            strides = np.arange(int(np.prod(shape))).reshape(shape) * base.itemsize
+            offsets = offsets.reshape(offsets.shape + (1,) * len(shape)) + strides
+            dtype = base
+
+        if dtype.names is None or name not in dtype.names:
+            raise ValueError(f'Unknown field {name} in {path}')
+
+        dtype, field_offset = dtype.fields[name][:2]
+        offsets = offsets + field_offset
+
+    if dtype.subdtype is not None:
+        base, shape = dtype.subdtype
+        strides = np.arange(int(np.prod(shape))).reshape(shape) * base.itemsize
+        offsets = offsets.reshape(offsets.shape + (1,) * len(shape)) + strides
+        dtype = base
+
+    if dtype.names is not None:
+        raise ValueError(f'Cannot project {path}, it is a struct, project its fields instead')
+
+    return offsets, dtype
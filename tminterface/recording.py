@@ -0,0 +1,144 @@
+import struct
+import time
+from enum import IntEnum
+
+
+class RecordKind(IntEnum):
+    """
+    The direction and role of a message stored in a session recording.
+    """
+    CLIENT_MESSAGE = 0
+    SERVER_CALL = 1
+    SERVER_RESPONSE = 2
+
+
+class SessionRecord(object):
+    """
+    A single message stored in a session recording.
+
+    Args:
+        kind (RecordKind): whether the message was sent by the client, or is a server call or response
+        msgtype (int): the message type, for responses the type of the message the response belongs to
+        timestamp (int): the time the message was recorded at, in nanoseconds since the recording started
+        data (bytes): the message as found in the shared buffer, without the message type (from the error code on)
+
+    Attributes:
+        kind (RecordKind): whether the message was sent by the client, or is a server call or response
+        msgtype (int): the message type, for responses the type of the message the response belongs to
+        timestamp (int): the time the message was recorded at, in nanoseconds since the recording started
+        data (bytes): the message as found in the shared buffer, without the message type (from the error code on)
+    """
+    def __init__(self, kind: RecordKind, msgtype: int, timestamp: int, data: bytes):
+        self.kind = kind
+        self.msgtype = msgtype
+        self.timestamp = timestamp
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f'SessionRecord({self.kind.name}, {self.msgtype}, {self.timestamp}, {len(self.data)} bytes)'
+
+
+class SessionRecorder(object):
+    """
+    SessionRecorder captures every message exchanged through a TMInterface into a binary log,
+    which can be replayed later without the game with tminterface.replay.SessionReplayer.
+
+    Recording is enabled by passing a recorder to TMInterface:
+
+        recorder = SessionRecorder('session.tmis', buffer_size)
+        iface = TMInterface('TMInterface0', buffer_size, recorder=recorder)
+        ...
+        recorder.close()
+
+    The log starts with a header holding the magic bytes, the format version, flags (reserved, 0)
+    and the buffer size of the recorded session. Each message is stored as a record of
+    its kind, message type, timestamp in nanoseconds and length, followed by the message bytes.
+    Messages are written through a buffered file, so recording does not add a system call
+    to every message.
+
+    Args:
+        path (str): the path of the log file to create
+        buffer_size (int): the buffer size used by the recorded session
+
+    Attributes:
+        path (str): the path of the log file
+        buffer_size (int): the buffer size used by the recorded session
+        start_time (int): the time the recording started at, from time.perf_counter_ns
+        records (int): the number of messages recorded
+    """
+    MAGIC = b'TMIS'
+    VERSION = 1
+    header = struct.Struct('=4sHHI')
+    record_header = struct.Struct('=BiqI')
+
+    def __init__(self, path: str, buffer_size: int):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.file = open(path, 'wb')
+        self.file.write(SessionRecorder.header.pack(SessionRecorder.MAGIC, SessionRecorder.VERSION, 0, buffer_size))
+        self.start_time = time.perf_counter_ns()
+        self.records = 0
+
+    def record(self, kind: RecordKind, msgtype: int, data):
+        """
+        Appends a message to the log.
+
+        Args:
+            kind (RecordKind): the kind of the message
+            msgtype (int): the message type
+            data (bytes-like): the message bytes, from the error code on
+        """
+        if self.file is None:
+            return
+
+        timestamp = time.perf_counter_ns() - self.start_time
+        self.file.write(SessionRecorder.record_header.pack(kind, msgtype, timestamp, len(data)))
+        self.file.write(data)
+        self.records += 1
+
+    def close(self):
+        """
+        Flushes and closes the log. Messages exchanged after closing are not recorded.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_session(path: str) -> tuple:
+    """
+    Reads a log written by SessionRecorder.
+
+    Args:
+        path (str): the path of the log file
+
+    Returns:
+        tuple: the buffer size of the recorded session and the list of SessionRecord objects
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < SessionRecorder.header.size:
+        raise ValueError(f'{path} is not a session recording')
+
+    magic, version, _flags, buffer_size = SessionRecorder.header.unpack_from(data)
+    if magic != SessionRecorder.MAGIC:
+        raise ValueError(f'{path} is not a session recording')
+
+    if version != SessionRecorder.VERSION:
+        raise ValueError(f'Unsupported session recording version: {version}')
+
+    records = []
+    offset = SessionRecorder.header.size
+    record_header = SessionRecorder.record_header
+    while offset + record_header.size <= len(data):
+        kind, msgtype, timestamp, size = record_header.unpack_from(data, offset)
+        offset += record_header.size
+        if offset + size > len(data):
+            # The recording was interrupted while writing the last message
+            break
+
+        records.append(SessionRecord(RecordKind(kind), msgtype, timestamp, data[offset:offset + size]))
+        offset += size
+
+    return buffer_size, records
@@ -0,0 +1,180 @@
+import mmap
+import time
+
+from tminterface.interface import TMInterface, MessageType
+from tminterface.client import Client
+from tminterface.recording import RecordKind, read_session
+from tminterface.transport import Transport
+from tminterface.waitstrategy import WaitStrategy
+
+
+class ReplayMismatchException(Exception):
+    """
+    An exception thrown when a replayed client sends a message that has no
+    recorded response in the server call it is handling. Only thrown in strict mode.
+    """
+    pass
+
+
+class ReplayTransport(Transport):
+    """
+    A transport providing an anonymous mapping, used by SessionReplayer
+    in place of the buffer shared with the game.
+    """
+    def is_present(self) -> bool:
+        return True
+
+    def open(self) -> mmap.mmap:
+        self.mfile = mmap.mmap(-1, self.buffer_size)
+        return self.mfile
+
+    def create(self) -> mmap.mmap:
+        return self.open()
+
+
+class ReplayWaitStrategy(WaitStrategy):
+    """
+    A wait strategy answering client messages with the responses recorded in a session,
+    instead of waiting for a server. Used by SessionReplayer.
+
+    Args:
+        replayer (SessionReplayer): the replayer providing the recorded responses
+    """
+    def __init__(self, replayer):
+        self.replayer = replayer
+
+    def wait(self, header: memoryview, value: int):
+        self.replayer._respond(header[0] & 0xFF)
+
+
+class SessionReplayer(object):
+    """
+    SessionReplayer replays a session recorded with tminterface.recording.SessionRecorder
+    against a Client, without a game or server attached.
+
+    The recorded server calls are written into an anonymous buffer one after another and processed
+    by a TMInterface as if they came from the game, so the client hooks are called with the recorded
+    arguments. Messages sent by the client from a hook are answered with the responses recorded
+    while the same server call was handled, matched by message type in the order they were recorded.
+    The whole replay runs in the calling thread, without any waiting between calls, which makes it
+    deterministic and suitable for benchmarking and regression testing hook implementations:
+
+        replayer = SessionReplayer('session.tmis')
+        elapsed = replayer.replay(MainClient())
+
+    Pass realtime=True to replay() to reproduce the pacing of the recorded server calls instead.
+
+    In strict mode, a client message without a recorded response raises ReplayMismatchException.
+    Otherwise the message is answered with an empty response and counted in mismatches.
+    Client messages that do not expect a response (e.g. C_PROCESSED_CALL) are never checked.
+    To compare the messages sent by the client with the recorded ones, pass a SessionRecorder
+    to replay(), which is used by the replaying TMInterface.
+
+    Args:
+        path (str): the path of the recorded session
+        strict (bool): whether to raise ReplayMismatchException for client messages without a recorded response
+
+    Attributes:
+        buffer_size (int): the buffer size of the recorded session
+        records (list): the recorded messages, as SessionRecord objects
+        strict (bool): whether to raise ReplayMismatchException for client messages without a recorded response
+        iface (TMInterface): the interface used by the last replay, None if nothing was replayed yet
+        calls_replayed (int): the number of server calls replayed by the last replay
+        mismatches (int): the number of client messages answered with an empty response in the last replay
+    """
+    def __init__(self, path: str, strict: bool = True):
+        self.buffer_size, self.records = read_session(path)
+        self.strict = strict
+        self.iface = None
+        self.calls_replayed = 0
+        self.mismatches = 0
+        self.responses = []
+
+    def replay(self, client: Client, realtime: bool = False, **kwargs) -> float:
+        """
+        Replays the recorded server calls against the client.
+
+        After all calls are replayed, the client is closed, unless the recording ended
+        with a shutdown or the client closed the interface itself.
+
+        Args:
+            client (Client): the client to replay the session against
+            realtime (bool): whether to wait between server calls as long as in the recorded session
+            **kwargs: additional keyword arguments passed to the TMInterface (e.g. metrics or recorder)
+
+        Returns:
+            float: the time the replay took in seconds
+        """
+        iface = TMInterface(
+            'TMInterfaceReplay',
+            self.buffer_size,
+            transport=ReplayTransport('TMInterfaceReplay', self.buffer_size),
+            wait_strategy=ReplayWaitStrategy(self),
+            **kwargs
+        )
+        iface.client = client
+        iface._ensure_connected()
+        self.iface = iface
+        self._negotiate_capabilities()
+        self.calls_replayed = 0
+        self.mismatches = 0
+
+        calls = self._group_calls()
+        start = time.perf_counter()
+        first_timestamp = calls[0][0].timestamp if calls else 0
+        for call, responses in calls:
+            if not iface.running:
+                break
+
+            if realtime:
+                delay = (call.timestamp - first_timestamp) / 1e9 - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            self.responses = responses
+            iface.buffer[4:4 + len(call.data)] = call.data
+            iface.header[0] = call.msgtype | 0xFF00
+            iface._process_server_message()
+            self.calls_replayed += 1
+
+        if iface.running:
+            iface.close()
+
+        return time.perf_counter() - start
+
+    def _negotiate_capabilities(self):
+        # Negotiate the same capabilities as the recorded session, e.g. chunked transfer
+        for record in self.records:
+            if record.kind == RecordKind.SERVER_RESPONSE and record.msgtype == MessageType.C_REGISTER:
+                self.iface.buffer[4:4 + len(record.data)] = record.data
+                self.iface._read_server_capabilities()
+                return
+
+    def _group_calls(self) -> list:
+        # Pairs each server call with the responses received while it was handled,
+        # responses received before the first call belong to the registration
+        calls = []
+        for record in self.records:
+            if record.kind == RecordKind.SERVER_CALL:
+                calls.append((record, []))
+            elif record.kind == RecordKind.SERVER_RESPONSE and calls:
+                calls[-1][1].append(record)
+
+        return calls
+
+    def _respond(self, msgtype: int):
+        iface = self.iface
+        for i, response in enumerate(self.responses):
+            if response.msgtype == msgtype:
+                del self.responses[i]
+                iface.buffer[4:4 + len(response.data)] = response.data
+                iface.header[0] = MessageType.S_RESPONSE | 0xFF00
+                return
+
+        if self.strict:
+            raise ReplayMismatchException(f'No response to {MessageType(msgtype).name} was recorded for this server call')
+
+        # Clear the client message, so that it is not read back as the response
+        self.mismatches += 1
+        iface.buffer[4:iface.dirty_size] = bytes(iface.dirty_size - 4)
+        iface.header[0] = MessageType.S_RESPONSE | 0xFF00
@@ -0,0 +1,692 @@
+import io
+import struct
+import threading
+import time
+
+from tminterface.interface import MessageType, RESPONSE_TOO_LONG, CLIENT_ALREADY_REGISTERED, NO_EVENT_BUFFER, COMMAND_ALREADY_REGISTERED, MAXINT32
+from tminterface.interface import RESPONSE_CHUNKED, CAPABILITIES_MAGIC, CAPABILITIES_RESPONSE_MAGIC, CAPABILITY_CHUNKED_TRANSFER, CHUNK_HEADER_SIZE, EVENT_BUFFER_NAMES_ORDER
+from tminterface.structs import BFEvaluationInfo, BFEvaluationResponse, CheckpointData, SimStateData
+from tminterface.eventbuffer import EventBufferData, Event
+from tminterface.transport import Transport, default_transport
+from tminterface.constants import *
+
+CONTROL_NAMES_ORDER = EVENT_BUFFER_NAMES_ORDER
+
+INPUT_STATE_NAMES = [
+    BINARY_LEFT_NAME,
+    BINARY_RIGHT_NAME,
+    BINARY_ACCELERATE_NAME,
+    BINARY_BRAKE_NAME,
+    ANALOG_STEER_NAME,
+    ANALOG_ACCELERATE_NAME
+]
+
+LOG_SEVERITIES = ['log', 'success', 'warning', 'error']
+
+
+class ReferenceServer(object):
+    """
+    The ReferenceServer is a pure Python implementation of the server side of the
+    TMInterface messaging protocol. It creates the shared memory mapping through a Transport
+    and answers every client call in MessageType, keeping the game state it is asked
+    about (simulation state, event buffer, context mode etc.) in plain Python objects.
+
+    The server does not simulate the game. The state only changes when a client modifies it
+    or when the server is driven with the run_step/simulation_* methods, which emit
+    the same calls a game would. This makes it possible to run, load-test and profile
+    client code at full speed without a game instance, on any platform:
+
+        server = ReferenceServer('TMInterface0')
+        server.start()
+
+        iface = TMInterface('TMInterface0')
+        iface.register(MyClient())
+        server.wait_for_registration()
+
+        server.simulate(10000)
+        server.stop()
+
+    Client requests are serviced by a background thread while the server is idle.
+    The driving methods are synchronous: they return after the client has processed
+    the call, servicing all requests the client made from inside its hook.
+
+    The server supports chunked transfer: clients that request it on registration can send
+    messages larger than the buffer in parts (C_TRANSFER_CHUNK), and responses or calls larger
+    than the buffer are sent to them with a RESPONSE_CHUNKED error code, the client requesting
+    the remaining parts with C_GET_CHUNK. Disable it to test clients against a server without it.
+    A legacy server does not negotiate capabilities at all: it ignores the capabilities sent
+    on registration and responds without a payload, like servers predating the negotiation.
+
+    Args:
+        server_name (str): the server tag clients connect to
+        buffer_size (int): the size of the shared buffer
+        transport (Transport): the transport used to create the mapping, None to use
+                               the default transport for the current platform
+        chunked_transfer (bool): whether to support transferring messages larger than the buffer in parts
+        legacy (bool): whether to respond to registration like a server without capability negotiation,
+                       which implies no chunked transfer
+
+    Attributes:
+        server_name (str): the server tag clients connect to
+        buffer_size (int): the size of the shared buffer
+        transport (Transport): the transport used to create the mapping
+        mfile (mmap.mmap): the shared mapping, None if the server is not started
+        registered (bool): whether a client is registered
+        context_mode (int): the context mode reported to the client, MODE_SIMULATION or MODE_RUN
+        time (int): the current race time
+        state (SimStateData): the current simulation state
+        event_buffer (EventBufferData): the current event buffer, None if there is no event buffer available
+        input_state (dict): the last input state set by the client, keyed by control name
+        speed (float): the game speed set by the client
+        timeout (int): the client timeout in milliseconds, -1 to wait forever
+        time_limit (int): the simulation time limit set by the client, -1 if not set
+        state_validation (bool): False if the client removed state validation
+        prevent_finish (bool): True if the client prevented the simulation from finishing
+        executed_commands (list): the commands executed by the client
+        custom_commands (list): the custom commands registered by the client
+        logs (list): the (severity, message) tuples logged by the client
+        respawns (int): the number of respawns requested by the client
+        horns (int): the number of horns requested by the client
+        give_ups (int): the number of give ups requested by the client
+        chunked_transfer (bool): whether transferring messages larger than the buffer in parts is supported
+        legacy (bool): whether the server responds to registration without negotiating capabilities
+        capabilities (int): the capabilities negotiated with the registered client
+    """
+    def __init__(
+        self,
+        server_name='TMInterface0',
+        buffer_size=DEFAULT_SERVER_SIZE,
+        transport: Transport = None,
+        chunked_transfer: bool = True,
+        legacy: bool = False
+    ):
+        self.server_name = server_name
+        self.buffer_size = buffer_size
+        self.transport = transport if transport is not None else default_transport(server_name, buffer_size)
+        self.mfile = None
+        self.registered = False
+        self.context_mode = MODE_SIMULATION
+        self.time = 0
+        self.state = ReferenceServer.initial_state()
+        self.event_buffer = ReferenceServer.initial_event_buffer()
+        self.input_state = {}
+        self.speed = 1.0
+        self.timeout = 2000
+        self.time_limit = -1
+        self.state_validation = True
+        self.prevent_finish = False
+        self.executed_commands = []
+        self.custom_commands = []
+        self.logs = []
+        self.respawns = 0
+        self.horns = 0
+        self.give_ups = 0
+        self.chunked_transfer = chunked_transfer
+        self.legacy = legacy
+        self.capabilities = 0
+
+        # The message the handlers read from: the shared buffer or a message assembled from parts
+        self.message = None
+        self.chunks = bytearray()
+        self.pending_payload = b''
+
+        self.lock = threading.RLock()
+        self.thread = None
+        self.running = False
+        self.registered_event = threading.Event()
+
+    @staticmethod
+    def initial_state() -> SimStateData:
+        """
+        Creates the state a new ReferenceServer starts with: a zeroed state
+        with timers, dyna and player info present and empty checkpoint data.
+
+        Returns:
+            SimStateData: the initial simulation state
+        """
+        state = SimStateData()
+        state.flags = SIM_HAS_TIMERS | SIM_HAS_DYNA | SIM_HAS_PLAYER_INFO
+        state.context_mode = MODE_SIMULATION
+        return state
+
+    @staticmethod
+    def initial_event_buffer() -> EventBufferData:
+        """
+        Creates the event buffer a new ReferenceServer starts with: a buffer
+        supporting all control names, containing only the race running event.
+
+        Returns:
+            EventBufferData: the initial event buffer
+        """
+        event_buffer = EventBufferData(0)
+        event_buffer.control_names = CONTROL_NAMES_ORDER[:]
+        event_buffer.clear()
+        return event_buffer
+
+    def start(self):
+        """
+        Creates the shared mapping and starts the thread servicing client requests.
+        """
+        self.mfile = self.transport.create()
+        self.mfile.seek(0)
+        self.mfile.write(bytearray(self.buffer_size))
+        self.message = self.mfile
+
+        self.running = True
+        self.thread = threading.Thread(target=self._serve_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the servicing thread and closes the shared mapping.
+        The client is not notified, use shutdown() beforehand to deregister it.
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        with self.lock:
+            self.registered = False
+            self.transport.close()
+            self.mfile = None
+
+    def wait_for_registration(self, timeout: float = None) -> bool:
+        """
+        Blocks until a client registers and finishes processing :meth:`Client.on_registered`.
+
+        Args:
+            timeout (float): the maximum time to wait in seconds, None to wait forever
+
+        Returns:
+            bool: True if a client has registered
+        """
+        return self.registered_event.wait(timeout)
+
+    def run_step(self, _time: int):
+        """
+        Emits a run step, calling :meth:`Client.on_run_step`.
+
+        Args:
+            _time (int): the race time of the step
+        """
+        self._set_time(_time)
+        self.call(MessageType.S_ON_RUN_STEP, struct.pack('i', _time))
+
+    def simulation_begin(self):
+        """
+        Emits the beginning of a simulation, calling :meth:`Client.on_simulation_begin`.
+        """
+        self.context_mode = MODE_SIMULATION
+        self.state.context_mode = MODE_SIMULATION
+        self.call(MessageType.S_ON_SIM_BEGIN)
+
+    def simulation_step(self, _time: int):
+        """
+        Emits a simulation step, calling :meth:`Client.on_simulation_step`.
+
+        Args:
+            _time (int): the race time of the step
+        """
+        self._set_time(_time)
+        self.call(MessageType.S_ON_SIM_STEP, struct.pack('i', _time))
+
+    def simulation_end(self, result: int = 0):
+        """
+        Emits the end of a simulation, calling :meth:`Client.on_simulation_end`.
+
+        Args:
+            result (int): the simulation result passed to the client
+        """
+        self.call(MessageType.S_ON_SIM_END, struct.pack('i', result))
+
+    def checkpoint_count_changed(self, current: int, target: int):
+        """
+        Emits a checkpoint count change, calling :meth:`Client.on_checkpoint_count_changed`.
+
+        Args:
+            current (int): the current amount of checkpoints passed
+            target (int): the total amount of checkpoints
+        """
+        self.call(MessageType.S_ON_CHECKPOINT_COUNT_CHANGED, struct.pack('ii', current, target))
+
+    def laps_count_changed(self, current: int):
+        """
+        Emits a lap count change, calling :meth:`Client.on_laps_count_changed`.
+
+        Args:
+            current (int): the current amount of laps passed
+        """
+        self.call(MessageType.S_ON_LAPS_COUNT_CHANGED, struct.pack('i', current))
+
+    def custom_command(self, time_from: int, time_to: int, command: str, args: list):
+        """
+        Emits a custom command execution, calling :meth:`Client.on_custom_command`.
+
+        Args:
+            time_from (int): the starting time of the command, -1 if not provided
+            time_to (int): the ending time of the command, -1 if not provided
+            command (str): the command name
+            args (list): the list of string arguments
+        """
+        payload = bytearray(struct.pack('iii', time_from, time_to, len(args)))
+        for s in [command] + list(args):
+            encoded = s.encode('latin-1')
+            payload += struct.pack('i', len(encoded)) + encoded
+
+        self.call(MessageType.S_ON_CUSTOM_COMMAND, payload)
+
+    def bruteforce_evaluate(self, info: BFEvaluationInfo) -> BFEvaluationResponse:
+        """
+        Emits a bruteforce evaluation step, calling :meth:`Client.on_bruteforce_evaluate`.
+
+        Args:
+            info (BFEvaluationInfo): the evaluation info passed to the client
+
+        Returns:
+            BFEvaluationResponse: the response of the client, None if the client did not respond
+        """
+        payload = self.call(MessageType.S_ON_BRUTEFORCE_EVALUATE, info.data, BFEvaluationResponse.min_size)
+        if payload is None:
+            return None
+
+        response = BFEvaluationResponse()
+        response.data = bytearray(payload)
+        return response
+
+    def shutdown(self, timeout: float = 2):
+        """
+        Emits a server shutdown, calling :meth:`Client.on_shutdown`, and waits
+        for the client to deregister.
+
+        Args:
+            timeout (float): the maximum time to wait for the client to deregister in seconds
+        """
+        with self.lock:
+            if not self.registered or not self._wait_for_consumed():
+                return
+
+            self._write_message(MessageType.S_SHUTDOWN)
+
+        deadline = time.perf_counter() + timeout
+        while self.registered and time.perf_counter() < deadline:
+            time.sleep(0.001)
+
+    def simulate(self, duration: int, start_time: int = 0, result: int = 0):
+        """
+        Runs a full simulation session: emits the simulation begin, simulation steps every 10ms
+        from start_time up to duration and the simulation end.
+
+        The race time follows rewinds done by the client, so stepping continues
+        10ms after the time of the state the client rewinds to. The simulation stops early
+        if the client deregisters or the time limit set by the client is exceeded.
+
+        Args:
+            duration (int): the race time at which the simulation ends
+            start_time (int): the race time of the first step
+            result (int): the simulation result passed to the client
+        """
+        self.time = start_time
+        self.simulation_begin()
+
+        _time = start_time
+        while self.registered:
+            end = self.time_limit if self.time_limit >= 0 else duration
+            if _time > end:
+                break
+
+            self.simulation_step(_time)
+            _time = self.time + 10
+
+        self.simulation_end(result)
+
+    def call(self, msgtype: int, payload: bytes = b'', response_size: int = 0) -> bytes:
+        """
+        Sends a call to the registered client and services the client requests
+        until the client responds with a processed call.
+
+        Args:
+            msgtype (int): the type of the call
+            payload (bytes): the payload of the call
+            response_size (int): the number of bytes to read from the processed call response
+
+        Returns:
+            bytes: the response_size bytes of the processed call response, None if the client
+                   is not registered or did not respond in the timeout window
+        """
+        with self.lock:
+            if not self.registered or not self._wait_for_consumed():
+                return None
+
+            self._write_message(msgtype, payload)
+
+            # The timeout window restarts with every request, as the client is still responsive
+            last_activity = time.perf_counter()
+            while self.registered:
+                msgtype = self._process_client_message()
+                if msgtype == MessageType.C_PROCESSED_CALL:
+                    self.mfile.seek(12)
+                    response = self.mfile.read(response_size)
+                    self._clear_header()
+                    return response
+
+                if msgtype is not None:
+                    last_activity = time.perf_counter()
+                elif self.timeout >= 0 and time.perf_counter() - last_activity > self.timeout / 1000:
+                    self._clear_header()
+                    self.registered = False
+                    break
+                else:
+                    time.sleep(0)
+
+            return None
+
+    def _serve_thread(self):
+        while self.running:
+            with self.lock:
+                msgtype = self._process_client_message()
+                if msgtype == MessageType.C_PROCESSED_CALL:
+                    # A processed call outside of a call, ignore it
+                    self._clear_header()
+                elif msgtype == MessageType.C_REGISTER and self.registered:
+                    self.call(MessageType.S_ON_REGISTERED)
+                    self.registered_event.set()
+
+            time.sleep(0)
+
+    def _set_time(self, _time: int):
+        self.time = _time
+        self.state.timers[1] = _time
+        self.state.player_info.race_time = _time
+
+    def _read_header(self) -> int:
+        return struct.unpack_from('i', self.mfile, 0)[0]
+
+    def _clear_header(self):
+        struct.pack_into('i', self.mfile, 0, 0)
+
+    def _wait_for_consumed(self) -> bool:
+        # The client has to read the previous response before a new message
+        # can be written into the buffer
+        deadline = time.perf_counter() + 1
+        while self._read_header() == MessageType.S_RESPONSE | 0xFF00:
+            if time.perf_counter() > deadline:
+                return False
+
+            time.sleep(0)
+
+        return True
+
+    def _write_message(self, msgtype: int, payload: bytes = b'', error_code: int = 0):
+        if 8 + len(payload) > self.buffer_size:
+            if self.capabilities & CAPABILITY_CHUNKED_TRANSFER:
+                # Send the total size and the first part, the client requests the rest
+                self.pending_payload = bytes(payload)
+                payload = struct.pack('I', len(payload)) + self.pending_payload[:self.buffer_size - 12]
+                error_code = RESPONSE_CHUNKED
+            else:
+                payload = b''
+                error_code = RESPONSE_TOO_LONG
+
+        self.mfile[8:8 + len(payload)] = payload
+        struct.pack_into('i', self.mfile, 4, error_code)
+        struct.pack_into('i', self.mfile, 0, msgtype | 0xFF00)
+
+    def _respond(self, payload: bytes = b'', error_code: int = 0):
+        self._write_message(MessageType.S_RESPONSE, payload, error_code)
+
+    def _process_client_message(self) -> int:
+        if self.mfile is None:
+            return None
+
+        header = self._read_header()
+        if header & 0xFF00 == 0:
+            return None
+
+        msgtype = header & 0xFF
+        # The chunked transfer messages were added after ANY, keeping the values of the other messages
+        if msgtype < MessageType.C_REGISTER or msgtype == MessageType.ANY or msgtype > MessageType.C_GET_CHUNK:
+            return None
+
+        if msgtype == MessageType.C_PROCESSED_CALL:
+            return msgtype
+
+        self.mfile.seek(8)
+        handler = ReferenceServer._handlers.get(msgtype)
+        if handler is None:
+            self._respond()
+        else:
+            handler(self)
+
+        return msgtype
+
+    def _read_int32(self) -> int:
+        return struct.unpack('i', self.message.read(4))[0]
+
+    def _read_uint32(self) -> int:
+        return struct.unpack('I', self.message.read(4))[0]
+
+    def _read_string(self) -> str:
+        length = self._read_int32()
+        return self.message.read(length).decode(errors='replace')
+
+    def _read_state(self) -> SimStateData:
+        state = SimStateData(self.message.read(SimStateData.min_size))
+        state.cp_data.read_from_file(self.message)
+        return state
+
+    def _read_checkpoint_data(self) -> CheckpointData:
+        data = CheckpointData(self.message.read(CheckpointData.min_size))
+        data.read_from_file(self.message)
+        return data
+
+    def _add_input_event(self, event_name: str, value):
+        if self.context_mode != MODE_SIMULATION or self.event_buffer is None:
+            return
+
+        if event_name in self.event_buffer.control_names:
+            self.event_buffer.add(self.time + 10, event_name, value)
+
+    def _on_register(self):
+        if self.registered:
+            self._respond(error_code=CLIENT_ALREADY_REGISTERED)
+            return
+
+        self.registered = True
+        self.registered_event.clear()
+        if self.legacy:
+            # Servers predating the negotiation leave the message of the client in the buffer
+            self.capabilities = 0
+            self._respond()
+            return
+
+        # Clients that do not support capabilities send no magic
+        magic, capabilities = struct.unpack('ii', self.message.read(8))
+        server_capabilities = CAPABILITY_CHUNKED_TRANSFER if self.chunked_transfer else 0
+        self.capabilities = capabilities & server_capabilities if magic == CAPABILITIES_MAGIC else 0
+        self._respond(struct.pack('ii', CAPABILITIES_RESPONSE_MAGIC, server_capabilities))
+
+    def _on_deregister(self):
+        self.registered = False
+        self.registered_event.clear()
+        self._clear_header()
+
+    def _on_set_input_states(self):
+        values = struct.unpack('6i', self.message.read(24))
+        for i, (event_name, value) in enumerate(zip(INPUT_STATE_NAMES, values)):
+            is_analog = i >= 4
+            if (is_analog and value == MAXINT32) or (not is_analog and value == -1):
+                continue
+
+            if not is_analog:
+                value = bool(value)
+
+            self.input_state[event_name] = value
+            self._add_input_event(event_name, value)
+
+        self._respond()
+
+    def _on_respawn(self):
+        self.respawns += 1
+        self._add_input_event(BINARY_RESPAWN_NAME, True)
+        self._respond()
+
+    def _on_give_up(self):
+        self.give_ups += 1
+        self._respond()
+
+    def _on_horn(self):
+        self.horns += 1
+        self._add_input_event(BINARY_HORN_NAME, True)
+        self._respond()
+
+    def _on_rewind_to_state(self):
+        self.state = self._read_state()
+        if self.state.flags & SIM_HAS_PLAYER_INFO:
+            self.time = self.state.player_info.race_time
+
+        self._respond()
+
+    def _on_get_state(self):
+        self._respond(self.state.data)
+
+    def _on_get_event_buffer(self):
+        if self.event_buffer is None:
+            self._respond(error_code=NO_EVENT_BUFFER)
+            return
+
+        names = self.event_buffer.control_names
+        ids = [names.index(name) if name in names else -1 for name in CONTROL_NAMES_ORDER]
+        payload = bytearray(struct.pack('10i', *ids))
+        payload += struct.pack('II', self.event_buffer.events_duration, len(self.event_buffer.events))
+        for event in self.event_buffer.events:
+            payload += event.data
+
+        self._respond(payload)
+
+    def _on_get_context_mode(self):
+        self._respond(struct.pack('i', self.context_mode))
+
+    def _on_set_event_buffer(self):
+        self.message.seek(4 * 11, 1)
+        count = self._read_uint32()
+        if self.event_buffer is None:
+            self.event_buffer = ReferenceServer.initial_event_buffer()
+
+        self.event_buffer.events = [Event(self.message.read(Event.min_size)) for _ in range(count)]
+        self.event_buffer.sort()
+        self._respond()
+
+    def _on_set_time_limit(self):
+        self.time_limit = self._read_int32()
+        self._respond()
+
+    def _on_get_checkpoint_state(self):
+        self._respond(self.state.cp_data.data)
+
+    def _on_set_checkpoint_state(self):
+        self.state.cp_data = self._read_checkpoint_data()
+        self._respond()
+
+    def _on_set_game_speed(self):
+        self.speed = struct.unpack('d', self.message.read(8))[0]
+        self._respond()
+
+    def _on_execute_command(self):
+        self.message.seek(4, 1)
+        self.executed_commands.append(self._read_string())
+        self._respond()
+
+    def _on_set_timeout(self):
+        self.timeout = self._read_int32()
+        self._respond()
+
+    def _on_remove_state_validation(self):
+        self.state_validation = False
+        self._respond()
+
+    def _on_prevent_simulation_finish(self):
+        self.prevent_finish = True
+        self._respond()
+
+    def _on_register_custom_command(self):
+        self.message.seek(4, 1)
+        command = self._read_string()
+        if command in self.custom_commands:
+            self._respond(error_code=COMMAND_ALREADY_REGISTERED)
+            return
+
+        self.custom_commands.append(command)
+        self._respond()
+
+    def _on_log(self):
+        severity = self._read_int32()
+        message = self._read_string()
+        self.logs.append((LOG_SEVERITIES[severity] if 0 <= severity < len(LOG_SEVERITIES) else 'log', message))
+        self._respond()
+
+    def _on_transfer_chunk(self):
+        msgtype, total, offset = struct.unpack('iii', self.message.read(12))
+        if offset == 0:
+            self.chunks = bytearray()
+
+        if offset != len(self.chunks) or offset >= total:
+            self._respond(error_code=RESPONSE_TOO_LONG)
+            return
+
+        self.chunks += self.message.read(min(total - offset, self.buffer_size - CHUNK_HEADER_SIZE))
+        if len(self.chunks) < total:
+            self._respond()
+            return
+
+        # Handle the assembled message as if it was sent in one piece
+        handler = ReferenceServer._handlers.get(msgtype)
+        self.message = io.BytesIO(self.chunks)
+        self.chunks = bytearray()
+        try:
+            if handler is None or msgtype == MessageType.C_TRANSFER_CHUNK:
+                self._respond()
+            else:
+                handler(self)
+        finally:
+            self.message = self.mfile
+
+    def _on_get_chunk(self):
+        offset = self._read_int32()
+        if offset >= len(self.pending_payload):
+            self._respond(error_code=RESPONSE_TOO_LONG)
+            return
+
+        end = min(offset + self.buffer_size - 8, len(self.pending_payload))
+        payload = self.pending_payload[offset:end]
+        if end == len(self.pending_payload):
+            self.pending_payload = b''
+
+        self._respond(payload)
+
+    _handlers = {
+        MessageType.C_REGISTER: _on_register,
+        MessageType.C_DEREGISTER: _on_deregister,
+        MessageType.C_SET_INPUT_STATES: _on_set_input_states,
+        MessageType.C_RESPAWN: _on_respawn,
+        MessageType.C_GIVE_UP: _on_give_up,
+        MessageType.C_HORN: _on_horn,
+        MessageType.C_SIM_REWIND_TO_STATE: _on_rewind_to_state,
+        MessageType.C_SIM_GET_STATE: _on_get_state,
+        MessageType.C_SIM_GET_EVENT_BUFFER: _on_get_event_buffer,
+        MessageType.C_GET_CONTEXT_MODE: _on_get_context_mode,
+        MessageType.C_SIM_SET_EVENT_BUFFER: _on_set_event_buffer,
+        MessageType.C_SIM_SET_TIME_LIMIT: _on_set_time_limit,
+        MessageType.C_GET_CHECKPOINT_STATE: _on_get_checkpoint_state,
+        MessageType.C_SET_CHECKPOINT_STATE: _on_set_checkpoint_state,
+        MessageType.C_SET_GAME_SPEED: _on_set_game_speed,
+        MessageType.C_EXECUTE_COMMAND: _on_execute_command,
+        MessageType.C_SET_TIMEOUT: _on_set_timeout,
+        MessageType.C_REMOVE_STATE_VALIDATION: _on_remove_state_validation,
+        MessageType.C_PREVENT_SIMULATION_FINISH: _on_prevent_simulation_finish,
+        MessageType.C_REGISTER_CUSTOM_COMMAND: _on_register_custom_command,
+        MessageType.C_LOG: _on_log,
+        MessageType.C_TRANSFER_CHUNK: _on_transfer_chunk,
+        MessageType.C_GET_CHUNK: _on_get_chunk,
+    }
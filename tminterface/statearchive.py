@@ -0,0 +1,300 @@
+import mmap
+import os
+import struct
+
+from tminterface.structs import SimStateData
+
+
+class StateArchive(object):
+    """
+    StateArchive stores simulation states on disk, one fixed size record per tick, so that
+    long runs can be kept without holding the states in memory. The archive is memory mapped
+    and indexed by race time: fetching the state of any archived tick is a constant time
+    operation that only reads that state, and the returned SimStateData can be passed
+    to TMInterface.rewind_to_state directly.
+
+    An archive is created from the first state of a run and written by a single writer,
+    typically from on_simulation_step:
+
+        def on_simulation_step(self, iface, _time: int):
+            state = iface.get_simulation_state()
+            if self.archive is None:
+                self.archive = StateArchive.create('run.tmsa', state, _time)
+            else:
+                self.archive.append(state, _time)
+
+    Other processes can open the same file for reading while it is being written and follow
+    the writer with refresh(). The writer writes each state before publishing the new state count
+    in the header, so readers never see a partially written state.
+
+    States can be fetched as views of the mapped file instead of copies (see get). A mapping that
+    is still viewed by a state is not closed when the archive grows, is refreshed past the end of
+    the mapping or is closed: it is kept until all views of it are released, so views stay valid.
+
+    The file starts with a header holding the magic bytes, the archive format version,
+    flags (reserved, 0), the state size, the version and flags fields of the first state
+    (see SimStateData), the race time of the first state, the time between states and
+    the number of archived states. The states follow the header, in order of race time.
+    All states must have the same size, which is the case for states of the same map.
+
+    Args:
+        path (str): the path of the archive to open
+        writable (bool): whether to open the archive for appending states
+
+    Attributes:
+        path (str): the path of the archive
+        writable (bool): whether states can be appended to the archive
+        state_size (int): the size of every archived state in bytes
+        state_version (int): the version field of the first archived state
+        state_flags (int): the flags field of the first archived state
+        start_time (int): the race time of the first archived state
+        time_step (int): the race time between two archived states, in milliseconds
+        count (int): the number of archived states, as of the last refresh for readers
+    """
+    MAGIC = b'TMSA'
+    VERSION = 1
+    header = struct.Struct('=4sHHIIIii4xq')
+    count_offset = header.size - 8
+    min_capacity = 256
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.mfile = None
+        self.retired = []
+        self.count = 0
+        if os.fstat(self.file.fileno()).st_size < StateArchive.header.size:
+            self.close()
+            raise ValueError(f'{path} is not a state archive')
+
+        self._map()
+        magic, version, _flags, self.state_size, self.state_version, self.state_flags, \
+            self.start_time, self.time_step, self.count = StateArchive.header.unpack_from(self.mfile)
+
+        if magic != StateArchive.MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a state archive')
+
+        if version != StateArchive.VERSION:
+            self.close()
+            raise ValueError(f'Unsupported state archive version: {version}')
+
+    @classmethod
+    def create(cls, path: str, state: SimStateData, time: int = None, time_step: int = 10):
+        """
+        Creates a new archive holding a single state, overwriting any existing file.
+
+        Args:
+            path (str): the path of the archive to create
+            state (SimStateData): the first state of the archive, which defines the size of all states
+            time (int): the race time of the state, None to use state.time
+            time_step (int): the race time between two archived states, in milliseconds
+
+        Returns:
+            StateArchive: the archive, opened for writing
+        """
+        state_size = len(state.data)
+        start_time = state.time if time is None else time
+        with open(path, 'wb') as f:
+            f.write(StateArchive.header.pack(
+                StateArchive.MAGIC, StateArchive.VERSION, 0, state_size,
+                state.version, state.flags, start_time, time_step, 0
+            ))
+            f.truncate(StateArchive.header.size + StateArchive.min_capacity * state_size)
+
+        archive = cls(path, writable=True)
+        archive.append(state, start_time)
+        return archive
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def end_time(self) -> int:
+        """
+        The race time after the last archived state, at which the next state is appended.
+        """
+        return self.start_time + self.count * self.time_step
+
+    def append(self, state: SimStateData, time: int = None) -> bool:
+        """
+        Appends the state of the next tick to the archive.
+
+        States have to be appended in order of race time, one every time_step milliseconds.
+        States of ticks that are already archived are ignored, so that a run can be archived
+        from on_simulation_step even if the client rewinds during the run.
+
+        Args:
+            state (SimStateData): the state to append
+            time (int): the race time of the state, None to use state.time
+
+        Returns:
+            bool: True if the state was appended, False if its tick is already archived
+        """
+        if not self.writable:
+            raise ValueError('The archive is not opened for writing')
+
+        if time is None:
+            time = state.time
+
+        if time < self.end_time:
+            return False
+
+        if time != self.end_time:
+            raise ValueError(f'Expected a state at race time {self.end_time}, got {time}')
+
+        if len(state.data) != self.state_size:
+            raise ValueError(f'State of size {len(state.data)} does not match the archive state size {self.state_size}')
+
+        offset = self._offset(self.count)
+        if offset + self.state_size > len(self.mfile):
+            self._grow()
+
+        self.mfile[offset:offset + self.state_size] = state.data
+
+        # Publish the state only after it is written
+        self.count += 1
+        struct.pack_into('q', self.mfile, StateArchive.count_offset, self.count)
+        return True
+
+    def refresh(self) -> int:
+        """
+        Reads the number of archived states from the file, picking up states appended by a writer
+        since the archive was opened or last refreshed.
+
+        Returns:
+            int: the number of archived states
+        """
+        count = struct.unpack_from('q', self.mfile, StateArchive.count_offset)[0]
+        if self._offset(count) > len(self.mfile):
+            # The writer grows the file before publishing states beyond its previous end
+            self._map()
+
+        self.count = count
+        return count
+
+    def index_of(self, time: int) -> int:
+        """
+        Computes the index of the state archived at a race time.
+
+        Args:
+            time (int): the race time
+
+        Returns:
+            int: the index of the state, -1 if no state is archived at the race time
+        """
+        index, remainder = divmod(time - self.start_time, self.time_step)
+        if remainder != 0 or index < 0:
+            return -1
+
+        if index >= self.count and not self.writable:
+            self.refresh()
+
+        return index if index < self.count else -1
+
+    def get(self, time: int, view: bool = False) -> SimStateData:
+        """
+        Gets the state archived at a race time.
+
+        Args:
+            time (int): the race time of the state
+            view (bool): whether to return a state viewing the mapped file instead of a copy.
+                         The view is read only for readers, the mapping it views is kept
+                         until the view is released.
+
+        Returns:
+            SimStateData: the state
+        """
+        index = self.index_of(time)
+        if index < 0:
+            raise KeyError(f'No state archived at race time {time}')
+
+        return self.state(index, view)
+
+    def state(self, index: int, view: bool = False) -> SimStateData:
+        """
+        Gets an archived state by its index.
+
+        Args:
+            index (int): the index of the state, 0 being the state at start_time
+            view (bool): whether to return a state viewing the mapped file instead of a copy
+
+        Returns:
+            SimStateData: the state
+        """
+        if index < 0:
+            index += self.count
+
+        if not 0 <= index < self.count:
+            raise IndexError(f'State index {index} out of range')
+
+        offset = self._offset(index)
+        if view:
+            state = SimStateData(memoryview(self.mfile)[offset:offset + self.state_size])
+        else:
+            state = SimStateData(bytearray(self.mfile[offset:offset + self.state_size]))
+
+        state.invalidate_cp_data()
+        return state
+
+    def close(self):
+        """
+        Unmaps and closes the archive. A writable archive is truncated to the archived states.
+        Mappings still viewed by states are unmapped once the views are released.
+        """
+        if self.mfile is not None:
+            self._retire(self.mfile)
+            self.mfile = None
+
+        # Dropping the remaining mappings leaves them to be unmapped with their last view
+        self.retired = []
+
+        if self.file is not None:
+            if self.writable and self.count:
+                try:
+                    self.file.truncate(self._offset(self.count))
+                except OSError:
+                    # The file cannot be shrunk while a reader has it mapped on some platforms
+                    pass
+
+            self.file.close()
+            self.file = None
+
+    def _offset(self, index: int) -> int:
+        return StateArchive.header.size + index * self.state_size
+
+    def _map(self):
+        if self.mfile is not None:
+            self._retire(self.mfile)
+            self.mfile = None
+
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        self.mfile = mmap.mmap(self.file.fileno(), os.fstat(self.file.fileno()).st_size, access=access)
+
+    def _grow(self):
+        # Double the space for states, the mapping has to be recreated to cover it
+        capacity = max(self.count * 2, StateArchive.min_capacity)
+        self._retire(self.mfile)
+        self.mfile = None
+        self.file.truncate(self._offset(capacity))
+        self._map()
+
+    def _retire(self, mfile: mmap.mmap):
+        # Closes a mapping that is replaced, or keeps it while states view it.
+        # Mappings kept earlier are closed as soon as their views are released.
+        self.retired.append(mfile)
+        retired = []
+        for mapping in self.retired:
+            try:
+                mapping.close()
+            except BufferError:
+                retired.append(mapping)
+
+        self.retired = retired
@@ -0,0 +1,292 @@
+from bytefield import ArrayField, ByteArrayField, StringField, StructField
+from bytefield.base import ByteField
+from bytefield.fields import SimpleField
+from tminterface.structs import CheckpointData, SimStateData
+import numpy as np
+
+
+def struct_dtype(struct_type: type, itemsize: int = None) -> np.dtype:
+    """
+    Creates a NumPy structured dtype with the same layout as a ByteStruct subclass.
+
+    Every field of the struct becomes a field of the dtype with the same name and offset.
+    Nested structs become nested dtypes and array fields become subarrays. Byte array and
+    string fields are exposed as raw bytes. Fields with a dynamic size (such as the checkpoint
+    arrays of CheckpointData) are left out, the struct must not contain any fields after them.
+
+    Args:
+        struct_type (type): the ByteStruct subclass
+        itemsize (int): the size of an element, None to use the minimum size of the struct
+
+    Returns:
+        np.dtype: the structured dtype
+    """
+    prototype = struct_type()
+    names, formats, offsets = [], [], []
+    for name, field in vars(struct_type).items():
+        if not isinstance(field, ByteField) or name != field.property_name:
+            continue
+
+        if field.is_instance and not isinstance(field, StructField):
+            continue
+
+        names.append(name[:-len('_field')])
+        formats.append(_field_dtype(field))
+        offsets.append(prototype.calc_field_offset(field))
+
+    return np.dtype({
+        'names': names,
+        'formats': formats,
+        'offsets': offsets,
+        'itemsize': itemsize if itemsize is not None else struct_type.min_size
+    })
+
+
+def _field_dtype(field: ByteField):
+    if isinstance(field, StructField):
+        return struct_dtype(field.struct_type)
+
+    if isinstance(field, ArrayField):
+        return (_field_dtype(field._elem_field), field.shape)
+
+    if isinstance(field, (ByteArrayField, StringField)):
+        return (np.uint8, field.size)
+
+    if isinstance(field, SimpleField):
+        return np.dtype(field.format)
+
+    raise TypeError(f'Unsupported field type: {type(field).__name__}')
+
+
+def state_dtype(state_size: int = SimStateData.min_size) -> np.dtype:
+    """
+    Creates the structured dtype of simulation states of a given size.
+
+    The size of a state depends on the number of checkpoints of the map, the checkpoint data
+    at the end of the state is covered by the dtype but not described by any of its fields.
+
+    Args:
+        state_size (int): the size of a state in bytes, see SimStateData.size_in
+
+    Returns:
+        np.dtype: the structured dtype
+    """
+    return struct_dtype(SimStateData, state_size)
+
+
+class SimStateBatch(object):
+    """
+    SimStateBatch stores many simulation states of the same size in one contiguous
+    NumPy structured array, e.g. a state for every tick of a run, and provides
+    vectorized access to their most used fields:
+
+        batch = SimStateBatch()
+        ...
+        def on_simulation_step(self, iface, _time: int):
+            batch.append(iface.get_simulation_state())
+        ...
+        speeds = np.linalg.norm(batch.velocities, axis=1)
+        iface.rewind_to_state(batch[int(np.argmax(speeds))])
+
+    The dtype of the array mirrors the layout of SimStateData (see state_dtype), so any
+    field can be accessed through the array attribute by the same names as in SimStateData,
+    e.g. batch.array['scene_mobil']['turbo_boost_factor']. The accessors return views into
+    the batch, modifying them modifies the stored states. Unlike the SimStateData properties,
+    they do not check the flags of the states, fields that are not available in a state are zero.
+
+    All states in a batch must have the same size, which is the case for states of the same map.
+    The size is taken from the first state appended, unless it is given.
+
+    Args:
+        state_size (int): the size of the stored states in bytes, None to take it from the first state
+        capacity (int): the number of states to allocate space for initially
+
+    Attributes:
+        state_size (int): the size of the stored states in bytes, None if no state was appended yet
+        dtype (np.dtype): the structured dtype of the stored states, None if no state was appended yet
+        count (int): the number of stored states
+        capacity (int): the number of states space is allocated for
+        records (np.ndarray): the allocated structured array, of which the first count elements are used
+        raw (np.ndarray): the allocated array viewed as bytes, of shape (capacity, state_size)
+    """
+    def __init__(self, state_size: int = None, capacity: int = 1024):
+        self.state_size = None
+        self.dtype = None
+        self.count = 0
+        self.capacity = max(capacity, 1)
+        self.records = None
+        self.raw = None
+        if state_size is not None:
+            self._allocate(state_size)
+
+    @classmethod
+    def from_states(cls, states: list):
+        """
+        Creates a batch holding the provided states.
+
+        Args:
+            states (list): the SimStateData objects to store
+
+        Returns:
+            SimStateBatch: the batch
+        """
+        batch = cls(capacity=len(states))
+        batch.extend(states)
+        return batch
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> SimStateData:
+        return self.state(index)
+
+    def append(self, state: SimStateData):
+        """
+        Copies a state into the batch.
+
+        Args:
+            state (SimStateData): the state to store
+        """
+        if self.records is None:
+            self._allocate(len(state.data))
+
+        if len(state.data) != self.state_size:
+            raise ValueError(f'State of size {len(state.data)} does not match the batch state size {self.state_size}')
+
+        if self.count == len(self.records):
+            self._grow(self.count * 2)
+
+        self.raw[self.count].data[:] = state.data
+        self.count += 1
+
+    def extend(self, states: list):
+        """
+        Copies states into the batch.
+
+        Args:
+            states (list): the SimStateData objects to store
+        """
+        for state in states:
+            self.append(state)
+
+    def clear(self):
+        """
+        Removes all states from the batch, keeping the allocated space.
+        """
+        self.count = 0
+
+    def state(self, index: int, view: bool = False) -> SimStateData:
+        """
+        Converts a stored state back into a SimStateData, e.g. to pass it to rewind_to_state.
+
+        Args:
+            index (int): the index of the state
+            view (bool): whether to return a state viewing the memory of the batch instead of a copy,
+                         modifying such a state modifies the batch. The view is detached from the batch
+                         if the batch grows.
+
+        Returns:
+            SimStateData: the state
+        """
+        if index < 0:
+            index += self.count
+
+        if not 0 <= index < self.count:
+            raise IndexError(f'State index {index} out of range')
+
+        if view:
+            state = SimStateData(memoryview(self.raw[index]))
+        else:
+            state = SimStateData(bytearray(self.raw[index]))
+
+        state.invalidate_cp_data()
+        return state
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        The stored states as a structured array of shape (N,).
+        """
+        return self.records[:self.count] if self.records is not None else np.zeros(0, state_dtype())
+
+    @property
+    def flags(self) -> np.ndarray:
+        """
+        The flags of the states, shape (N,).
+        """
+        return self.array['flags']
+
+    @property
+    def times(self) -> np.ndarray:
+        """
+        The simulation times of the states, shape (N,).
+        """
+        return self.array['timers'][:, 1]
+
+    @property
+    def race_times(self) -> np.ndarray:
+        """
+        The race times of the states, from the player info, shape (N,).
+        """
+        return self.array['player_info']['race_time']
+
+    @property
+    def positions(self) -> np.ndarray:
+        """
+        The positions of the vehicle, shape (N, 3).
+        """
+        return self.array['dyna']['current_state']['position']
+
+    @property
+    def velocities(self) -> np.ndarray:
+        """
+        The linear speeds of the vehicle, shape (N, 3).
+        """
+        return self.array['dyna']['current_state']['linear_speed']
+
+    @property
+    def angular_velocities(self) -> np.ndarray:
+        """
+        The angular speeds of the vehicle, shape (N, 3).
+        """
+        return self.array['dyna']['current_state']['angular_speed']
+
+    @property
+    def rotation_matrices(self) -> np.ndarray:
+        """
+        The rotation matrices of the vehicle, shape (N, 3, 3).
+        """
+        return self.array['dyna']['current_state']['rotation']
+
+    @property
+    def quats(self) -> np.ndarray:
+        """
+        The rotation quaternions of the vehicle, shape (N, 4).
+        """
+        return self.array['dyna']['current_state']['quat']
+
+    @property
+    def wheel_contacts(self) -> np.ndarray:
+        """
+        Whether each of the four wheels has ground contact, shape (N, 4). Not a view, as the
+        flags are converted to booleans.
+        """
+        return self.array['simulation_wheels']['real_time_state']['has_ground_contact'] != 0
+
+    def _allocate(self, state_size: int):
+        if state_size < SimStateData.min_size - CheckpointData.min_size:
+            raise ValueError(f'State size {state_size} is smaller than the state itself')
+
+        self.state_size = state_size
+        self.dtype = state_dtype(state_size)
+        self.records = np.empty(self.capacity, self.dtype)
+        self.raw = self.records.view(np.uint8).reshape(self.capacity, state_size)
+
+    def _grow(self, capacity: int):
+        # Copy the raw bytes, copying the structured array would copy field by field
+        records = np.empty(capacity, self.dtype)
+        raw = records.view(np.uint8).reshape(capacity, self.state_size)
+        raw[:self.count] = self.raw[:self.count]
+        self.records = records
+        self.raw = raw
+        self.capacity = capacity
@@ -0,0 +1,234 @@
+import zlib
+from collections import deque
+
+from tminterface.structs import SimStateData
+import numpy as np
+
+
+class _KeyframeGroup(object):
+    # A keyframe followed by the deltas of the ticks after it. The keyframe is kept
+    # until all ticks of the group are evicted, as the deltas are decoded against it.
+    def __init__(self, time: int, keyframe: bytes, words: np.ndarray):
+        self.times = [time]
+        self.payloads = [keyframe]
+        self.first = 0
+        self.words = words
+
+
+class StateHistory(object):
+    """
+    StateHistory keeps the simulation states of the last ticks in memory, encoding them
+    as deltas to reduce the memory needed for each state. It can be used to keep a state
+    for every tick of a search window and rewind to any of them:
+
+        history = StateHistory(capacity=500)
+        ...
+        def on_simulation_step(self, iface, _time: int):
+            history.append(iface.get_simulation_state(), _time)
+        ...
+        iface.rewind_to_state(history.get(time))
+
+    Every keyframe_interval ticks, a state is stored as a keyframe. The states of the ticks
+    in between are stored as deltas to the preceding keyframe. Without compression, a delta holds
+    the 4 byte words that differ from the keyframe and their offsets. With a compression level,
+    keyframes and the XOR of the states with their keyframe are compressed with zlib instead,
+    which takes less memory but more time to append and get states.
+
+    States must be appended in order of race time. Appending a state at a race time
+    that is not newer than the newest state discards the states from that time on,
+    as is the case when the client rewinds and simulates different inputs.
+    Once capacity states are retained, appending a state evicts the oldest one.
+    All states must have the same size, which is the case for states of the same map.
+
+    Args:
+        capacity (int): the maximum number of states retained
+        keyframe_interval (int): the number of ticks between two keyframes
+        compression_level (int): the zlib compression level (1-9), 0 to store deltas without compression
+
+    Attributes:
+        capacity (int): the maximum number of states retained
+        keyframe_interval (int): the number of ticks between two keyframes
+        compression_level (int): the zlib compression level, 0 if states are not compressed
+        state_size (int): the size of the stored states in bytes, None if no state was appended yet
+        memory_usage (int): the number of bytes taken by the encoded states, including evicted keyframes
+                            still needed to decode retained states
+    """
+    def __init__(self, capacity: int = 1000, keyframe_interval: int = 10, compression_level: int = 0):
+        if capacity < 1 or keyframe_interval < 1:
+            raise ValueError('The capacity and keyframe interval must be positive')
+
+        self.capacity = capacity
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+        self.state_size = None
+        self.memory_usage = 0
+        self.groups = deque()
+        self.index = {}
+        self._offset_dtype = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, time: int) -> bool:
+        return time in self.index
+
+    @property
+    def times(self) -> list:
+        """
+        The race times of the retained states, from the oldest to the newest.
+        """
+        return [time for group in self.groups for time in group.times[group.first:]]
+
+    @property
+    def bytes_per_tick(self) -> float:
+        """
+        The average memory used per retained state in bytes, see memory_usage.
+        """
+        return self.memory_usage / len(self.index) if self.index else 0.0
+
+    def append(self, state: SimStateData, time: int = None):
+        """
+        Stores the state of a tick.
+
+        Args:
+            state (SimStateData): the state to store
+            time (int): the race time of the state, None to use state.time
+        """
+        if self.state_size is None:
+            self.state_size = len(state.data)
+            self._offset_dtype = np.uint16 if self.state_size <= 0x40000 else np.uint32
+
+        if len(state.data) != self.state_size:
+            raise ValueError(f'State of size {len(state.data)} does not match the history state size {self.state_size}')
+
+        if time is None:
+            time = state.time
+
+        if self.groups and time <= self.groups[-1].times[-1]:
+            self._discard_from(time)
+
+        words = self._words(state.data)
+        group = self.groups[-1] if self.groups else None
+        if group is None or len(group.times) >= self.keyframe_interval:
+            payload = self._encode_keyframe(words)
+            if group is not None:
+                group.words = None
+
+            group = _KeyframeGroup(time, payload, words)
+            self.groups.append(group)
+        else:
+            if group.words is None:
+                group.words = self._decode_keyframe(group.payloads[0])
+
+            payload = self._encode_delta(words, group.words)
+            group.times.append(time)
+            group.payloads.append(payload)
+
+        self.index[time] = (group, len(group.times) - 1)
+        self.memory_usage += len(payload)
+
+        while len(self.index) > self.capacity:
+            self._evict_oldest()
+
+    def get(self, time: int) -> SimStateData:
+        """
+        Reconstructs the state stored at a race time.
+
+        Args:
+            time (int): the race time of the state
+
+        Returns:
+            SimStateData: a copy of the stored state
+        """
+        try:
+            group, i = self.index[time]
+        except KeyError:
+            raise KeyError(f'No state retained at race time {time}') from None
+
+        keyframe = group.words if group.words is not None else self._decode_keyframe(group.payloads[0])
+        words = keyframe if i == 0 else self._decode_delta(group.payloads[i], keyframe)
+
+        state = SimStateData(bytearray(words.view(np.uint8)[:self.state_size]))
+        state.invalidate_cp_data()
+        return state
+
+    def clear(self):
+        """
+        Removes all states from the history.
+        """
+        self.groups.clear()
+        self.index.clear()
+        self.memory_usage = 0
+
+    def _words(self, data) -> np.ndarray:
+        # Views the state as 4 byte words, padding it if needed
+        if self.state_size % 4 == 0:
+            return np.frombuffer(data, np.uint32).copy()
+
+        words = np.zeros(-(-self.state_size // 4), np.uint32)
+        words.view(np.uint8)[:self.state_size] = np.frombuffer(data, np.uint8)
+        return words
+
+    def _encode_keyframe(self, words: np.ndarray) -> bytes:
+        if self.compression_level:
+            return zlib.compress(words.tobytes(), self.compression_level)
+
+        return words.tobytes()
+
+    def _decode_keyframe(self, payload: bytes) -> np.ndarray:
+        if self.compression_level:
+            payload = zlib.decompress(payload)
+
+        return np.frombuffer(payload, np.uint32)
+
+    def _encode_delta(self, words: np.ndarray, keyframe: np.ndarray) -> bytes:
+        diff = words ^ keyframe
+        if self.compression_level:
+            return zlib.compress(diff.tobytes(), self.compression_level)
+
+        offsets = np.flatnonzero(diff)
+        return offsets.astype(self._offset_dtype).tobytes() + words[offsets].tobytes()
+
+    def _decode_delta(self, payload: bytes, keyframe: np.ndarray) -> np.ndarray:
+        if self.compression_level:
+            return np.frombuffer(zlib.decompress(payload), np.uint32) ^ keyframe
+
+        count = len(payload) // (np.dtype(self._offset_dtype).itemsize + 4)
+        offsets = np.frombuffer(payload, self._offset_dtype, count)
+        words = keyframe.copy()
+        words[offsets] = np.frombuffer(payload, np.uint32, count, len(payload) - count * 4)
+        return words
+
+    def _evict_oldest(self):
+        group = self.groups[0]
+        if group.first == len(group.times):
+            # Only the keyframe of the group was left, for the deltas appended after it
+            self.memory_usage -= len(group.payloads[0])
+            self.groups.popleft()
+            group = self.groups[0]
+
+        del self.index[group.times[group.first]]
+        if group.first > 0:
+            self.memory_usage -= len(group.payloads[group.first])
+            group.payloads[group.first] = None
+
+        group.first += 1
+        if group.first == len(group.times) and len(self.groups) > 1:
+            self.memory_usage -= len(group.payloads[0])
+            self.groups.popleft()
+
+    def _discard_from(self, time: int):
+        # Discards the retained states at and after the race time, newest first
+        while self.groups:
+            group = self.groups[-1]
+            while len(group.times) > group.first and group.times[-1] >= time:
+                del self.index[group.times.pop()]
+                self.memory_usage -= len(group.payloads.pop())
+
+            if len(group.times) > group.first:
+                return
+
+            if len(group.payloads) > 0:
+                self.memory_usage -= len(group.payloads[0])
+
+            self.groups.pop()
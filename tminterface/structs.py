@@ -8,11 +8,14 @@ from bytefield import (
     StructField,
     StringField
 )
+from bytefield.base import ByteField
+from bytefield.fields import SimpleField
 from enum import IntEnum
 from tminterface.constants import SIM_HAS_TIMERS, SIM_HAS_DYNA, SIM_HAS_PLAYER_INFO
 from tminterface.eventbuffer import Event
 import tminterface.util as util
 import numpy as np
+import struct
 
 
 class PlayerInfoStruct(ByteStruct):
@@ -289,6 +292,53 @@ class CheckpointData(ByteStruct):
         self.data += file.read(self.cp_times_length * CheckpointTime.min_size)
         self.resize(CheckpointData.cp_times_field, self.cp_times_length)
 
+    def resize_arrays(self):
+        """
+        Resizes the checkpoint arrays to the lengths stored in the data,
+        without modifying the data itself. Used when the data already contains
+        both arrays, e.g. when it was copied from the server in one piece.
+        """
+        self.resize(CheckpointData.cp_states_field, self.cp_states_length)
+        self.resize(CheckpointData.cp_times_field, self.cp_times_length)
+
+    @staticmethod
+    def size_in(buffer, offset: int = 0) -> int:
+        """
+        Calculates the full size of checkpoint data stored in a buffer, including both arrays.
+
+        Args:
+            buffer: the buffer containing the checkpoint data, any object supporting the buffer protocol
+            offset (int): the offset of the checkpoint data in the buffer
+
+        Returns:
+            int: the size of the checkpoint data in bytes
+        """
+        cp_states_length = struct.unpack_from('i', buffer, offset + 4)[0]
+        cp_times_length = struct.unpack_from('i', buffer, offset + 8 + cp_states_length * 4)[0]
+        return CheckpointData.min_size + cp_states_length * 4 + cp_times_length * CheckpointTime.min_size
+
+    @staticmethod
+    def counts_in(buffer, offset: int = 0) -> tuple:
+        """
+        Counts the passed checkpoints of checkpoint data stored in a buffer, without
+        creating the checkpoint arrays. A checkpoint is passed if its time is not -1.
+
+        Args:
+            buffer: the buffer containing the checkpoint data, any object supporting the buffer protocol
+            offset (int): the offset of the checkpoint data in the buffer
+
+        Returns:
+            tuple: the number of passed checkpoints, the length of the times array
+                   and the length of the states array
+        """
+        cp_states_length = struct.unpack_from('i', buffer, offset + 4)[0]
+        times_offset = offset + 8 + cp_states_length * 4
+        cp_times_length = struct.unpack_from('i', buffer, times_offset)[0]
+
+        # Every CheckpointTime is a pair of int32, the time is the first one
+        times = np.frombuffer(buffer, np.int32, cp_times_length * 2, times_offset + 4)[::2]
+        return int(np.count_nonzero(times != -1)), cp_times_length, cp_states_length
+
 
 class CachedInput(ByteStruct):
     """
@@ -436,9 +486,30 @@ class SimStateData(ByteStruct):
     These are masked out automatically by TMInterface when restoring the state
     (and when calling TMInterface.rewind_to_state).
 
+    The state can be constructed from a memoryview, in which case the view is used
+    as the underlying data without copying it. Such a state reads and writes directly
+    into the viewed memory, but cannot change its size.
+
     To query input state of the simulation state regardless of context,
     use input_* (input_accelerate, input_brake etc.) accessors.
 
+    Nested structs (dyna, scene_mobil, player_info and the structs nested in them) are created
+    on first access and reused afterwards, as long as the data of the state is not replaced.
+    The checkpoint arrays of a fetched state are sized on the first access of cp_data.
+
+    The checkpoint and lap counts of the state are cached when the state is fetched
+    with TMInterface.get_simulation_state, see checkpoint_counts. They are recomputed after
+    the state is modified or its checkpoint data is accessed. If the checkpoint data is modified
+    through a CheckpointData obtained earlier, call update_checkpoint_counts to update them.
+
+    A state can be copied cheaply with copy(): the copy shares the data with the original state
+    until either of them is modified. The position, velocity and rotation_matrix setters
+    (as well as the other accessors defined in this class) read and write the data in place,
+    without creating nested structs. Accessing a nested struct or array of a state that shares
+    its data gives the state its own copy of the data first, as the struct may be modified.
+    A state whose nested structs or arrays were accessed is copied right away, as they may
+    still be used to modify its data.
+
     Attributes:
         version: int
         context_mode: int
@@ -485,26 +556,114 @@ class SimStateData(ByteStruct):
 
     cp_data                 = StructField(CheckpointData, instance_with_parent=False)
 
+    def __init__(self, *args, **kwargs):
+        self._checkpoint_counts = None
+        self._cp_data_stale = False
+        self._shared = False
+        self._exposed = False
+
+        # Wrap memoryviews directly instead of copying them into a new bytearray
+        if args and isinstance(args[0], memoryview):
+            super().__init__(bytearray(), *args[1:])
+            self.data = args[0]
+            for key in kwargs:
+                setattr(self, key, kwargs[key])
+        else:
+            super().__init__(*args, **kwargs)
+
+    def copy(self):
+        """
+        Copies the state. The copy shares the data with this state until either of them
+        is modified, so copying a state that is then only passed to TMInterface.rewind_to_state
+        or modified with the setters of this class costs at most one copy of the data.
+
+        States viewing memory they do not own (see get_simulation_state) and states whose
+        nested structs or arrays were accessed are copied right away.
+
+        Returns:
+            SimStateData: the copy
+        """
+        if isinstance(self.data, bytearray) and not self._exposed:
+            cpy = SimStateData(bytearray())
+            cpy.data = self.data
+            cpy._shared = self._shared = True
+
+            # Both states copy the data before writing to it, through any field
+            self.instance_data.clear()
+            self._cp_data_stale = True
+        else:
+            cpy = SimStateData(bytearray(self.data))
+
+        cpy._checkpoint_counts = self._checkpoint_counts
+        cpy._cp_data_stale = True
+        return cpy
+
+    def invalidate_cp_data(self):
+        """
+        Marks the checkpoint arrays to be resized to the lengths stored in the data
+        the next time cp_data is accessed. Called after the data of the state has been replaced,
+        so that states which are never asked for their checkpoints do not pay for resizing.
+        """
+        self._cp_data_stale = True
+        self._checkpoint_counts = None
+
+    @staticmethod
+    def size_in(buffer, offset: int = 0) -> int:
+        """
+        Calculates the full size of a simulation state stored in a buffer,
+        including the variable sized checkpoint data.
+
+        Args:
+            buffer: the buffer containing the state, any object supporting the buffer protocol
+            offset (int): the offset of the state in the buffer
+
+        Returns:
+            int: the size of the state in bytes
+        """
+        cp_offset = SimStateData.min_size - CheckpointData.min_size
+        return cp_offset + CheckpointData.size_in(buffer, offset + cp_offset)
+
+    @property
+    def checkpoint_counts(self) -> tuple:
+        """
+        The number of passed checkpoints, the total number of checkpoints to pass
+        (including laps) and the number of passed laps, None if the map has no checkpoint states.
+
+        The counts are computed from the checkpoint data on first access and cached
+        until the state is modified or its checkpoint data is accessed.
+        """
+        if self._checkpoint_counts is None:
+            self.update_checkpoint_counts()
+
+        return self._checkpoint_counts
+
+    def update_checkpoint_counts(self):
+        """
+        Recomputes the cached checkpoint and lap counts from the checkpoint data of the state.
+        """
+        current, target, states = CheckpointData.counts_in(self.data, SimStateData.min_size - CheckpointData.min_size)
+        self._checkpoint_counts = (current, target, current // states if states > 0 else None)
+
     @property
     def time(self) -> int:
         if (self.flags & SIM_HAS_TIMERS) == 0:
             return 0
 
-        return self.timers[1]
+        return _INT.unpack_from(self.data, _TIME_OFFSET)[0]
 
     @property
     def position(self) -> list:
         if (self.flags & SIM_HAS_DYNA) == 0:
             return [0, 0, 0]
 
-        return list(self.dyna.current_state.position)
+        return list(_VEC3.unpack_from(self.data, _POSITION_OFFSET))
 
     @property
     def velocity(self) -> list:
         if (self.flags & SIM_HAS_DYNA) == 0:
             return [0, 0, 0]
 
-        return list(self.dyna.current_state.linear_speed)
+        return list(_VEC3.unpack_from(self.data, _VELOCITY_OFFSET))
 
     # Available only in run context
     @property
@@ -512,14 +671,14 @@ class SimStateData(ByteStruct):
         if (self.flags & SIM_HAS_PLAYER_INFO) == 0:
             return 0
 
-        return self.player_info.display_speed
+        return _INT.unpack_from(self.data, _DISPLAY_SPEED_OFFSET)[0]
 
     @position.setter
     def position(self, pos: list) -> bool:
         if (self.flags & SIM_HAS_DYNA) == 0:
             return False
 
-        self.dyna.current_state.position = pos
+        _VEC3.pack_into(self._own_data(), _POSITION_OFFSET, *pos)
         return True
 
     @velocity.setter
@@ -527,7 +686,7 @@ class SimStateData(ByteStruct):
         if (self.flags & SIM_HAS_DYNA) == 0:
             return False
 
-        self.dyna.current_state.linear_speed = vel
+        _VEC3.pack_into(self._own_data(), _VELOCITY_OFFSET, *vel)
         return True
 
     @property
@@ -535,15 +694,18 @@ class SimStateData(ByteStruct):
         if (self.flags & SIM_HAS_DYNA) == 0:
             return [[0, 0, 0]] * 3
 
-        return self.dyna.current_state.rotation.to_numpy()
+        return np.array(_MAT3.unpack_from(self.data, _ROTATION_OFFSET)).reshape(3, 3)
 
     @rotation_matrix.setter
     def rotation_matrix(self, matrix: list) -> bool:
         if (self.flags & SIM_HAS_DYNA) == 0:
             return False
 
-        self.dyna.current_state.rotation = matrix
-        self.dyna.current_state.quat = util.mat3_to_quat(matrix)
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(3, 3)
+        data = self._own_data()
+        _MAT3.pack_into(data, _ROTATION_OFFSET, *matrix.ravel())
+        _QUAT.pack_into(data, _QUAT_OFFSET, *util.mat3_to_quat(matrix))
+        return True
 
     @property
     def yaw_pitch_roll(self) -> np.array:
@@ -558,7 +720,7 @@ class SimStateData(ByteStruct):
         if (self.flags & SIM_HAS_PLAYER_INFO) == 0:
             return False
 
-        return self.player_info.race_time
+        return _INT.unpack_from(self.data, _RACE_TIME_OFFSET)[0]
 
     @property
     def rewind_time(self) -> int:
@@ -566,27 +728,154 @@ class SimStateData(ByteStruct):
 
     @property
     def input_accelerate(self) -> bool:
-        return self.input_accelerate_event.binary_value
+        return bool(self._input_value(_INPUT_ACCELERATE_OFFSET))
 
     @property
     def input_brake(self) -> bool:
-        return self.input_brake_event.binary_value
+        return bool(self._input_value(_INPUT_BRAKE_OFFSET))
 
     @property
     def input_left(self) -> bool:
-        return self.input_left_event.binary_value
+        return bool(self._input_value(_INPUT_LEFT_OFFSET))
 
     @property
     def input_right(self) -> bool:
-        return self.input_right_event.binary_value
+        return bool(self._input_value(_INPUT_RIGHT_OFFSET))
 
     @property
     def input_steer(self) -> int:
-        return self.input_steer_event.analog_value
+        return util.data_to_analog_value(self._input_value(_INPUT_STEER_OFFSET))
 
     @property
     def input_gas(self) -> int:
-        return self.input_gas_event.analog_value
+        return util.data_to_analog_value(self._input_value(_INPUT_GAS_OFFSET))
+
+    def _input_value(self, offset: int) -> int:
+        # The value of an input event, see Event
+        return _UINT.unpack_from(self.data, offset)[0] & 0xFFFFFF
+
+    def _own_data(self) -> bytearray:
+        # Copies the data before the first write if it is shared with another state.
+        # Called before every write, which may change the checkpoint counts.
+        self._checkpoint_counts = None
+        if self._shared:
+            self.data = bytearray(self.data)
+            self._shared = False
+            self.instance_data.clear()
+            self._cp_data_stale = True
+
+        return self.data
+
+
+def _inner_struct(byte_struct: ByteStruct, field: StructField) -> ByteStruct:
+    # StructField recomputes the offset of the inner struct on every access, which walks all
+    # the dynamically sized fields before it, and creates the inner struct over a copy
+    # of the data if the data is not a bytearray. The inner struct is created over the data
+    # of the parent instead and returned as is while it still wraps the same data.
+    # Only valid for fields whose offset cannot change.
+    data = byte_struct._get_instance_data(field)
+    inner = data.get('inner')
+    if inner is None:
+        inner = data['inner'] = field.struct_type(bytearray(), byte_struct.calc_offset(field))
+        inner.data = byte_struct.data
+    elif inner.data is not byte_struct.data:
+        inner = field._getvalue(byte_struct)
+
+    return inner
+
+
+def _cache_struct_fields(struct_type: type, exclude: tuple = ()):
+    for name, field in list(vars(struct_type).items()):
+        if isinstance(field, StructField) and name == field.property_name and name[:-6] not in exclude:
+            getter = (lambda f: lambda byte_struct: _inner_struct(byte_struct, f))(field)
+            setattr(struct_type, name[:-6], property(getter, field._setvalue))
+
+
+def _get_cp_data(state: SimStateData) -> CheckpointData:
+    # The checkpoint data may be modified through the returned struct
+    state._checkpoint_counts = None
+    cp_data = _inner_struct(state, SimStateData.cp_data_field)
+    if state._cp_data_stale:
+        state._cp_data_stale = False
+        cp_data.resize_arrays()
+
+    return cp_data
+
+
+def _set_cp_data(state: SimStateData, cp_data: CheckpointData):
+    # The data is resized by the size of the current arrays, they have to be sized first
+    _get_cp_data(state)
+    SimStateData.cp_data_field._setvalue(state, cp_data)
+    state._checkpoint_counts = None
+
+
+def _copy_on_write_fields(struct_type: type):
+    # Gives a state its own data before a field is written, or before a nested struct
+    # or array that may be written through is handed out
+    for name, field in list(vars(struct_type).items()):
+        if isinstance(field, ByteField) and name == field.property_name:
+            prop = getattr(struct_type, name[:-6])
+            getter = prop.fget if isinstance(field, SimpleField) else _owning_getter(prop.fget)
+            setattr(struct_type, name[:-6], property(getter, _owning_setter(prop.fset)))
+
+
+def _owning_getter(fget):
+    def getter(state):
+        if state._shared:
+            state._own_data()
+
+        # The returned struct or array writes to the data directly, copies cannot share it anymore
+        state._exposed = True
+        return fget(state)
+
+    return getter
+
+
+def _owning_setter(fset):
+    def setter(state, value):
+        state._own_data()
+        fset(state, value)
+
+    return setter
+
+
+def _field_offset(struct_type: type, *names: str) -> int:
+    # The offset of a nested field, whose offset cannot change
+    offset = 0
+    for name in names:
+        field = getattr(struct_type, name + '_field')
+        offset += struct_type().calc_field_offset(field)
+        struct_type = field.struct_type if isinstance(field, StructField) else None
+
+    return offset
+
+
+for _struct_type in [HmsDynaStruct, SimulationWheel, CachedInput, SceneVehicleCar]:
+    _cache_struct_fields(_struct_type)
+
+# The checkpoint data follows the only fields whose size may change, its arrays are sized lazily
+_cache_struct_fields(SimStateData, exclude=('cp_data',))
+SimStateData.cp_data = property(_get_cp_data, _set_cp_data)
+_copy_on_write_fields(SimStateData)
+
+_INT = struct.Struct('<i')
+_UINT = struct.Struct('<I')
+_VEC3 = struct.Struct('<3f')
+_QUAT = struct.Struct('<4f')
+_MAT3 = struct.Struct('<9f')
+_TIME_OFFSET = _field_offset(SimStateData, 'timers') + 4
+_POSITION_OFFSET = _field_offset(SimStateData, 'dyna', 'current_state', 'position')
+_VELOCITY_OFFSET = _field_offset(SimStateData, 'dyna', 'current_state', 'linear_speed')
+_ROTATION_OFFSET = _field_offset(SimStateData, 'dyna', 'current_state', 'rotation')
+_QUAT_OFFSET = _field_offset(SimStateData, 'dyna', 'current_state', 'quat')
+_RACE_TIME_OFFSET = _field_offset(SimStateData, 'player_info', 'race_time')
+_DISPLAY_SPEED_OFFSET = _field_offset(SimStateData, 'player_info', 'display_speed')
+_INPUT_ACCELERATE_OFFSET = _field_offset(SimStateData, 'input_accelerate_event', 'input_data')
+_INPUT_BRAKE_OFFSET = _field_offset(SimStateData, 'input_brake_event', 'input_data')
+_INPUT_LEFT_OFFSET = _field_offset(SimStateData, 'input_left_event', 'input_data')
+_INPUT_RIGHT_OFFSET = _field_offset(SimStateData, 'input_right_event', 'input_data')
+_INPUT_STEER_OFFSET = _field_offset(SimStateData, 'input_steer_event', 'input_data')
+_INPUT_GAS_OFFSET = _field_offset(SimStateData, 'input_gas_event', 'input_data')
 
 
 class BFTarget(IntEnum):
@@ -0,0 +1,175 @@
+import mmap
+import os
+import sys
+import tempfile
+
+
+class Transport(object):
+    """
+    The Transport class is the base class for providing the shared memory buffer
+    that the client and the server use to exchange messages.
+
+    A transport only manages the lifetime of the mapping itself, the messaging
+    protocol is implemented by TMInterface. The mapping returned by open() and create()
+    is a regular mmap.mmap object, so the rest of the client is independent
+    of the platform the transport is implemented for.
+
+    Args:
+        server_name (str): the server tag that identifies the mapping
+        buffer_size (int): the size of the mapping in bytes
+
+    Attributes:
+        server_name (str): the server tag that identifies the mapping
+        buffer_size (int): the size of the mapping in bytes
+        mfile (mmap.mmap): the mapping opened by this transport, None if it is not opened
+    """
+    def __init__(self, server_name: str, buffer_size: int):
+        self.server_name = server_name
+        self.buffer_size = buffer_size
+        self.mfile = None
+
+    def is_present(self) -> bool:
+        """
+        Checks if the server has created the mapping.
+
+        Returns:
+            bool: True if the mapping exists and can be opened
+        """
+        raise NotImplementedError
+
+    def open(self) -> mmap.mmap:
+        """
+        Opens an existing mapping created by the server.
+
+        Returns:
+            mmap.mmap: the opened mapping
+        """
+        raise NotImplementedError
+
+    def create(self) -> mmap.mmap:
+        """
+        Creates a new mapping, used by the server side of the connection.
+
+        Returns:
+            mmap.mmap: the created mapping
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Closes the mapping opened by this transport.
+        """
+        if self.mfile is not None:
+            self.mfile.close()
+            self.mfile = None
+
+
+class NamedMappingTransport(Transport):
+    """
+    A transport using a named shared memory mapping, which is how the TMInterface
+    server exposes its buffer on Windows. The mapping name is the server name
+    (e.g. TMInterface0).
+
+    This transport is only available on Windows.
+    """
+    FILE_MAP_ALL_ACCESS = 0xF001F
+
+    def is_present(self) -> bool:
+        from ctypes import windll, c_char_p
+
+        inherit_handle = 0
+        handle_name = c_char_p(bytes(self.server_name.encode()))
+        h = windll.kernel32.OpenFileMappingA(NamedMappingTransport.FILE_MAP_ALL_ACCESS, inherit_handle, handle_name)
+        is_opened = h != 0
+
+        if is_opened:
+            # close again to prevent handle leaks
+            windll.kernel32.CloseHandle(h)
+
+        return is_opened
+
+    def open(self) -> mmap.mmap:
+        self.mfile = mmap.mmap(-1, self.buffer_size, tagname=self.server_name)
+        return self.mfile
+
+    def create(self) -> mmap.mmap:
+        return self.open()
+
+
+class FileMappingTransport(Transport):
+    """
+    A transport using a file-backed mapping. The file is placed in the directory
+    provided, or /dev/shm (falling back to the temporary directory if it does not exist),
+    and is named after the server name.
+
+    This transport is available on every platform and is the default one on
+    platforms other than Windows. It is primarily used to connect to a ReferenceServer
+    (see tminterface.server).
+
+    Args:
+        server_name (str): the server tag that identifies the mapping
+        buffer_size (int): the size of the mapping in bytes
+        directory (str): the directory the mapped file is placed in, None for the default
+
+    Attributes:
+        path (str): the path of the mapped file
+    """
+    def __init__(self, server_name: str, buffer_size: int, directory: str = None):
+        super().__init__(server_name, buffer_size)
+        if directory is None:
+            directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+        self.path = os.path.join(directory, server_name)
+        self.owner = False
+
+    def is_present(self) -> bool:
+        try:
+            return os.path.getsize(self.path) >= self.buffer_size
+        except OSError:
+            return False
+
+    def open(self) -> mmap.mmap:
+        return self._map(os.O_RDWR)
+
+    def create(self) -> mmap.mmap:
+        self.owner = True
+        return self._map(os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+
+    def close(self):
+        super().close()
+        if self.owner:
+            self.owner = False
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _map(self, flags: int) -> mmap.mmap:
+        fd = os.open(self.path, flags, 0o600)
+        try:
+            if flags & os.O_CREAT:
+                os.ftruncate(fd, self.buffer_size)
+
+            self.mfile = mmap.mmap(fd, self.buffer_size)
+        finally:
+            os.close(fd)
+
+        return self.mfile
+
+
+def default_transport(server_name: str, buffer_size: int) -> Transport:
+    """
+    Creates the default transport for the current platform: a NamedMappingTransport
+    on Windows and a FileMappingTransport everywhere else.
+
+    Args:
+        server_name (str): the server tag that identifies the mapping
+        buffer_size (int): the size of the mapping in bytes
+
+    Returns:
+        Transport: the transport for the current platform
+    """
+    if sys.platform == 'win32':
+        return NamedMappingTransport(server_name, buffer_size)
+
+    return FileMappingTransport(server_name, buffer_size)
@@ -0,0 +1,102 @@
+import time
+
+
+class WaitStrategy(object):
+    """
+    A WaitStrategy defines how the client waits for the server to respond to a call.
+
+    Waiting is done by polling the message header in the shared buffer until it
+    changes to the expected value. The header is provided as a memoryview cast to
+    a single int32, so reading it does not involve any system calls or unpacking.
+
+    Different strategies trade CPU usage for response latency. Spinning reacts to the
+    response the fastest, but keeps a core busy and holds the GIL, which slows down
+    other threads in the process. Sleeping frees the core and the GIL, but every sleep
+    adds latency to the call. A strategy is set per TMInterface instance, through the
+    wait_strategy argument.
+    """
+    def wait(self, header: memoryview, value: int):
+        """
+        Blocks until the header is equal to the provided value.
+
+        Args:
+            header (memoryview): the message header, a memoryview of one int32
+            value (int): the header value to wait for
+        """
+        raise NotImplementedError
+
+
+class SpinWaitStrategy(WaitStrategy):
+    """
+    Polls the header continuously without ever giving up the CPU.
+
+    This strategy provides the lowest latency when the server runs in
+    another process, at the cost of keeping a core fully busy while waiting.
+    The GIL is only released when the interpreter forces a thread switch, which
+    makes this strategy unsuitable if other threads of the process have to run
+    while waiting (e.g. when connected to a ReferenceServer in the same process).
+    """
+    def wait(self, header: memoryview, value: int):
+        while header[0] != value:
+            pass
+
+
+class YieldWaitStrategy(WaitStrategy):
+    """
+    Polls the header for a bounded amount of iterations, then yields
+    the rest of the time slice with time.sleep(0) between polls.
+
+    With spin_count set to 0, this is the behaviour of the client before
+    wait strategies were introduced.
+
+    Args:
+        spin_count (int): the number of polls before starting to yield
+
+    Attributes:
+        spin_count (int): the number of polls before starting to yield
+    """
+    def __init__(self, spin_count: int = 100):
+        self.spin_count = spin_count
+
+    def wait(self, header: memoryview, value: int):
+        for _ in range(self.spin_count):
+            if header[0] == value:
+                return
+
+        while header[0] != value:
+            time.sleep(0)
+
+
+class BackoffWaitStrategy(WaitStrategy):
+    """
+    Polls the header for a bounded amount of iterations, then sleeps
+    between polls, doubling the sleep time each time up to a maximum.
+
+    This strategy uses the least CPU while waiting for long calls, but adds
+    up to max_delay of latency to each of them. It is suited for clients
+    that do not depend on call latency, e.g. ones that only log data.
+
+    Args:
+        spin_count (int): the number of polls before starting to sleep
+        min_delay (float): the first sleep time in seconds
+        max_delay (float): the maximum sleep time in seconds
+
+    Attributes:
+        spin_count (int): the number of polls before starting to sleep
+        min_delay (float): the first sleep time in seconds
+        max_delay (float): the maximum sleep time in seconds
+    """
+    def __init__(self, spin_count: int = 100, min_delay: float = 0.00001, max_delay: float = 0.001):
+        self.spin_count = spin_count
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+    def wait(self, header: memoryview, value: int):
+        for _ in range(self.spin_count):
+            if header[0] == value:
+                return
+
+        delay = self.min_delay
+        while header[0] != value:
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_delay)